@@ -0,0 +1,102 @@
+"""
+配置加载启动基准
+对比纯Python解析、libyaml解析和解析缓存三种方式下 ConfigManager 的加载耗时
+
+用法:
+    python benchmarks/bench_config_load.py --repeat 20 --scale 200
+"""
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import config_manager as config_module  # noqa: E402
+from core.config_manager import ConfigManager  # noqa: E402
+
+
+def _prepare_config_dir(target: Path, scale: int):
+    """复制配置目录，并按需追加仪器和流程以模拟大型站点配置"""
+    source = Path(__file__).parent.parent / 'config'
+    for filename in ('instruments.yaml', 'test_flows.yaml', 'products.yaml'):
+        shutil.copy(source / filename, target / filename)
+    if scale <= 0:
+        return
+
+    with open(target / 'instruments.yaml', encoding='utf-8') as f:
+        instruments = yaml.safe_load(f)
+    with open(target / 'test_flows.yaml', encoding='utf-8') as f:
+        flows = yaml.safe_load(f)
+
+    template_instr = instruments['instruments']['optical_power_meter']
+    template_flow = flows['test_flows']['insertion_loss_test']
+    for i in range(scale):
+        instr = dict(template_instr, resource_string=f"GPIB0::{i % 30 + 1}::INSTR")
+        instruments['instruments'][f'opm_{i:04d}'] = instr
+        flow = dict(template_flow, instruments_required=['laser_source', f'opm_{i:04d}'])
+        flows['test_flows'][f'il_flow_{i:04d}'] = flow
+
+    with open(target / 'instruments.yaml', 'w', encoding='utf-8') as f:
+        yaml.safe_dump(instruments, f, allow_unicode=True, sort_keys=False)
+    with open(target / 'test_flows.yaml', 'w', encoding='utf-8') as f:
+        yaml.safe_dump(flows, f, allow_unicode=True, sort_keys=False)
+
+
+def _measure(config_dir: Path, repeat: int, use_cache: bool, loader) -> list:
+    """多次创建 ConfigManager 并记录耗时(毫秒)"""
+    original_loader = config_module.YAML_LOADER
+    config_module.YAML_LOADER = loader
+    try:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ConfigManager(str(config_dir), use_cache=use_cache)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+    finally:
+        config_module.YAML_LOADER = original_loader
+
+
+def main():
+    parser = argparse.ArgumentParser(description='配置加载启动基准')
+    parser.add_argument('--repeat', type=int, default=20, help='每种方式的重复次数')
+    parser.add_argument('--scale', type=int, default=0, help='额外生成的仪器/流程数量')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_config_'))
+    try:
+        _prepare_config_dir(work_dir, args.scale)
+        cases = {
+            'pure_python': (False, yaml.SafeLoader),
+            'libyaml': (False, config_module.YAML_LOADER),
+        }
+        results = {}
+        for name, (use_cache, loader) in cases.items():
+            results[name] = _measure(work_dir, args.repeat, use_cache, loader)
+
+        # 预热一次缓存后测量
+        ConfigManager(str(work_dir), use_cache=True)
+        results['cached'] = _measure(work_dir, args.repeat, True, config_module.YAML_LOADER)
+
+        baseline = statistics.median(results['pure_python'])
+        summary = {
+            'repeat': args.repeat,
+            'scale': args.scale,
+            'libyaml_available': hasattr(yaml, 'CSafeLoader'),
+            'median_ms': {k: round(statistics.median(v), 3) for k, v in results.items()},
+            'speedup': {k: round(baseline / statistics.median(v), 2) for k, v in results.items()},
+        }
+        print(json.dumps(summary, indent=2))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
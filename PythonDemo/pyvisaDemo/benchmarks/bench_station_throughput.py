@@ -0,0 +1,405 @@
+"""
+测试站吞吐量基准
+以仿真仪器驱动完整的 TestScheduler → TestEngine → 测试用例 → 驱动 调用链，
+按 products.yaml 中的产品组合投放被测件，统计每小时测试件数、各步骤耗时分位数、
+调度开销和内存增长，结果以JSON输出，并可与基线结果比较以发现性能回退。
+只有全部任务都通过的被测件计入吞吐量；有任务未通过时以退出码 2 结束（--allow-failures 时不检查），
+没有任何被测件通过时基准没有意义，总是以退出码 3 结束
+
+用法:
+    python benchmarks/bench_station_throughput.py --duts 100 --output result.json
+    python benchmarks/bench_station_throughput.py --duts 100 --baseline result.json
+    python benchmarks/bench_station_throughput.py --mix fiber_patch_cable:3,cwdm_mux:1 --backend scpi
+"""
+import argparse
+import gc
+import json
+import logging
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import ConfigManager, InstrumentManager, TestEngine, TestScheduler  # noqa: E402
+from drivers.clock import Clock, VirtualClock, use_clock  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# 与基线比较的指标: 名称 -> 是否越大越好
+COMPARED_METRICS = {
+    'duts_per_hour': True,
+    'wall_duts_per_hour': True,
+    'wall_ms_per_task': False,
+    'scheduler_overhead_ms_per_task': False,
+    'memory_growth_kb': False,
+}
+
+
+def _flow_wavelengths(flows: Dict) -> List[float]:
+    """所有测试流程参数中用到的波长(nm)"""
+    wavelengths = []
+    for flow in (flows.get('test_flows') or {}).values():
+        params = flow.get('parameters') or {}
+        wavelengths.extend(params.get('wavelengths') or [])
+        for key in ('wavelength', 'center_wavelength', 'default_wavelength'):
+            if isinstance(params.get(key), (int, float)):
+                wavelengths.append(params[key])
+    return wavelengths
+
+
+def _prepare_config_dir(target: Path, backend: str, clock: str):
+    """
+    复制配置目录，关闭结果保存和重试，并选择仿真后端
+
+    仿真激光器的波长范围放宽到覆盖各流程用到的全部波长（实际站点的光源组合覆盖这些波段），
+    否则超出范围的波长直接报错，基准测得的只是失败的任务
+    """
+    source = Path(__file__).parent.parent / 'config'
+    for filename in ('instruments.yaml', 'test_flows.yaml', 'products.yaml'):
+        shutil.copy(source / filename, target / filename)
+
+    with open(target / 'test_flows.yaml', encoding='utf-8') as f:
+        flows = yaml.safe_load(f)
+    wavelengths = _flow_wavelengths(flows)
+
+    with open(target / 'instruments.yaml', encoding='utf-8') as f:
+        instruments = yaml.safe_load(f)
+    for instrument in (instruments.get('instruments') or {}).values():
+        params = instrument.get('parameters') or {}
+        if instrument.get('driver') == 'laser_source' and params.get('wavelength_range') and wavelengths:
+            low, high = params['wavelength_range']
+            params['wavelength_range'] = [min(low, min(wavelengths)), max(high, max(wavelengths))]
+    settings = instruments.setdefault('visa_settings', {})
+    settings['simulation_backend'] = backend
+    settings['simulation_clock'] = clock
+    settings.setdefault('health_monitor', {})['enabled'] = False
+    with open(target / 'instruments.yaml', 'w', encoding='utf-8') as f:
+        yaml.safe_dump(instruments, f, allow_unicode=True, sort_keys=False)
+
+    scheduler = flows.setdefault('scheduler', {})
+    scheduler['max_retries'] = 0
+    scheduler['auto_save_results'] = False
+    with open(target / 'test_flows.yaml', 'w', encoding='utf-8') as f:
+        yaml.safe_dump(flows, f, allow_unicode=True, sort_keys=False)
+
+
+def _parse_mix(mix: Optional[str], config: ConfigManager) -> Dict[str, float]:
+    """
+    解析产品组合
+
+    未指定时使用 products.yaml 中所有测试流程均已定义的产品，权重相同
+    """
+    if mix:
+        weights = {}
+        for item in mix.split(','):
+            product_id, _, weight = item.partition(':')
+            if config.get_product_spec(product_id.strip()) is None:
+                raise SystemExit(f"未知产品: {product_id}")
+            weights[product_id.strip()] = float(weight or 1)
+        return weights
+
+    snapshot = config.snapshot
+    return {
+        product_id: 1.0 for product_id, spec in snapshot.product_specs.items()
+        if spec.test_requirements and all(f in snapshot.flow_specs for f in spec.test_requirements)
+    }
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    """计算 p50/p90/p99/max（毫秒）"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'p50_ms': round(pick(0.50) * 1000, 3),
+        'p90_ms': round(pick(0.90) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def _rss_kb() -> Optional[int]:
+    """进程峰值常驻内存(KB)"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def run_benchmark(duts: int, mix: Optional[str], backend: str, clock_mode: str,
+                  seed: int, warmup: int, trace_memory: bool) -> Dict:
+    """
+    执行一次吞吐量测试
+
+    Args:
+        duts: 被测件数量
+        mix: 产品组合，如 "fiber_patch_cable:3,cwdm_mux:1"
+        backend: 仿真后端 (driver / scpi)
+        clock_mode: 时钟 (virtual / real)
+        seed: 产品投放顺序的随机种子
+        warmup: 预热被测件数量（不计入统计）
+        trace_memory: 是否启用 tracemalloc 统计Python对象内存
+
+    Returns:
+        Dict: 基准结果
+    """
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_station_'))
+    clock = VirtualClock() if clock_mode == 'virtual' else Clock()
+    try:
+        _prepare_config_dir(work_dir, backend, clock_mode)
+        with use_clock(clock):
+            config = ConfigManager(str(work_dir), use_cache=False)
+            instruments = InstrumentManager(config, simulation_mode=True)
+            engine = TestEngine(config, instruments)
+            scheduler = TestScheduler(config, instruments, engine)
+
+            weights = _parse_mix(mix, config)
+            rng = random.Random(seed)
+            products = rng.choices(list(weights), weights=list(weights.values()), k=warmup + duts)
+
+            step_durations: Dict[str, List[float]] = {}
+            step_wall: Dict[str, List[float]] = {}
+            flow_durations: Dict[str, List[float]] = {}
+            flow_wall: List[float] = []
+            # 开始时间按 (流程结果, 步骤ID) 记录，同名步骤在不同任务中互不覆盖
+            step_started = {}
+            flow_started = {}
+            measuring = threading.Event()
+
+            def on_flow_start(result):
+                flow_started[id(result)] = time.perf_counter()
+
+            def on_step_start(step_id, step_name):
+                step_started[(id(engine.current_result), step_id)] = time.perf_counter()
+
+            def on_step_end(step_result):
+                started = step_started.pop((id(engine.current_result), step_result.step_id), None)
+                if measuring.is_set():
+                    step_durations.setdefault(step_result.name, []).append(step_result.duration)
+                    if started is not None:
+                        step_wall.setdefault(step_result.name, []).append(time.perf_counter() - started)
+
+            def on_flow_end(result):
+                started = flow_started.pop(id(result), None)
+                if measuring.is_set():
+                    flow_durations.setdefault(result.flow_id, []).append(result.duration)
+                    if started is not None:
+                        flow_wall.append(time.perf_counter() - started)
+
+            engine.register_callback('on_flow_start', on_flow_start)
+            engine.register_callback('on_step_start', on_step_start)
+            engine.register_callback('on_step_end', on_step_end)
+            engine.register_callback('on_flow_end', on_flow_end)
+            instruments.connect_all()
+
+            # 当前批次中尚未结束的任务
+            pending = set()
+            batch_done = threading.Event()
+            pending_lock = threading.Lock()
+
+            def on_task_done(task):
+                with pending_lock:
+                    pending.discard(task.task_id)
+                    if not pending:
+                        batch_done.set()
+
+            scheduler.register_callback('on_task_completed', on_task_done)
+            scheduler.register_callback('on_task_failed', on_task_done)
+            scheduler.register_callback('on_task_cancelled', on_task_done)
+
+            def run_batch(batch: List[str], prefix: str) -> List:
+                with pending_lock:
+                    batch_done.clear()
+                    task_ids = []
+                    for index, product_id in enumerate(batch):
+                        task_ids.extend(scheduler.add_product_test(product_id, f"{prefix}{index:06d}"))
+                    pending.update(task_ids)
+                    if not pending:
+                        batch_done.set()
+                batch_done.wait()
+                return [scheduler.get_task(task_id) for task_id in task_ids]
+
+            scheduler.start()
+            run_batch(products[:warmup], 'WARM')
+
+            gc.collect()
+            if trace_memory:
+                tracemalloc.start()
+            traced_start = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+            rss_start = _rss_kb()
+            measuring.set()
+            virtual_start = clock.monotonic()
+            wall_start = time.perf_counter()
+
+            tasks = run_batch(products[warmup:], 'SN')
+
+            wall_elapsed = time.perf_counter() - wall_start
+            sim_elapsed = clock.monotonic() - virtual_start
+            measuring.clear()
+            scheduler.stop()
+            gc.collect()
+            traced_end, traced_peak = tracemalloc.get_traced_memory() if trace_memory else (0, 0)
+            if trace_memory:
+                tracemalloc.stop()
+            rss_end = _rss_kb()
+            instruments.disconnect_all()
+
+        status_counts: Dict[str, int] = {}
+        dut_ok: Dict[str, bool] = {}
+        for task in tasks:
+            status_counts[task.status] = status_counts.get(task.status, 0) + 1
+            serial_number = task.product_info.get('serial_number')
+            dut_ok[serial_number] = dut_ok.get(serial_number, True) and task.status == 'completed'
+        completed_duts = sum(dut_ok.values())
+        task_count = max(len(tasks), 1)
+
+        metrics = {
+            'duts': duts,
+            'tasks': len(tasks),
+            'task_status': status_counts,
+            # 全部任务都通过的被测件，只有这些计入吞吐量
+            'completed_duts': completed_duts,
+            'simulated_seconds': round(sim_elapsed, 3),
+            'wall_seconds': round(wall_elapsed, 3),
+            'duts_per_hour': round(completed_duts / sim_elapsed * 3600, 2) if sim_elapsed > 0 else None,
+            'wall_duts_per_hour': (round(completed_duts / wall_elapsed * 3600, 2)
+                                   if wall_elapsed > 0 else None),
+            'wall_ms_per_task': round(wall_elapsed / task_count * 1000, 3),
+            # 真实时间中不属于测试流程本身的部分：任务出队、调度、回调和结果处理
+            # （调度器单线程执行任务，流程真实耗时之和不超过总耗时）
+            'scheduler_overhead_ms_per_task': round(
+                max(wall_elapsed - sum(flow_wall), 0.0) / task_count * 1000, 3),
+            'memory_growth_kb': (
+                round((traced_end - traced_start) / 1024, 1) if trace_memory
+                else (rss_end - rss_start if rss_start is not None else None)
+            ),
+            'traced_peak_kb': round(traced_peak / 1024, 1) if trace_memory else None,
+            # 步骤耗时：仿真时间（含仪器等待）与真实时间（软件栈自身开销）
+            'step_latency': {name: _percentiles(v) for name, v in sorted(step_durations.items())},
+            'step_wall_latency': {name: _percentiles(v) for name, v in sorted(step_wall.items())},
+            'flow_latency': {name: _percentiles(v) for name, v in sorted(flow_durations.items())},
+        }
+        return {
+            'benchmark': 'station_throughput',
+            'meta': {
+                'backend': backend,
+                'clock': clock_mode,
+                'seed': seed,
+                'warmup': warmup,
+                'mix': weights,
+                'memory_source': 'tracemalloc' if trace_memory else 'rss',
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'metrics': metrics,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare_with_baseline(result: Dict, baseline: Dict, tolerance: float,
+                          noise_ms: float = 0.5) -> Dict:
+    """
+    与基线结果比较
+
+    Args:
+        result: 本次结果
+        baseline: 基线结果
+        tolerance: 允许的相对退化比例
+        noise_ms: 毫秒级指标的绝对噪声阈值，变化小于该值时不视为退化
+
+    Returns:
+        Dict: {'regressions': [...], 'details': {指标: {...}}}
+    """
+    details = {}
+    regressions = []
+    current, reference = result['metrics'], baseline.get('metrics', {})
+
+    def check(name: str, value, base, higher_is_better: bool):
+        if value is None or base in (None, 0):
+            return
+        change = (value - base) / abs(base)
+        worse = -change if higher_is_better else change
+        details[name] = {'baseline': base, 'current': value, 'change': round(change, 4)}
+        if worse > tolerance and not (name.endswith('_ms') and abs(value - base) < noise_ms):
+            regressions.append(name)
+
+    for name, higher_is_better in COMPARED_METRICS.items():
+        check(name, current.get(name), reference.get(name), higher_is_better)
+    for section in ('step_latency', 'step_wall_latency', 'flow_latency'):
+        for name, stats in current.get(section, {}).items():
+            base = reference.get(section, {}).get(name, {})
+            check(f"{section}.{name}.p90_ms", stats.get('p90_ms'), base.get('p90_ms'), False)
+
+    return {'tolerance': tolerance, 'noise_ms': noise_ms, 'regressions': regressions, 'details': details}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试站吞吐量基准')
+    parser.add_argument('--duts', type=int, default=50, help='被测件数量')
+    parser.add_argument('--warmup', type=int, default=2, help='预热被测件数量')
+    parser.add_argument('--mix', default=None, help='产品组合，如 fiber_patch_cable:3,cwdm_mux:1')
+    parser.add_argument('--backend', choices=['driver', 'scpi'], default='driver', help='仿真后端')
+    parser.add_argument('--clock', choices=['virtual', 'real'], default='virtual', help='仿真时钟')
+    parser.add_argument('--seed', type=int, default=1, help='产品投放顺序的随机种子')
+    parser.add_argument('--trace-memory', action='store_true', help='使用tracemalloc统计内存增长')
+    parser.add_argument('--output', help='结果JSON文件路径')
+    parser.add_argument('--baseline', help='基线结果JSON文件路径')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='允许的相对退化比例')
+    parser.add_argument('--noise-ms', type=float, default=0.5, help='毫秒级指标的绝对噪声阈值')
+    parser.add_argument('--allow-failures', action='store_true', help='有任务未通过时不以非零退出码结束')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    result = run_benchmark(args.duts, args.mix, args.backend, args.clock, args.seed,
+                           args.warmup, args.trace_memory)
+
+    exit_code = 0
+    metrics = result['metrics']
+    if metrics['completed_duts'] == 0:
+        failed = {status: count for status, count in metrics['task_status'].items() if status != 'completed'}
+        print(f"没有被测件通过全部测试（{failed}），吞吐量为0，基准结果无效；"
+              f"请检查仿真配置和产品组合", file=sys.stderr)
+        exit_code = 3
+    elif not args.allow_failures and metrics['completed_duts'] < metrics['duts']:
+        failed = {status: count for status, count in metrics['task_status'].items() if status != 'completed'}
+        print(f"有任务未通过: {failed}，仅 {metrics['completed_duts']}/{metrics['duts']} 个被测件计入吞吐量",
+              file=sys.stderr)
+        exit_code = 2
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        result['comparison'] = compare_with_baseline(result, baseline, args.tolerance, args.noise_ms)
+        if result['comparison']['regressions']:
+            exit_code = exit_code or 1
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text, encoding='utf-8')
+    print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
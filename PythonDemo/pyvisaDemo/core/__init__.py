@@ -2,13 +2,23 @@
 核心模块初始化
 """
 from .config_manager import ConfigManager
+from .config_snapshot import ConfigSnapshot
+from .config_watcher import ConfigWatcher
+from .health_monitor import InstrumentHealthMonitor
 from .instrument_manager import InstrumentManager
 from .test_engine import TestEngine
 from .scheduler import TestScheduler
+from .metrics import MetricsRegistry, MetricsExporter, StationMetrics
 
 __all__ = [
     'ConfigManager',
+    'ConfigSnapshot',
+    'ConfigWatcher',
+    'InstrumentHealthMonitor',
     'InstrumentManager',
     'TestEngine',
-    'TestScheduler'
+    'TestScheduler',
+    'MetricsRegistry',
+    'MetricsExporter',
+    'StationMetrics'
 ]
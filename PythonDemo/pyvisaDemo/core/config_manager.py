@@ -4,21 +4,50 @@
 """
 import os
 import yaml
-from typing import Dict, Any, Optional, List
+import hashlib
+import pickle
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Callable, Tuple, Set, Iterator
 from pathlib import Path
 import logging
 import copy
 
+from .config_snapshot import (
+    ConfigSnapshot, InstrumentSpec, TestFlowSpec, ProductSpec, StationSpec, compile_config
+)
+
+# 优先使用libyaml的C实现解析
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# 解析缓存格式版本，缓存结构变化时递增
+_CACHE_VERSION = 1
+
+# 配置文件与内部属性的对应关系
+CONFIG_FILES = {
+    'instruments.yaml': '_instruments_config',
+    'test_flows.yaml': '_test_flows_config',
+    'products.yaml': '_products_config',
+}
+
+
+def _plain_copy(section) -> Dict:
+    """将快照中的配置节深拷贝为普通字典，调用方修改返回值不会影响已发布的快照"""
+    return {key: copy.deepcopy(value) for key, value in section.items()}
+
 
 class ConfigManager:
     """配置管理器"""
     
-    def __init__(self, config_dir: str = None):
+    def __init__(self, config_dir: str = None, cache_dir: str = None,
+                 use_cache: bool = True):
         """
         初始化配置管理器
         
         Args:
             config_dir: 配置文件目录路径
+            cache_dir: 解析缓存目录，默认为配置目录下的 .cache
+            use_cache: 是否使用解析缓存
         """
         if config_dir is None:
             # 默认使用项目根目录下的config文件夹
@@ -26,75 +55,415 @@ class ConfigManager:
         else:
             self.config_dir = Path(config_dir)
         
+        self.cache_dir = Path(cache_dir) if cache_dir else self.config_dir / '.cache'
+        self.use_cache = use_cache
+        
         self.logger = logging.getLogger(self.__class__.__name__)
         
         # 配置缓存
         self._instruments_config: Dict = {}
         self._test_flows_config: Dict = {}
         self._products_config: Dict = {}
+        self._snapshot: ConfigSnapshot = compile_config({}, {}, {})
+        
+        # 写操作锁（读取方直接使用快照，无需加锁）
+        self._lock = threading.RLock()
+        # 已加载文件的 (修改时间, 大小)，用于检测外部修改
+        self._file_stamps: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._reload_listeners: List[Callable] = []
+        
+        # 编辑事务状态
+        self._edit_depth = 0
+        self._dirty: Set[str] = set()
+        self._touched: Set[Tuple[str, str]] = set()
         
         # 加载所有配置
         self.reload_all()
     
     def reload_all(self):
         """重新加载所有配置文件"""
-        self._instruments_config = self._load_yaml('instruments.yaml')
-        self._test_flows_config = self._load_yaml('test_flows.yaml')
-        self._products_config = self._load_yaml('products.yaml')
+        with self._lock:
+            self._instruments_config = self._load_yaml('instruments.yaml')
+            self._test_flows_config = self._load_yaml('test_flows.yaml')
+            self._products_config = self._load_yaml('products.yaml')
+            self._rebuild_snapshot()
         self.logger.info("所有配置文件已加载")
     
-    def _load_yaml(self, filename: str) -> Dict:
+    def reload_files(self, filenames: List[str]) -> bool:
+        """
+        重新加载指定的配置文件
+        
+        文件解析在调用线程中完成且不持有锁；新快照只有在校验未引入新错误时
+        才会发布，否则保留当前配置
+        
+        Args:
+            filenames: 需要重新加载的文件名列表
+            
+        Returns:
+            bool: 新配置是否已发布
+        """
+        try:
+            loaded = {name: self._load_yaml(name, strict=True) for name in filenames}
+        except (OSError, yaml.YAMLError) as e:
+            self.logger.error(f"重新加载配置失败，保留当前配置: {e}")
+            return False
+        
+        with self._lock:
+            configs = {name: getattr(self, attr) for name, attr in CONFIG_FILES.items()}
+            configs.update(loaded)
+            snapshot = compile_config(
+                configs['instruments.yaml'],
+                configs['test_flows.yaml'],
+                configs['products.yaml'],
+                version=self._snapshot.version + 1
+            )
+            
+            current_errors = set(self.validate_config())
+            new_errors = [e for e in self.validate_config(snapshot) if e not in current_errors]
+            if new_errors:
+                for error in new_errors:
+                    self.logger.error(f"配置校验失败: {error}")
+                self.logger.error(f"配置未更新: {', '.join(filenames)}")
+                return False
+            
+            for name, attr in CONFIG_FILES.items():
+                setattr(self, attr, configs[name])
+            self._publish(snapshot)
+        
+        self.logger.info(f"配置已重新加载: {', '.join(filenames)} (版本 {snapshot.version})")
+        return True
+    
+    def get_changed_files(self) -> List[str]:
+        """
+        获取加载后被外部修改过的配置文件
+        
+        Returns:
+            List[str]: 文件名列表
+        """
+        return [name for name in CONFIG_FILES
+                if self._stat_file(name) != self._file_stamps.get(name)]
+    
+    def _stat_file(self, filename: str) -> Optional[Tuple[int, int]]:
+        """获取文件的 (修改时间, 大小)，文件不存在时返回None"""
+        try:
+            stat = (self.config_dir / filename).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def add_reload_listener(self, listener: Callable):
+        """
+        注册配置变更监听器
+        
+        Args:
+            listener: 回调函数 listener(old_snapshot, new_snapshot)
+        """
+        self._reload_listeners.append(listener)
+    
+    def _rebuild_snapshot(self):
+        """根据当前配置重新编译快照，编译完成后整体替换"""
+        snapshot = compile_config(
+            self._instruments_config,
+            self._test_flows_config,
+            self._products_config,
+            version=self._snapshot.version + 1
+        )
+        for error in snapshot.errors:
+            self.logger.warning(f"配置校验: {error}")
+        self._publish(snapshot)
+    
+    def _publish(self, snapshot: ConfigSnapshot):
+        """发布新快照并通知监听器"""
+        old = self._snapshot
+        self._snapshot = snapshot
+        for listener in self._reload_listeners:
+            try:
+                listener(old, snapshot)
+            except Exception as e:
+                self.logger.error(f"配置变更回调执行错误: {e}")
+    
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """获取当前配置快照"""
+        return self._snapshot
+    
+    def _load_yaml(self, filename: str, strict: bool = False) -> Dict:
         """
         加载YAML配置文件
         
         Args:
             filename: 文件名
+            strict: 为True时文件缺失或解析错误直接抛出异常
             
         Returns:
             Dict: 配置字典
         """
         filepath = self.config_dir / filename
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                self.logger.debug(f"已加载配置: {filename}")
-                return config or {}
+            stat = filepath.stat()
+            self._file_stamps[filename] = (stat.st_mtime_ns, stat.st_size)
+            cached = self._read_cache(filename) if self.use_cache else None
+            
+            # 修改时间和大小未变，直接使用缓存
+            if (cached is not None and cached['mtime_ns'] == stat.st_mtime_ns
+                    and cached['size'] == stat.st_size):
+                self.logger.debug(f"已加载配置(缓存): {filename}")
+                return cached['data']
+            
+            raw = filepath.read_bytes()
+            digest = hashlib.sha1(raw).hexdigest()
+            
+            # 文件被touch但内容未变，刷新缓存时间戳即可
+            if cached is not None and cached['sha1'] == digest:
+                config = cached['data']
+            else:
+                config = yaml.load(raw.decode('utf-8'), Loader=YAML_LOADER) or {}
+            
+            if self.use_cache:
+                self._write_cache(filename, {
+                    'version': _CACHE_VERSION,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'sha1': digest,
+                    'data': config
+                })
+            self.logger.debug(f"已加载配置: {filename}")
+            return config
         except FileNotFoundError:
+            self._file_stamps[filename] = None
+            if strict:
+                raise
             self.logger.warning(f"配置文件不存在: {filepath}")
             return {}
         except yaml.YAMLError as e:
+            if strict:
+                raise
             self.logger.error(f"YAML解析错误 {filename}: {e}")
             return {}
     
-    def _save_yaml(self, filename: str, data: Dict):
+    def _cache_path(self, filename: str) -> Path:
+        """获取解析缓存文件路径"""
+        return self.cache_dir / f"{filename}.pickle"
+    
+    def _read_cache(self, filename: str) -> Optional[Dict]:
         """
-        保存YAML配置文件
+        读取解析缓存
+        
+        Args:
+            filename: 配置文件名
+            
+        Returns:
+            Dict: 缓存条目，不存在或已失效时返回None
+        """
+        try:
+            with open(self._cache_path(filename), 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.debug(f"解析缓存不可用 {filename}: {e}")
+            return None
+        if not isinstance(entry, dict) or entry.get('version') != _CACHE_VERSION:
+            return None
+        return entry
+    
+    def _write_cache(self, filename: str, entry: Dict):
+        """
+        写入解析缓存（先写临时文件再替换，避免并发进程读到半个文件）
+        
+        Args:
+            filename: 配置文件名
+            entry: 缓存条目
+        """
+        cache_path = self._cache_path(filename)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            self.logger.debug(f"写入解析缓存失败 {filename}: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+    
+    def clear_cache(self):
+        """删除所有解析缓存"""
+        for filename in ('instruments.yaml', 'test_flows.yaml', 'products.yaml'):
+            try:
+                self._cache_path(filename).unlink()
+            except FileNotFoundError:
+                pass
+    
+    def _write_temp(self, filename: str, data: Dict) -> Path:
+        """
+        将配置写入同目录下的临时文件并同步到磁盘
         
         Args:
             filename: 文件名
             data: 配置数据
+            
+        Returns:
+            Path: 临时文件路径
         """
-        filepath = self.config_dir / filename
+        tmp_path = self.config_dir / f".{filename}.{os.getpid()}.tmp"
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 yaml.dump(data, f, default_flow_style=False, allow_unicode=True, 
                          sort_keys=False, indent=2)
-                self.logger.info(f"配置已保存: {filename}")
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+        return tmp_path
+    
+    def _save_files(self, filenames: List[str]):
+        """
+        原子地保存多个配置文件
+        
+        先将所有文件写入临时文件并fsync，全部成功后再逐个替换，
+        任何时刻崩溃都不会留下被截断的配置文件
+        
+        Args:
+            filenames: 文件名列表
+        """
+        tmp_paths: Dict[str, Path] = {}
+        try:
+            for filename in filenames:
+                tmp_paths[filename] = self._write_temp(
+                    filename, getattr(self, CONFIG_FILES[filename])
+                )
         except Exception as e:
-            self.logger.error(f"保存配置失败 {filename}: {e}")
+            for tmp_path in tmp_paths.values():
+                try:
+                    tmp_path.unlink()
+                except OSError:
+                    pass
+            self.logger.error(f"保存配置失败: {e}")
             raise
+        
+        for filename, tmp_path in tmp_paths.items():
+            os.replace(tmp_path, self.config_dir / filename)
+            # 记录自身写入后的时间戳，避免文件监视器重复加载
+            self._file_stamps[filename] = self._stat_file(filename)
+            self.logger.info(f"配置已保存: {filename}")
+        self._fsync_dir()
+    
+    def _fsync_dir(self):
+        """同步配置目录项，保证重命名落盘（Windows不支持，忽略）"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        try:
+            fd = os.open(self.config_dir, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
+    def _save_yaml(self, filename: str, data: Dict):
+        """
+        保存YAML配置文件（原子替换）
+        
+        Args:
+            filename: 文件名
+            data: 配置数据
+        """
+        with self._lock:
+            setattr(self, CONFIG_FILES[filename], data)
+            self._save_files([filename])
+    
+    # ========== 编辑事务 ==========
+    
+    @contextmanager
+    def edit(self) -> Iterator['ConfigManager']:
+        """
+        配置编辑事务
+        
+        事务内的所有修改只作用于内存，退出时每个被修改的文件只写入一次，
+        并发布一次新快照；事务内抛出异常时全部修改回滚。可嵌套，
+        内层事务并入最外层事务提交
+        
+        用法:
+            with config.edit():
+                for i in range(200):
+                    config.add_instrument(...)
+        
+        Yields:
+            ConfigManager: 配置管理器自身
+        """
+        with self._lock:
+            if self._edit_depth:
+                self._edit_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._edit_depth -= 1
+                return
+            
+            backup = {attr: getattr(self, attr) for attr in CONFIG_FILES.values()}
+            self._edit_depth = 1
+            self._dirty = set()
+            self._touched = set()
+            try:
+                yield self
+                dirty = [name for name in CONFIG_FILES if name in self._dirty]
+                if dirty:
+                    self._save_files(dirty)
+                    self._rebuild_snapshot()
+            except BaseException:
+                for attr, value in backup.items():
+                    setattr(self, attr, value)
+                raise
+            finally:
+                self._edit_depth = 0
+                self._dirty = set()
+                self._touched = set()
+    
+    def _writable_section(self, filename: str, key: str) -> Dict:
+        """
+        获取可在当前事务中修改的配置段
+        
+        采用写时复制：每个文件和配置段在一个事务内只复制一次，
+        已发布的快照和回滚备份不受影响
+        
+        Args:
+            filename: 文件名
+            key: 配置段名称
+            
+        Returns:
+            Dict: 可修改的配置段
+        """
+        attr = CONFIG_FILES[filename]
+        if filename not in self._dirty:
+            setattr(self, attr, dict(getattr(self, attr)))
+            self._dirty.add(filename)
+        config = getattr(self, attr)
+        if (filename, key) not in self._touched:
+            config[key] = dict(config.get(key) or {})
+            self._touched.add((filename, key))
+        return config[key]
     
     # ========== 仪器配置 ==========
     
     @property
     def instruments(self) -> Dict:
         """获取仪器配置"""
-        return self._instruments_config.get('instruments', {})
+        return _plain_copy(self._snapshot.instruments)
     
     @property
     def visa_settings(self) -> Dict:
         """获取VISA设置"""
-        return self._instruments_config.get('visa_settings', {})
+        return _plain_copy(self._snapshot.visa_settings)
     
     def get_instrument_config(self, instrument_id: str) -> Optional[Dict]:
         """
@@ -106,11 +475,27 @@ class ConfigManager:
         Returns:
             Dict: 仪器配置
         """
-        return self.instruments.get(instrument_id)
+        return copy.deepcopy(self._snapshot.instruments.get(instrument_id))
+    
+    def get_instrument_spec(self, instrument_id: str) -> Optional[InstrumentSpec]:
+        """获取编译后的仪器配置"""
+        return self._snapshot.instrument_specs.get(instrument_id)
     
     def get_enabled_instruments(self) -> Dict:
         """获取所有已启用的仪器"""
-        return {k: v for k, v in self.instruments.items() if v.get('enabled', True)}
+        return _plain_copy(self._snapshot.enabled_instruments)
+    
+    def get_instrument_flows(self, instrument_id: str) -> List[str]:
+        """
+        获取使用指定仪器的测试流程
+        
+        Args:
+            instrument_id: 仪器ID
+            
+        Returns:
+            List[str]: 测试流程ID列表
+        """
+        return list(self._snapshot.instrument_flows.get(instrument_id, ()))
     
     def update_instrument_config(self, instrument_id: str, config: Dict):
         """
@@ -120,10 +505,8 @@ class ConfigManager:
             instrument_id: 仪器ID
             config: 新配置
         """
-        if 'instruments' not in self._instruments_config:
-            self._instruments_config['instruments'] = {}
-        self._instruments_config['instruments'][instrument_id] = config
-        self._save_yaml('instruments.yaml', self._instruments_config)
+        with self.edit():
+            self._writable_section('instruments.yaml', 'instruments')[instrument_id] = config
     
     def add_instrument(self, instrument_id: str, name: str, driver: str, 
                       resource_string: str, **kwargs):
@@ -149,21 +532,21 @@ class ConfigManager:
     
     def remove_instrument(self, instrument_id: str):
         """删除仪器配置"""
-        if instrument_id in self._instruments_config.get('instruments', {}):
-            del self._instruments_config['instruments'][instrument_id]
-            self._save_yaml('instruments.yaml', self._instruments_config)
+        with self.edit():
+            if instrument_id in (self._instruments_config.get('instruments') or {}):
+                del self._writable_section('instruments.yaml', 'instruments')[instrument_id]
     
     # ========== 测试流程配置 ==========
     
     @property
     def test_flows(self) -> Dict:
         """获取测试流程配置"""
-        return self._test_flows_config.get('test_flows', {})
+        return _plain_copy(self._snapshot.test_flows)
     
     @property
     def scheduler_config(self) -> Dict:
         """获取调度器配置"""
-        return self._test_flows_config.get('scheduler', {})
+        return _plain_copy(self._snapshot.scheduler_config)
     
     def get_test_flow(self, flow_id: str) -> Optional[Dict]:
         """
@@ -175,11 +558,55 @@ class ConfigManager:
         Returns:
             Dict: 流程配置
         """
-        return self.test_flows.get(flow_id)
+        return copy.deepcopy(self._snapshot.test_flows.get(flow_id))
+    
+    def get_test_flow_spec(self, flow_id: str) -> Optional[TestFlowSpec]:
+        """获取编译后的测试流程配置"""
+        return self._snapshot.flow_specs.get(flow_id)
     
     def get_enabled_test_flows(self) -> Dict:
         """获取所有已启用的测试流程"""
-        return {k: v for k, v in self.test_flows.items() if v.get('enabled', True)}
+        return _plain_copy(self._snapshot.enabled_test_flows)
+    
+    def get_flow_instruments(self, flow_id: str) -> List[str]:
+        """
+        获取测试流程所需的仪器
+        
+        Args:
+            flow_id: 流程ID
+            
+        Returns:
+            List[str]: 仪器ID列表
+        """
+        return list(self._snapshot.flow_instruments.get(flow_id, ()))
+    
+    def get_flow_optional_instruments(self, flow_id: str) -> List[str]:
+        """
+        获取测试流程的可选仪器中已配置并启用的仪器
+        
+        Args:
+            flow_id: 流程ID
+            
+        Returns:
+            List[str]: 仪器ID列表
+        """
+        spec = self._snapshot.flow_specs.get(flow_id)
+        if spec is None:
+            return []
+        enabled = self._snapshot.enabled_instruments
+        return [i for i in spec.instruments_optional if i in enabled]
+    
+    def get_flow_products(self, flow_id: str) -> List[str]:
+        """
+        获取需要执行指定测试流程的产品
+        
+        Args:
+            flow_id: 流程ID
+            
+        Returns:
+            List[str]: 产品ID列表
+        """
+        return list(self._snapshot.flow_products.get(flow_id, ()))
     
     def update_test_flow(self, flow_id: str, config: Dict):
         """
@@ -189,10 +616,8 @@ class ConfigManager:
             flow_id: 流程ID
             config: 新配置
         """
-        if 'test_flows' not in self._test_flows_config:
-            self._test_flows_config['test_flows'] = {}
-        self._test_flows_config['test_flows'][flow_id] = config
-        self._save_yaml('test_flows.yaml', self._test_flows_config)
+        with self.edit():
+            self._writable_section('test_flows.yaml', 'test_flows')[flow_id] = config
     
     def create_test_flow(self, flow_id: str, name: str, test_class: str,
                         instruments_required: List[str], steps: List[Dict], **kwargs):
@@ -224,12 +649,12 @@ class ConfigManager:
     @property
     def products(self) -> Dict:
         """获取产品配置"""
-        return self._products_config.get('products', {})
+        return _plain_copy(self._snapshot.products)
     
     @property
     def test_stations(self) -> Dict:
         """获取测试站点配置"""
-        return self._products_config.get('test_stations', {})
+        return _plain_copy(self._snapshot.test_stations)
     
     def get_product_config(self, product_id: str) -> Optional[Dict]:
         """
@@ -241,7 +666,11 @@ class ConfigManager:
         Returns:
             Dict: 产品配置
         """
-        return self.products.get(product_id)
+        return copy.deepcopy(self._snapshot.products.get(product_id))
+    
+    def get_product_spec(self, product_id: str) -> Optional[ProductSpec]:
+        """获取编译后的产品配置"""
+        return self._snapshot.product_specs.get(product_id)
     
     def get_product_test_requirements(self, product_id: str) -> List[str]:
         """
@@ -253,10 +682,7 @@ class ConfigManager:
         Returns:
             List[str]: 需要执行的测试流程ID列表
         """
-        product = self.get_product_config(product_id)
-        if product:
-            return product.get('test_requirements', [])
-        return []
+        return list(self._snapshot.product_flows.get(product_id, ()))
     
     def get_product_limits(self, product_id: str) -> Dict:
         """
@@ -268,36 +694,69 @@ class ConfigManager:
         Returns:
             Dict: 限值配置
         """
-        product = self.get_product_config(product_id)
-        if product:
-            return product.get('limits', {})
+        product = self._snapshot.products.get(product_id)
+        if isinstance(product, dict):
+            return copy.deepcopy(product.get('limits') or {})
         return {}
     
+    def get_station_spec(self, station_id: str) -> Optional[StationSpec]:
+        """获取编译后的测试站点配置"""
+        return self._snapshot.station_specs.get(station_id)
+    
+    def get_station_products(self, station_id: str) -> List[str]:
+        """
+        获取测试站点支持的产品
+        
+        Args:
+            station_id: 站点ID
+            
+        Returns:
+            List[str]: 产品ID列表
+        """
+        return list(self._snapshot.station_products.get(station_id, ()))
+    
+    def get_product_stations(self, product_id: str) -> List[str]:
+        """
+        获取支持指定产品的测试站点
+        
+        Args:
+            product_id: 产品ID
+            
+        Returns:
+            List[str]: 站点ID列表
+        """
+        return list(self._snapshot.product_stations.get(product_id, ()))
+    
     # ========== 辅助方法 ==========
     
-    def validate_config(self) -> List[str]:
+    def validate_config(self, snapshot: ConfigSnapshot = None) -> List[str]:
         """
         验证配置完整性
         
+        Args:
+            snapshot: 待验证的配置快照，默认为当前快照
+            
         Returns:
             List[str]: 错误消息列表
         """
-        errors = []
+        snapshot = snapshot or self._snapshot
+        errors = list(snapshot.errors)
         
         # 检查测试流程所需的仪器是否都已配置
-        for flow_id, flow in self.test_flows.items():
-            if not flow.get('enabled', True):
+        for flow_id, flow in snapshot.flow_specs.items():
+            if not flow.enabled:
                 continue
-            for instr_id in flow.get('instruments_required', []):
-                if instr_id not in self.instruments:
+            for instr_id in flow.instruments_required:
+                instrument = snapshot.instrument_specs.get(instr_id)
+                if instrument is None:
                     errors.append(f"测试流程 '{flow_id}' 需要的仪器 '{instr_id}' 未配置")
-                elif not self.instruments[instr_id].get('enabled', True):
+                elif not instrument.enabled:
                     errors.append(f"测试流程 '{flow_id}' 需要的仪器 '{instr_id}' 未启用")
         
         # 检查产品测试需求对应的流程是否存在
-        for product_id, product in self.products.items():
-            for flow_id in product.get('test_requirements', []):
-                if flow_id not in self.test_flows:
+        for product_id, product in snapshot.product_specs.items():
+            for flow_id in product.test_requirements:
+                if flow_id not in snapshot.flow_specs:
                     errors.append(f"产品 '{product_id}' 需要的测试流程 '{flow_id}' 不存在")
         
         return errors
@@ -317,26 +776,81 @@ class ConfigManager:
         with open(filepath, 'w', encoding='utf-8') as f:
             yaml.dump(combined, f, default_flow_style=False, allow_unicode=True)
     
-    def import_config(self, filepath: str):
+    def import_config(self, filepath: str, dry_run: bool = False) -> Dict[str, Dict[str, List[str]]]:
         """
         从文件导入配置
         
+        与当前配置逐项比较，只写入内容有变化的文件，所有文件在同一事务中提交
+        
         Args:
             filepath: 配置文件路径
+            dry_run: 为True时只计算差异，不修改配置
+            
+        Returns:
+            Dict: 各文件的差异 {文件名: {'added': [...], 'removed': [...], 'changed': [...]}}
         """
         with open(filepath, 'r', encoding='utf-8') as f:
-            combined = yaml.safe_load(f)
+            combined = yaml.load(f, Loader=YAML_LOADER) or {}
         
-        if 'instruments' in combined:
-            self._instruments_config = combined['instruments']
-            self._save_yaml('instruments.yaml', self._instruments_config)
+        sections = {
+            'instruments': 'instruments.yaml',
+            'test_flows': 'test_flows.yaml',
+            'products': 'products.yaml'
+        }
+        diff: Dict[str, Dict[str, List[str]]] = {}
         
-        if 'test_flows' in combined:
-            self._test_flows_config = combined['test_flows']
-            self._save_yaml('test_flows.yaml', self._test_flows_config)
+        with self.edit():
+            for section, filename in sections.items():
+                if section not in combined:
+                    continue
+                attr = CONFIG_FILES[filename]
+                new_config = combined[section] or {}
+                file_diff = self._diff_config(getattr(self, attr), new_config)
+                if not any(file_diff.values()):
+                    continue
+                diff[filename] = file_diff
+                if not dry_run:
+                    setattr(self, attr, new_config)
+                    self._dirty.add(filename)
+        
+        for filename, file_diff in diff.items():
+            self.logger.info(
+                f"导入 {filename}: 新增 {len(file_diff['added'])}, "
+                f"删除 {len(file_diff['removed'])}, 修改 {len(file_diff['changed'])}"
+            )
+        self.logger.info("配置导入完成" if not dry_run else "配置导入预览完成")
+        return diff
+    
+    @staticmethod
+    def _diff_config(old: Dict, new: Dict) -> Dict[str, List[str]]:
+        """
+        比较两份配置文件内容
         
-        if 'products' in combined:
-            self._products_config = combined['products']
-            self._save_yaml('products.yaml', self._products_config)
+        映射类型的配置段按条目比较（如 instruments.osa），其余按整段比较
         
-        self.logger.info("配置导入完成")
+        Args:
+            old: 当前配置
+            new: 新配置
+            
+        Returns:
+            Dict[str, List[str]]: {'added': [...], 'removed': [...], 'changed': [...]}
+        """
+        diff = {'added': [], 'removed': [], 'changed': []}
+        for key in list(old) + [k for k in new if k not in old]:
+            if key not in new:
+                diff['removed'].append(key)
+            elif key not in old:
+                diff['added'].append(key)
+            elif isinstance(old[key], dict) and isinstance(new[key], dict):
+                old_section, new_section = old[key], new[key]
+                for entry in list(old_section) + [k for k in new_section if k not in old_section]:
+                    path = f"{key}.{entry}"
+                    if entry not in new_section:
+                        diff['removed'].append(path)
+                    elif entry not in old_section:
+                        diff['added'].append(path)
+                    elif old_section[entry] != new_section[entry]:
+                        diff['changed'].append(path)
+            elif old[key] != new[key]:
+                diff['changed'].append(key)
+        return diff
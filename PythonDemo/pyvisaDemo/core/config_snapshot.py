@@ -0,0 +1,278 @@
+"""
+配置快照
+将加载的YAML配置编译为不可变、经过校验的数据结构，并预先建立反向索引，
+供仪器管理器和调度器在热路径中直接查表
+"""
+import copy
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Tuple
+
+
+_EMPTY: Mapping = MappingProxyType({})
+
+
+@dataclass(frozen=True, slots=True)
+class InstrumentSpec:
+    """仪器配置"""
+    instrument_id: str
+    name: str
+    driver: str
+    resource_string: str
+    timeout: int
+    enabled: bool
+    parameters: Mapping[str, Any]
+
+
+@dataclass(frozen=True, slots=True)
+class TestFlowSpec:
+    """测试流程配置"""
+    flow_id: str
+    name: str
+    description: str
+    enabled: bool
+    test_class: str
+    instruments_required: Tuple[str, ...]
+    parameters: Mapping[str, Any]
+    pass_criteria: Mapping[str, Any]
+    steps: Tuple[Mapping[str, Any], ...]
+    # 可选仪器：测试站配置并启用时才连接，测试用例据此选择测量方式
+    instruments_optional: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class ProductSpec:
+    """产品配置"""
+    product_id: str
+    name: str
+    category: str
+    test_requirements: Tuple[str, ...]
+    limits: Mapping[str, Any]
+
+
+@dataclass(frozen=True, slots=True)
+class StationSpec:
+    """测试站点配置"""
+    station_id: str
+    name: str
+    location: str
+    supported_products: Tuple[str, ...]
+    instruments: Tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigSnapshot:
+    """
+    编译后的配置快照
+
+    快照一经创建不再修改，重新加载配置时整体替换，
+    读取方持有的旧快照在其生命周期内保持一致
+    """
+    version: int
+
+    # 原始配置（深拷贝，按文件划分）
+    instruments_config: Dict
+    test_flows_config: Dict
+    products_config: Dict
+
+    # 原始配置段
+    instruments: Mapping[str, Dict]
+    visa_settings: Mapping[str, Any]
+    test_flows: Mapping[str, Dict]
+    scheduler_config: Mapping[str, Any]
+    products: Mapping[str, Dict]
+    test_stations: Mapping[str, Dict]
+
+    # 编译后的配置对象
+    instrument_specs: Mapping[str, InstrumentSpec]
+    flow_specs: Mapping[str, TestFlowSpec]
+    product_specs: Mapping[str, ProductSpec]
+    station_specs: Mapping[str, StationSpec]
+
+    # 预计算视图和反向索引
+    enabled_instruments: Mapping[str, Dict]
+    enabled_test_flows: Mapping[str, Dict]
+    flow_instruments: Mapping[str, Tuple[str, ...]]
+    instrument_flows: Mapping[str, Tuple[str, ...]]
+    product_flows: Mapping[str, Tuple[str, ...]]
+    flow_products: Mapping[str, Tuple[str, ...]]
+    station_products: Mapping[str, Tuple[str, ...]]
+    product_stations: Mapping[str, Tuple[str, ...]]
+
+    # 编译过程中发现的结构错误
+    errors: Tuple[str, ...]
+
+
+def _section(config: Dict, key: str, filename: str, errors: List[str]) -> Dict:
+    """取出配置段并检查其类型"""
+    section = config.get(key) or {}
+    if not isinstance(section, dict):
+        errors.append(f"{filename} 中的 '{key}' 必须是映射类型")
+        return {}
+    return section
+
+
+def _as_tuple(value: Any) -> Tuple:
+    """将列表配置项转换为元组"""
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return (value,)
+
+
+def _deep_freeze(value: Any) -> Any:
+    """递归冻结配置值：映射转为只读映射，列表转为元组，得到与原始配置段不共享的只读副本"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _deep_freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_deep_freeze(v) for v in value)
+    return value
+
+
+def _freeze_index(index: Dict[str, List[str]]) -> Mapping[str, Tuple[str, ...]]:
+    return MappingProxyType({k: tuple(v) for k, v in index.items()})
+
+
+def compile_config(instruments_config: Dict, test_flows_config: Dict,
+                   products_config: Dict, version: int = 0) -> ConfigSnapshot:
+    """
+    编译配置快照
+
+    Args:
+        instruments_config: instruments.yaml 内容
+        test_flows_config: test_flows.yaml 内容
+        products_config: products.yaml 内容
+        version: 快照版本号
+
+    Returns:
+        ConfigSnapshot: 配置快照
+    """
+    instruments_config = copy.deepcopy(instruments_config or {})
+    test_flows_config = copy.deepcopy(test_flows_config or {})
+    products_config = copy.deepcopy(products_config or {})
+    errors: List[str] = []
+
+    instruments = _section(instruments_config, 'instruments', 'instruments.yaml', errors)
+    visa_settings = _section(instruments_config, 'visa_settings', 'instruments.yaml', errors)
+    test_flows = _section(test_flows_config, 'test_flows', 'test_flows.yaml', errors)
+    scheduler_config = _section(test_flows_config, 'scheduler', 'test_flows.yaml', errors)
+    products = _section(products_config, 'products', 'products.yaml', errors)
+    test_stations = _section(products_config, 'test_stations', 'products.yaml', errors)
+
+    # ========== 仪器 ==========
+    instrument_specs: Dict[str, InstrumentSpec] = {}
+    for instr_id, cfg in instruments.items():
+        if not isinstance(cfg, dict):
+            errors.append(f"仪器 '{instr_id}' 的配置必须是映射类型")
+            continue
+        if not cfg.get('driver'):
+            errors.append(f"仪器 '{instr_id}' 缺少 driver 配置")
+        if not cfg.get('resource_string'):
+            errors.append(f"仪器 '{instr_id}' 缺少 resource_string 配置")
+        instrument_specs[instr_id] = InstrumentSpec(
+            instrument_id=instr_id,
+            name=cfg.get('name', instr_id),
+            driver=cfg.get('driver', ''),
+            resource_string=cfg.get('resource_string', ''),
+            timeout=cfg.get('timeout', 5000),
+            enabled=bool(cfg.get('enabled', True)),
+            parameters=_deep_freeze(cfg.get('parameters') or {})
+        )
+
+    # ========== 测试流程 ==========
+    flow_specs: Dict[str, TestFlowSpec] = {}
+    instrument_flows: Dict[str, List[str]] = {}
+    for flow_id, cfg in test_flows.items():
+        if not isinstance(cfg, dict):
+            errors.append(f"测试流程 '{flow_id}' 的配置必须是映射类型")
+            continue
+        if not cfg.get('test_class'):
+            errors.append(f"测试流程 '{flow_id}' 缺少 test_class 配置")
+        required = _as_tuple(cfg.get('instruments_required'))
+        flow_specs[flow_id] = TestFlowSpec(
+            flow_id=flow_id,
+            name=cfg.get('name', flow_id),
+            description=cfg.get('description', ''),
+            enabled=bool(cfg.get('enabled', True)),
+            test_class=cfg.get('test_class', ''),
+            instruments_required=required,
+            parameters=_deep_freeze(cfg.get('parameters') or {}),
+            pass_criteria=_deep_freeze(cfg.get('pass_criteria') or {}),
+            steps=_deep_freeze(cfg.get('steps') or []),
+            instruments_optional=_as_tuple(cfg.get('instruments_optional'))
+        )
+        for instr_id in required:
+            instrument_flows.setdefault(instr_id, []).append(flow_id)
+
+    # ========== 产品 ==========
+    product_specs: Dict[str, ProductSpec] = {}
+    flow_products: Dict[str, List[str]] = {}
+    for product_id, cfg in products.items():
+        if not isinstance(cfg, dict):
+            errors.append(f"产品 '{product_id}' 的配置必须是映射类型")
+            continue
+        requirements = _as_tuple(cfg.get('test_requirements'))
+        product_specs[product_id] = ProductSpec(
+            product_id=product_id,
+            name=cfg.get('name', product_id),
+            category=cfg.get('category', ''),
+            test_requirements=requirements,
+            limits=_deep_freeze(cfg.get('limits') or {})
+        )
+        for flow_id in requirements:
+            flow_products.setdefault(flow_id, []).append(product_id)
+
+    # ========== 测试站点 ==========
+    station_specs: Dict[str, StationSpec] = {}
+    product_stations: Dict[str, List[str]] = {}
+    for station_id, cfg in test_stations.items():
+        if not isinstance(cfg, dict):
+            errors.append(f"测试站点 '{station_id}' 的配置必须是映射类型")
+            continue
+        supported = _as_tuple(cfg.get('supported_products'))
+        station_specs[station_id] = StationSpec(
+            station_id=station_id,
+            name=cfg.get('name', station_id),
+            location=cfg.get('location', ''),
+            supported_products=supported,
+            instruments=_as_tuple(cfg.get('instruments'))
+        )
+        for product_id in supported:
+            product_stations.setdefault(product_id, []).append(station_id)
+
+    return ConfigSnapshot(
+        version=version,
+        instruments_config=instruments_config,
+        test_flows_config=test_flows_config,
+        products_config=products_config,
+        instruments=MappingProxyType(instruments),
+        visa_settings=MappingProxyType(visa_settings),
+        test_flows=MappingProxyType(test_flows),
+        scheduler_config=MappingProxyType(scheduler_config),
+        products=MappingProxyType(products),
+        test_stations=MappingProxyType(test_stations),
+        instrument_specs=MappingProxyType(instrument_specs),
+        flow_specs=MappingProxyType(flow_specs),
+        product_specs=MappingProxyType(product_specs),
+        station_specs=MappingProxyType(station_specs),
+        enabled_instruments=MappingProxyType({
+            k: instruments[k] for k, spec in instrument_specs.items() if spec.enabled
+        }),
+        enabled_test_flows=MappingProxyType({
+            k: test_flows[k] for k, spec in flow_specs.items() if spec.enabled
+        }),
+        flow_instruments=MappingProxyType({
+            k: spec.instruments_required for k, spec in flow_specs.items()
+        }),
+        instrument_flows=_freeze_index(instrument_flows),
+        product_flows=MappingProxyType({
+            k: spec.test_requirements for k, spec in product_specs.items()
+        }),
+        flow_products=_freeze_index(flow_products),
+        station_products=MappingProxyType({
+            k: spec.supported_products for k, spec in station_specs.items()
+        }),
+        product_stations=_freeze_index(product_stations),
+        errors=tuple(errors)
+    )
@@ -0,0 +1,100 @@
+"""
+配置文件监视器
+在后台线程中轮询配置文件的修改时间，检测到变化后重新解析、校验，
+并通过 ConfigManager 原子地发布新的配置快照
+"""
+import logging
+import threading
+from typing import Optional
+
+from .config_manager import ConfigManager
+
+
+class ConfigWatcher:
+    """配置文件监视器"""
+
+    def __init__(self, config_manager: ConfigManager, interval: float = 1.0,
+                 settle_time: float = 0.2):
+        """
+        初始化监视器
+
+        Args:
+            config_manager: 配置管理器
+            interval: 轮询间隔(秒)
+            settle_time: 检测到变化后等待文件写入完成的时间(秒)
+        """
+        self.config_manager = config_manager
+        self.interval = interval
+        self.settle_time = settle_time
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reload_count = 0
+        self.rejected_count = 0
+
+    def start(self):
+        """启动监视线程"""
+        if self.is_running:
+            self.logger.warning("配置监视器已在运行")
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='ConfigWatcher', daemon=True)
+        self._thread.start()
+        self.logger.info(f"配置监视器已启动，轮询间隔 {self.interval}s")
+
+    def stop(self, timeout: float = 5):
+        """
+        停止监视线程
+
+        Args:
+            timeout: 等待线程退出的时间(秒)
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.logger.info("配置监视器已停止")
+
+    def _run(self):
+        """监视线程主循环"""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check_now()
+            except Exception as e:
+                self.logger.error(f"配置监视错误: {e}")
+
+    def check_now(self) -> bool:
+        """
+        立即检查一次配置文件
+
+        Returns:
+            bool: 是否发布了新配置
+        """
+        changed = self.config_manager.get_changed_files()
+        if not changed:
+            return False
+
+        # 编辑器保存文件可能分多次写入，稍等后再读取
+        if self.settle_time and self._stop_event.wait(self.settle_time):
+            return False
+
+        self.logger.info(f"检测到配置文件变化: {', '.join(changed)}")
+        if self.config_manager.reload_files(changed):
+            self.reload_count += 1
+            return True
+        self.rejected_count += 1
+        return False
+
+    @property
+    def is_running(self) -> bool:
+        """检查监视器是否运行中"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
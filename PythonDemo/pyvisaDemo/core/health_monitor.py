@@ -0,0 +1,302 @@
+"""
+仪器健康监视器
+在后台线程中按周期对已连接仪器发送轻量查询，记录响应时间和错误历史，
+连接中断时按指数退避自动重连，状态查询直接读取缓存而不访问总线
+"""
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .instrument_manager import InstrumentManager
+
+
+# 健康状态
+STATUS_UNKNOWN = 'unknown'
+STATUS_OK = 'ok'
+STATUS_DEGRADED = 'degraded'
+STATUS_DOWN = 'down'
+
+
+@dataclass
+class InstrumentHealth:
+    """单台仪器的健康记录（由监视器在其锁内更新和导出）"""
+    instrument_id: str
+    history_size: int = 100
+    status: str = STATUS_UNKNOWN
+    idn: Optional[str] = None
+    probe_count: int = 0
+    error_count: int = 0
+    consecutive_failures: int = 0
+    reconnect_count: int = 0
+    last_probe_time: Optional[float] = None
+    last_ok_time: Optional[float] = None
+    last_error: Optional[str] = None
+    next_probe_time: float = 0.0
+    backoff: float = 0.0
+    latencies: Deque[float] = field(init=False)
+    outcomes: Deque[bool] = field(init=False)
+    errors: Deque[Tuple[float, str]] = field(init=False)
+
+    def __post_init__(self):
+        self.latencies = deque(maxlen=self.history_size)
+        self.outcomes = deque(maxlen=self.history_size)
+        self.errors = deque(maxlen=self.history_size)
+
+    def to_dict(self) -> Dict:
+        """导出状态摘要"""
+        latencies = sorted(self.latencies)
+        outcomes = self.outcomes
+        summary = {
+            'status': self.status,
+            'idn': self.idn,
+            'probe_count': self.probe_count,
+            'error_count': self.error_count,
+            'error_rate': (outcomes.count(False) / len(outcomes)) if outcomes else 0.0,
+            'consecutive_failures': self.consecutive_failures,
+            'reconnect_count': self.reconnect_count,
+            'last_probe_time': self.last_probe_time,
+            'last_ok_time': self.last_ok_time,
+            'last_error': self.last_error,
+            'latency_ms': None
+        }
+        if latencies:
+            summary['latency_ms'] = {
+                'last': self.latencies[-1] * 1000,
+                'avg': sum(latencies) / len(latencies) * 1000,
+                'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+                'max': latencies[-1] * 1000
+            }
+        return summary
+
+
+class InstrumentHealthMonitor:
+    """仪器健康监视器"""
+
+    def __init__(self, instrument_manager: 'InstrumentManager', interval: float = 5.0,
+                 failure_threshold: int = 2, initial_backoff: float = 1.0,
+                 max_backoff: float = 60.0, history_size: int = 100):
+        """
+        初始化健康监视器
+
+        Args:
+            instrument_manager: 仪器管理器
+            interval: 健康检查周期(秒)
+            failure_threshold: 连续失败多少次后判定连接中断并重连
+            initial_backoff: 首次重连等待时间(秒)
+            max_backoff: 重连等待时间上限(秒)
+            history_size: 保留的响应时间和错误记录条数
+        """
+        self.instrument_manager = instrument_manager
+        self.interval = interval
+        self.failure_threshold = max(1, failure_threshold)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.history_size = history_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._health: Dict[str, InstrumentHealth] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动监视线程"""
+        if self.is_running:
+            self.logger.warning("健康监视器已在运行")
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='InstrumentHealthMonitor',
+                                        daemon=True)
+        self._thread.start()
+        self.logger.info(f"仪器健康监视器已启动，检查周期 {self.interval}s")
+
+    def stop(self, timeout: float = 10):
+        """
+        停止监视线程
+
+        Args:
+            timeout: 等待线程退出的时间(秒)
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.logger.info("仪器健康监视器已停止")
+
+    @property
+    def is_running(self) -> bool:
+        """检查监视器是否运行中"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        """监视线程主循环"""
+        while not self._stop_event.is_set():
+            try:
+                self.check_now()
+            except Exception as e:
+                self.logger.error(f"健康检查错误: {e}")
+            self._stop_event.wait(self._time_to_next_probe())
+
+    def _time_to_next_probe(self) -> float:
+        """距离下一次到期检查的时间"""
+        with self._lock:
+            due = [h.next_probe_time for h in self._health.values()]
+        if not due:
+            return self.interval
+        return min(self.interval, max(0.05, min(due) - time.monotonic()))
+
+    def _get_health(self, instrument_id: str) -> InstrumentHealth:
+        with self._lock:
+            health = self._health.get(instrument_id)
+            if health is None:
+                health = InstrumentHealth(instrument_id, self.history_size)
+                self._health[instrument_id] = health
+            return health
+
+    def check_now(self, force: bool = False):
+        """
+        检查所有到期的仪器
+
+        Args:
+            force: 是否忽略检查周期和重连退避，立即检查全部仪器
+        """
+        instruments = self.instrument_manager.get_managed_instruments()
+        with self._lock:
+            # 已被移除的仪器不再跟踪
+            for instr_id in list(self._health):
+                if instr_id not in instruments:
+                    del self._health[instr_id]
+
+        for instr_id, driver in instruments.items():
+            if self._stop_event.is_set() and not force:
+                return
+            health = self._get_health(instr_id)
+            now = time.monotonic()
+            if not force and now < health.next_probe_time:
+                continue
+            if health.status == STATUS_DOWN or not driver.is_connected:
+                self._try_reconnect(health, driver)
+            else:
+                self._probe(health, driver)
+
+    def _probe(self, health: InstrumentHealth, driver):
+        """对单台仪器执行一次健康检查"""
+        now = time.monotonic()
+        try:
+            latency = driver.probe()
+        except Exception as e:
+            self._record_failure(health, f"{type(e).__name__}: {e}")
+            return
+
+        if latency is None:
+            # 仪器正在执行测试，本身即说明通信正常
+            with self._lock:
+                health.next_probe_time = now + self.interval
+            return
+        idn = health.idn
+        if idn is None:
+            try:
+                idn = driver.get_idn()
+            except Exception as e:
+                self.logger.debug("读取IDN失败 %s: %s", health.instrument_id, e)
+        with self._lock:
+            health.next_probe_time = now + self.interval
+            health.idn = idn
+            health.probe_count += 1
+            health.latencies.append(latency)
+            health.outcomes.append(True)
+            health.consecutive_failures = 0
+            health.backoff = 0.0
+            health.last_probe_time = health.last_ok_time = time.time()
+            health.status = STATUS_OK
+
+    def _record_failure(self, health: InstrumentHealth, message: str):
+        """记录一次检查失败"""
+        now = time.time()
+        with self._lock:
+            health.probe_count += 1
+            health.error_count += 1
+            health.consecutive_failures += 1
+            health.outcomes.append(False)
+            health.errors.append((now, message))
+            health.last_probe_time = now
+            health.last_error = message
+
+            went_down = False
+            if health.consecutive_failures >= self.failure_threshold:
+                went_down = health.status != STATUS_DOWN
+                health.status = STATUS_DOWN
+                self._schedule_reconnect(health)
+            else:
+                health.status = STATUS_DEGRADED
+                health.next_probe_time = time.monotonic() + self.interval
+        if went_down:
+            self.logger.warning(f"仪器连接中断: {health.instrument_id} ({message})")
+
+    def _schedule_reconnect(self, health: InstrumentHealth):
+        """按指数退避安排下一次重连（调用方持有锁）"""
+        if health.backoff:
+            health.backoff = min(health.backoff * 2, self.max_backoff)
+        else:
+            health.backoff = self.initial_backoff
+        health.next_probe_time = time.monotonic() + health.backoff
+
+    def _try_reconnect(self, health: InstrumentHealth, driver):
+        """尝试重新连接仪器"""
+        self.logger.info(f"尝试重连仪器: {health.instrument_id}")
+        with self._lock:
+            health.status = STATUS_DOWN
+        try:
+            ok = driver.reconnect()
+            message = "重连失败"
+        except Exception as e:
+            ok = False
+            message = f"{type(e).__name__}: {e}"
+
+        if not ok:
+            with self._lock:
+                health.errors.append((time.time(), message))
+                health.last_error = message
+                self._schedule_reconnect(health)
+            self.logger.warning(
+                f"重连仪器失败 {health.instrument_id}，{health.backoff:.1f}s 后重试"
+            )
+            return
+
+        with self._lock:
+            health.reconnect_count += 1
+            health.consecutive_failures = 0
+            health.idn = None
+        self.logger.info(f"仪器已重连: {health.instrument_id}")
+        self._probe(health, driver)
+
+    def get_status(self, instrument_id: str) -> Optional[Dict]:
+        """
+        获取单台仪器的健康状态（读取缓存）
+
+        Args:
+            instrument_id: 仪器ID
+
+        Returns:
+            Optional[Dict]: 健康状态，未被监视时为None
+        """
+        with self._lock:
+            health = self._health.get(instrument_id)
+            return health.to_dict() if health else None
+
+    def get_all_status(self) -> Dict[str, Dict]:
+        """获取所有仪器的健康状态（读取缓存）"""
+        with self._lock:
+            return {instr_id: health.to_dict() for instr_id, health in self._health.items()}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
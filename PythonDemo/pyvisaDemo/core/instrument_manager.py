@@ -3,22 +3,32 @@
 负责管理所有仪器的连接、断开和状态监控
 """
 import logging
-from typing import Dict, Optional, Type, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Type, Any
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 import threading
 
 from .config_manager import ConfigManager
+from .health_monitor import InstrumentHealthMonitor
 from drivers import (
     BaseDriver,
     OpticalPowerMeter,
+    ReturnLossMeter,
     OpticalSwitch,
     OpticalSpectrumAnalyzer,
-    LaserSource
+    LaserSource,
+    TrafficRecorder,
+    ReplayDriver,
+    BusScheduler
 )
 from drivers.optical_power_meter import SimulatedOpticalPowerMeter
+from drivers.return_loss_meter import SimulatedReturnLossMeter
 from drivers.optical_switch import SimulatedOpticalSwitch
 from drivers.osa import SimulatedOSA
 from drivers.laser_source import SimulatedLaserSource
+from drivers.scpi_sim import SimulatedBench, SimulatedResource, create_model, MODEL_MAP
+from drivers.clock import VirtualClock, get_clock, set_clock
 
 
 class InstrumentManager:
@@ -30,6 +40,7 @@ class InstrumentManager:
         'optical_switch': OpticalSwitch,
         'osa': OpticalSpectrumAnalyzer,
         'laser_source': LaserSource,
+        'return_loss_meter': ReturnLossMeter,
     }
     
     # 仿真驱动类型映射
@@ -38,23 +49,54 @@ class InstrumentManager:
         'optical_switch': SimulatedOpticalSwitch,
         'osa': SimulatedOSA,
         'laser_source': SimulatedLaserSource,
+        'return_loss_meter': SimulatedReturnLossMeter,
     }
     
-    def __init__(self, config_manager: ConfigManager, simulation_mode: bool = False):
+    # 并行连接/自检的默认参数
+    DEFAULT_MAX_WORKERS = 8
+    DEFAULT_CONNECT_TIMEOUT = 30.0
+    DEFAULT_SELF_TEST_TIMEOUT = 120.0
+    
+    def __init__(self, config_manager: ConfigManager, simulation_mode: bool = False,
+                 replay_dir: str = None):
         """
         初始化仪器管理器
         
         Args:
             config_manager: 配置管理器实例
             simulation_mode: 是否使用仿真模式
+            replay_dir: 录制文件目录，指定时使用回放驱动代替真实仪器
         """
         self.config_manager = config_manager
         self.simulation_mode = simulation_mode
+        self.replay_dir = Path(replay_dir) if replay_dir else None
         self.logger = logging.getLogger(self.__class__.__name__)
         
+        # 仿真模式下可使用虚拟时钟，快于实时地运行：连接仪器时安装，disconnect_all 时恢复原来的全局时钟
+        self._virtual_clock: Optional[VirtualClock] = None
+        self._previous_clock = None
+        
         # 仪器实例缓存
         self._instruments: Dict[str, BaseDriver] = {}
+        # 全局锁只保护仪器字典，连接和断开操作使用各仪器独立的锁
         self._lock = threading.Lock()
+        self._instrument_locks: Dict[str, threading.Lock] = {}
+        # 已超时放弃、但工作线程仍在后台连接的仪器，迟到的连接结果将被丢弃
+        self._abandoned_connects: Set[str] = set()
+        # 连接时读取的仪器IDN，状态查询不访问总线
+        self._idns: Dict[str, Optional[str]] = {}
+        
+        # 总线调度：同一总线上的仪器通信串行、公平排队，不同总线并行
+        self.bus_scheduler = BusScheduler()
+        
+        # SCPI仿真后端共享的光路
+        self.sim_bench = SimulatedBench()
+        
+        # 后台健康监视器
+        self.health_monitor: Optional[InstrumentHealthMonitor] = None
+        
+        # 运行指标（StationMetrics），设置后新建的驱动记录通信延迟和错误
+        self.metrics = None
     
     def _create_driver_instance(self, instrument_id: str, 
                                 config: Dict) -> Optional[BaseDriver]:
@@ -69,9 +111,12 @@ class InstrumentManager:
             BaseDriver: 驱动实例
         """
         driver_type = config.get('driver')
+        visa_settings = self.config_manager.visa_settings
         
-        # 选择驱动类
-        if self.simulation_mode:
+        # 选择驱动类（SCPI仿真后端使用真实驱动，仅替换VISA资源）
+        use_scpi_sim = (self.simulation_mode and driver_type in MODEL_MAP and
+                        visa_settings.get('simulation_backend', 'driver') == 'scpi')
+        if self.simulation_mode and not use_scpi_sim:
             driver_class = self.SIMULATED_DRIVER_MAP.get(driver_type)
         else:
             driver_class = self.DRIVER_MAP.get(driver_type)
@@ -80,20 +125,118 @@ class InstrumentManager:
             self.logger.error(f"未知的驱动类型: {driver_type}")
             return None
         
+        driver_kwargs = {
+            'resource_string': config.get('resource_string'),
+            'instrument_id': instrument_id,
+            'timeout': config.get('timeout', 5000),
+            'parameters': config.get('parameters', {}),
+            'backend': visa_settings.get('backend', '')
+        }
+        if use_scpi_sim:
+            driver_kwargs['resource_factory'] = self._create_sim_resource_factory(config)
+        elif self.simulation_mode:
+            driver_kwargs['simulation'] = self._get_simulation_options(config)
+        
+        if self.metrics is not None:
+            driver_kwargs['io_metrics'] = self.metrics.instrument_io(instrument_id)
+        
+        if visa_settings.get('bus_arbitration', True):
+            driver_kwargs['bus'] = self.bus_scheduler.channel(
+                instrument_id, config.get('resource_string', ''), config.get('bus')
+            )
+        
+        # 回放模式使用录制文件代替真实仪器
+        if self.replay_dir is not None:
+            driver_class = ReplayDriver.wrap(self.DRIVER_MAP[driver_type])
+            driver_kwargs['recording'] = self.replay_dir / f"{instrument_id}.scpirec"
+        
         # 创建驱动实例
         try:
-            driver = driver_class(
-                resource_string=config.get('resource_string'),
-                timeout=config.get('timeout', 5000),
-                parameters=config.get('parameters', {}),
-                backend=self.config_manager.visa_settings.get('backend', '')
-            )
+            if (self.replay_dir is None and not self.simulation_mode and
+                    visa_settings.get('record_traffic', False)):
+                driver_kwargs['recorder'] = self._create_recorder(instrument_id, config)
+            driver = driver_class(**driver_kwargs)
             self.logger.debug(f"已创建驱动实例: {instrument_id}")
             return driver
         except Exception as e:
             self.logger.error(f"创建驱动实例失败 {instrument_id}: {e}")
             return None
     
+    def _get_simulation_options(self, config: Dict) -> Dict:
+        """
+        获取仪器的仿真参数
+        
+        取自仪器配置的 simulation 段（seed、latency、time_scale等），
+        未配置的项使用 visa_settings 中的默认值
+        
+        Args:
+            config: 仪器配置
+            
+        Returns:
+            Dict: 仿真参数
+        """
+        visa_settings = self.config_manager.visa_settings
+        sim = dict(config.get('simulation') or {})
+        sim.setdefault('latency', visa_settings.get('simulation_latency', 0.0))
+        sim.setdefault('time_scale', visa_settings.get('simulation_time_scale', 1.0))
+        return sim
+    
+    def _create_sim_resource_factory(self, config: Dict):
+        """
+        创建SCPI仿真资源工厂
+        
+        仿真参数取自仪器配置的 simulation 段，未配置时使用 visa_settings 中的默认值
+        
+        Args:
+            config: 仪器配置
+            
+        Returns:
+            Callable[[str], SimulatedResource]: 资源工厂
+        """
+        sim = self._get_simulation_options(config)
+        
+        def factory(resource_string: str) -> SimulatedResource:
+            model = create_model(
+                config.get('driver'), self.sim_bench,
+                seed=sim.get('seed'),
+                parameters=config.get('parameters') or {},
+                operation_time=sim.get('operation_time', 0.0),
+                time_scale=sim['time_scale']
+            )
+            return SimulatedResource(model, resource_string, latency=sim['latency'])
+        
+        return factory
+    
+    def _create_recorder(self, instrument_id: str, config: Dict) -> TrafficRecorder:
+        """
+        创建通信录制器
+        
+        Args:
+            instrument_id: 仪器ID
+            config: 仪器配置
+            
+        Returns:
+            TrafficRecorder: 录制器实例
+        """
+        visa_settings = self.config_manager.visa_settings
+        record_dir = Path(visa_settings.get('record_dir', 'recordings'))
+        if not record_dir.is_absolute():
+            record_dir = Path(__file__).parent.parent / record_dir
+        
+        return TrafficRecorder(
+            record_dir / f"{instrument_id}.scpirec",
+            capacity=visa_settings.get('record_buffer_size', 8 * 1024 * 1024),
+            label=config.get('resource_string', '')
+        )
+    
+    def _get_instrument_lock(self, instrument_id: str) -> threading.Lock:
+        """获取仪器的独立锁"""
+        with self._lock:
+            lock = self._instrument_locks.get(instrument_id)
+            if lock is None:
+                lock = self._instrument_locks[instrument_id] = threading.Lock()
+            return lock
+    
     def connect_instrument(self, instrument_id: str) -> bool:
         """
         连接单个仪器
@@ -104,12 +247,17 @@ class InstrumentManager:
         Returns:
             bool: 连接是否成功
         """
-        with self._lock:
+        self._apply_simulation_clock()
+        with self._get_instrument_lock(instrument_id):
+            # 之前超时放弃的连接已结束（持有仪器锁），清除其残留标记
+            with self._lock:
+                self._abandoned_connects.discard(instrument_id)
+            
             # 检查是否已连接
-            if instrument_id in self._instruments:
-                if self._instruments[instrument_id].is_connected:
-                    self.logger.info(f"仪器已连接: {instrument_id}")
-                    return True
+            existing = self._instruments.get(instrument_id)
+            if existing is not None and existing.is_connected:
+                self.logger.info(f"仪器已连接: {instrument_id}")
+                return True
             
             # 获取配置
             config = self.config_manager.get_instrument_config(instrument_id)
@@ -129,7 +277,19 @@ class InstrumentManager:
             # 连接仪器
             try:
                 if driver.connect():
-                    self._instruments[instrument_id] = driver
+                    idn = self._read_idn(instrument_id, driver)
+                    with self._lock:
+                        abandoned = instrument_id in self._abandoned_connects
+                        self._abandoned_connects.discard(instrument_id)
+                        if not abandoned:
+                            self._instruments[instrument_id] = driver
+                            self._idns[instrument_id] = idn
+                    if abandoned:
+                        # 调用方已按超时记为失败，迟到的连接不再注册
+                        self.logger.warning(f"仪器连接超时后才完成，已断开: {instrument_id}")
+                        self._discard_driver(instrument_id, driver)
+                        return False
+                    self._invalidate_reference_models(driver.resource_string)
                     self.logger.info(f"成功连接仪器: {instrument_id} ({config.get('name')})")
                     return True
                 else:
@@ -138,6 +298,62 @@ class InstrumentManager:
                 self.logger.error(f"连接仪器失败 {instrument_id}: {e}")
                 return False
     
+    def _abandon_connect(self, instrument_id: str):
+        """
+        放弃超时的连接：工作线程稍后连接成功时断开并丢弃驱动
+        
+        Args:
+            instrument_id: 仪器ID
+        """
+        with self._lock:
+            self._abandoned_connects.add(instrument_id)
+    
+    def _discard_driver(self, instrument_id: str, driver: BaseDriver):
+        """
+        断开未注册的驱动
+        
+        Args:
+            instrument_id: 仪器ID
+            driver: 驱动实例
+        """
+        try:
+            driver.disconnect()
+        except Exception as e:
+            self.logger.error(f"断开仪器失败 {instrument_id}: {e}")
+    
+    def _read_idn(self, instrument_id: str, driver: BaseDriver) -> Optional[str]:
+        """
+        连接后读取一次仪器IDN（回放模式不读取，以免与录制的通信序列错位）
+        
+        Args:
+            instrument_id: 仪器ID
+            driver: 已连接的驱动
+            
+        Returns:
+            Optional[str]: IDN响应，读取失败时为None
+        """
+        if self.replay_dir is not None:
+            return None
+        try:
+            return driver.get_idn()
+        except Exception as e:
+            self.logger.debug("读取IDN失败 %s: %s", instrument_id, e)
+            return None
+    
+    def _invalidate_reference_models(self, resource_string: str):
+        """
+        仪器（重新）连接后丢弃基于该仪器扫描的共享参考功率模型
+        
+        Args:
+            resource_string: 仪器资源字符串
+        """
+        # 测试用例包依赖 core，运行时才导入（同 TestEngine 动态加载测试类）
+        try:
+            from test_cases.reference_model import ReferenceModel
+        except ImportError:
+            return
+        ReferenceModel.invalidate_instrument(resource_string)
+    
     def disconnect_instrument(self, instrument_id: str):
         """
         断开单个仪器
@@ -145,15 +361,108 @@ class InstrumentManager:
         Args:
             instrument_id: 仪器ID
         """
-        with self._lock:
-            if instrument_id in self._instruments:
+        with self._get_instrument_lock(instrument_id):
+            with self._lock:
+                driver = self._instruments.pop(instrument_id, None)
+                self._idns.pop(instrument_id, None)
+            if driver is not None:
                 try:
-                    self._instruments[instrument_id].disconnect()
-                    del self._instruments[instrument_id]
+                    driver.disconnect()
                     self.logger.info(f"已断开仪器: {instrument_id}")
                 except Exception as e:
                     self.logger.error(f"断开仪器失败 {instrument_id}: {e}")
     
+    def _get_timeout(self, instrument_id: str, key: str, default: float) -> float:
+        """
+        获取仪器操作超时时间，仪器配置优先于 visa_settings
+        
+        Args:
+            instrument_id: 仪器ID
+            key: 配置项名称（connect_timeout / self_test_timeout）
+            default: 默认值(秒)
+            
+        Returns:
+            float: 超时时间(秒)
+        """
+        config = self.config_manager.get_instrument_config(instrument_id) or {}
+        if key in config:
+            return float(config[key])
+        return float(self.config_manager.visa_settings.get(key, default))
+    
+    def _run_bounded(self, instrument_ids: Iterable[str], func: Callable[[str], bool],
+                     timeout_key: str, default_timeout: float,
+                     action: str,
+                     on_timeout: Optional[Callable[[str], None]] = None) -> Dict[str, bool]:
+        """
+        在有界线程池中对多台仪器并行执行操作，每台仪器单独计时
+        
+        超时的仪器记为失败，其工作线程在后台自行结束，不阻塞调用方；
+        on_timeout 供调用方处理工作线程迟到的结果
+        
+        Args:
+            instrument_ids: 仪器ID列表
+            func: 对单台仪器执行的操作，返回是否成功
+            timeout_key: 超时配置项名称
+            default_timeout: 默认超时(秒)
+            action: 操作名称（用于日志）
+            on_timeout: 仪器超时时的回调 on_timeout(instrument_id)
+            
+        Returns:
+            Dict[str, bool]: 各仪器的执行结果
+        """
+        instrument_ids = list(dict.fromkeys(instrument_ids))
+        results: Dict[str, bool] = {}
+        if not instrument_ids:
+            return results
+        
+        max_workers = int(self.config_manager.visa_settings.get(
+            'max_parallel_connections', self.DEFAULT_MAX_WORKERS))
+        timeouts = {i: self._get_timeout(i, timeout_key, default_timeout) for i in instrument_ids}
+        started: Dict[str, float] = {}
+        
+        def task(instr_id: str) -> bool:
+            started[instr_id] = time.monotonic()
+            return func(instr_id)
+        
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(instrument_ids))),
+            thread_name_prefix=f"Instrument-{action}"
+        )
+        try:
+            pending: Dict[Future, str] = {
+                executor.submit(task, instr_id): instr_id for instr_id in instrument_ids
+            }
+            while pending:
+                # 超时从任务实际开始执行时计算，排队时间不计入
+                now = time.monotonic()
+                deadlines = [started[i] + timeouts[i] for i in pending.values() if i in started]
+                wait_time = max(0.0, min(deadlines) - now) if deadlines else 0.05
+                done, _ = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    instr_id = pending.pop(future)
+                    try:
+                        results[instr_id] = bool(future.result())
+                    except Exception as e:
+                        self.logger.error(f"仪器{action}异常 {instr_id}: {e}")
+                        results[instr_id] = False
+                
+                now = time.monotonic()
+                for future, instr_id in list(pending.items()):
+                    # 刚刚完成的任务在下一轮按结果处理
+                    if future.done():
+                        continue
+                    if instr_id in started and now - started[instr_id] >= timeouts[instr_id]:
+                        pending.pop(future)
+                        results[instr_id] = False
+                        self.logger.error(f"仪器{action}超时 {instr_id} ({timeouts[instr_id]:.1f}s)")
+                        if on_timeout is not None:
+                            on_timeout(instr_id)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return results
+    
     def connect_all(self, parallel: bool = True) -> Dict[str, bool]:
         """
         连接所有已启用的仪器
@@ -165,33 +474,67 @@ class InstrumentManager:
             Dict[str, bool]: 各仪器的连接状态
         """
         enabled_instruments = self.config_manager.get_enabled_instruments()
-        results = {}
+        self._apply_simulation_clock()
         
         if parallel:
-            with ThreadPoolExecutor(max_workers=len(enabled_instruments)) as executor:
-                futures = {
-                    executor.submit(self.connect_instrument, instr_id): instr_id
-                    for instr_id in enabled_instruments.keys()
-                }
-                for future in as_completed(futures):
-                    instr_id = futures[future]
-                    try:
-                        results[instr_id] = future.result()
-                    except Exception as e:
-                        self.logger.error(f"连接仪器异常 {instr_id}: {e}")
-                        results[instr_id] = False
+            results = self._run_bounded(
+                enabled_instruments.keys(), self.connect_instrument,
+                'connect_timeout', self.DEFAULT_CONNECT_TIMEOUT, '连接',
+                on_timeout=self._abandon_connect
+            )
         else:
+            results = {}
             for instr_id in enabled_instruments.keys():
                 results[instr_id] = self.connect_instrument(instr_id)
         
+        health_settings = self.config_manager.visa_settings.get('health_monitor') or {}
+        if health_settings.get('enabled', False):
+            self.start_health_monitor()
+        
         return results
     
     def disconnect_all(self):
-        """断开所有仪器"""
+        """断开所有仪器，并恢复安装虚拟时钟之前的全局时钟"""
+        self.stop_health_monitor()
         instrument_ids = list(self._instruments.keys())
         for instr_id in instrument_ids:
             self.disconnect_instrument(instr_id)
         self.logger.info("已断开所有仪器")
+        self._restore_clock()
+    
+    def use_virtual_clock(self) -> VirtualClock:
+        """
+        安装虚拟时钟作为全局时钟，disconnect_all 时恢复原来的时钟
+        
+        全局时钟已是虚拟时钟时直接沿用，不做替换
+        
+        Returns:
+            VirtualClock: 当前使用的虚拟时钟
+        """
+        with self._lock:
+            clock = get_clock()
+            if clock.virtual:
+                return clock
+            self._virtual_clock = VirtualClock()
+            self._previous_clock = set_clock(self._virtual_clock)
+        self.logger.info("仿真模式使用虚拟时钟")
+        return self._virtual_clock
+    
+    def _apply_simulation_clock(self):
+        """仿真模式配置了 simulation_clock: virtual 时安装虚拟时钟（回放模式不使用）"""
+        if (self.simulation_mode and self.replay_dir is None and
+                self.config_manager.snapshot.visa_settings.get('simulation_clock', 'real') == 'virtual'):
+            self.use_virtual_clock()
+    
+    def _restore_clock(self):
+        """恢复原来的全局时钟（全局时钟已被其他代码替换时不动）"""
+        if self._virtual_clock is None:
+            return
+        if get_clock() is self._virtual_clock:
+            set_clock(self._previous_clock)
+            self.logger.info("已恢复原来的全局时钟")
+        self._virtual_clock = None
+        self._previous_clock = None
     
     def get_instrument(self, instrument_id: str) -> Optional[BaseDriver]:
         """
@@ -205,6 +548,10 @@ class InstrumentManager:
         """
         return self._instruments.get(instrument_id)
     
+    def get_managed_instruments(self) -> Dict[str, BaseDriver]:
+        """获取所有已创建的仪器实例（包括连接中断的仪器）"""
+        return dict(self._instruments)
+    
     def get_connected_instruments(self) -> Dict[str, BaseDriver]:
         """获取所有已连接的仪器"""
         return {k: v for k, v in self._instruments.items() if v.is_connected}
@@ -218,10 +565,13 @@ class InstrumentManager:
         """
         获取所有仪器状态
         
+        状态信息来自健康监视器的缓存，不会访问仪器总线
+        
         Returns:
             Dict[str, Dict]: 仪器状态信息
         """
         all_instruments = self.config_manager.instruments
+        monitor = self.health_monitor
         status = {}
         
         for instr_id, config in all_instruments.items():
@@ -230,19 +580,55 @@ class InstrumentManager:
                 'driver': config.get('driver'),
                 'resource_string': config.get('resource_string'),
                 'enabled': config.get('enabled', True),
-                'connected': self.is_instrument_connected(instr_id)
+                'connected': self.is_instrument_connected(instr_id),
+                'idn': self._idns.get(instr_id)
             }
             
-            # 如果已连接，获取更多信息
-            if status[instr_id]['connected']:
-                try:
-                    instrument = self._instruments[instr_id]
-                    status[instr_id]['idn'] = instrument.get_idn()
-                except:
-                    pass
+            health = monitor.get_status(instr_id) if monitor else None
+            if health is not None:
+                # 健康监视器在重连后会重新读取IDN
+                if health['idn'] is not None:
+                    status[instr_id]['idn'] = health['idn']
+                status[instr_id]['health'] = health
         
         return status
     
+    def get_bus_usage(self) -> Dict[str, Dict]:
+        """
+        获取各总线的占用统计
+        
+        Returns:
+            Dict[str, Dict]: {总线标识: 利用率及各仪器的通信次数、占用和等待时间}
+        """
+        return self.bus_scheduler.get_usage()
+    
+    def start_health_monitor(self, **kwargs) -> InstrumentHealthMonitor:
+        """
+        启动后台健康监视器
+        
+        参数默认取自 visa_settings.health_monitor 配置
+        
+        Args:
+            **kwargs: 覆盖配置的监视器参数（interval、failure_threshold等）
+            
+        Returns:
+            InstrumentHealthMonitor: 健康监视器
+        """
+        if self.health_monitor is not None and self.health_monitor.is_running:
+            return self.health_monitor
+        
+        settings = dict(self.config_manager.visa_settings.get('health_monitor') or {})
+        settings.pop('enabled', None)
+        settings.update(kwargs)
+        self.health_monitor = InstrumentHealthMonitor(self, **settings)
+        self.health_monitor.start()
+        return self.health_monitor
+    
+    def stop_health_monitor(self):
+        """停止后台健康监视器"""
+        if self.health_monitor is not None:
+            self.health_monitor.stop()
+    
     def check_instruments_for_flow(self, flow_id: str) -> Dict[str, bool]:
         """
         检查测试流程所需仪器的状态
@@ -253,11 +639,10 @@ class InstrumentManager:
         Returns:
             Dict[str, bool]: 各所需仪器的连接状态
         """
-        flow_config = self.config_manager.get_test_flow(flow_id)
-        if flow_config is None:
+        if self.config_manager.get_test_flow_spec(flow_id) is None:
             return {}
         
-        required = flow_config.get('instruments_required', [])
+        required = self.config_manager.get_flow_instruments(flow_id)
         return {instr_id: self.is_instrument_connected(instr_id) for instr_id in required}
     
     def connect_instruments_for_flow(self, flow_id: str) -> bool:
@@ -270,36 +655,55 @@ class InstrumentManager:
         Returns:
             bool: 所有所需仪器是否都已连接
         """
-        flow_config = self.config_manager.get_test_flow(flow_id)
-        if flow_config is None:
+        if self.config_manager.get_test_flow_spec(flow_id) is None:
             self.logger.error(f"测试流程不存在: {flow_id}")
             return False
         
-        required = flow_config.get('instruments_required', [])
-        all_connected = True
+        required = self.config_manager.get_flow_instruments(flow_id)
+        missing = [i for i in required if not self.is_instrument_connected(i)]
+        results = self._run_bounded(
+            missing, self.connect_instrument,
+            'connect_timeout', self.DEFAULT_CONNECT_TIMEOUT, '连接',
+            on_timeout=self._abandon_connect
+        )
+        return all(results.values())
+    
+    def connect_optional_instruments_for_flow(self, flow_id: str) -> List[str]:
+        """
+        连接测试流程的可选仪器（instruments_optional 中已配置并启用的仪器）
         
-        for instr_id in required:
-            if not self.is_instrument_connected(instr_id):
-                if not self.connect_instrument(instr_id):
-                    all_connected = False
+        连接失败不影响流程执行，测试用例在可选仪器不可用时使用替代方案
         
-        return all_connected
+        Args:
+            flow_id: 测试流程ID
+            
+        Returns:
+            List[str]: 已连接的可选仪器ID
+        """
+        optional = self.config_manager.get_flow_optional_instruments(flow_id)
+        missing = [i for i in optional if not self.is_instrument_connected(i)]
+        results = self._run_bounded(
+            missing, self.connect_instrument,
+            'connect_timeout', self.DEFAULT_CONNECT_TIMEOUT, '连接',
+            on_timeout=self._abandon_connect
+        )
+        for instr_id, connected in results.items():
+            if not connected:
+                self.logger.warning(f"可选仪器连接失败，流程 {flow_id} 将不使用: {instr_id}")
+        return [i for i in optional if self.is_instrument_connected(i)]
     
     def self_test_all(self) -> Dict[str, bool]:
         """
-        对所有已连接仪器执行自检
+        对所有已连接仪器并行执行自检
         
         Returns:
             Dict[str, bool]: 各仪器的自检结果
         """
-        results = {}
-        for instr_id, instrument in self._instruments.items():
-            try:
-                results[instr_id] = instrument.self_test()
-            except Exception as e:
-                self.logger.error(f"仪器自检失败 {instr_id}: {e}")
-                results[instr_id] = False
-        return results
+        instruments = self.get_managed_instruments()
+        return self._run_bounded(
+            instruments.keys(), lambda instr_id: instruments[instr_id].self_test(),
+            'self_test_timeout', self.DEFAULT_SELF_TEST_TIMEOUT, '自检'
+        )
     
     def __enter__(self):
         """上下文管理器入口"""
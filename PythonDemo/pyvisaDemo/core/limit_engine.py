@@ -0,0 +1,476 @@
+"""
+限值引擎
+将产品限值（products.yaml 的 limits / variants）和流程通过标准（test_flows.yaml 的 pass_criteria）
+编译为作用于测量项的规则，并对整组测量值做向量化判定：
+- 物理量名称映射为测量项名称模式（如 insertion_loss → IL_*nm），也可用通配符直接指定 pattern
+- 规则可带波长掩码（wavelengths 列表或 wavelength_range 区间），只作用于对应波长的测量项
+- 上下限分别按来源优先级覆盖：产品型号限值 > 产品限值 > 流程通过标准（流程通过标准为通用默认值），
+  同一来源的多条规则取最严的上下限
+- 没有对应测量项的限值（如尚无测试用例测量的 isolation）在编译时记录警告
+- 按测量项名称序列缓存判定计划，同一流程的结果只需一次数组比较；历史结果可批量重新判定
+"""
+import fnmatch
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# 物理量名称对应的测量项名称模式
+QUANTITY_PATTERNS = {
+    'insertion_loss': 'IL_*nm',
+    'return_loss': 'RL_*nm',
+    'uniformity': 'uniformity',
+    'deviation': 'uniformity',
+    'smsr': 'SMSR',
+    'linewidth': '3dB_bandwidth',
+    'bandwidth': '3dB_bandwidth',
+}
+
+# 限值来源的优先级，数值大的覆盖数值小的
+SOURCE_PRECEDENCE = {
+    'flow': 0,
+    'product': 1,
+    'variant': 2,
+}
+
+# 带波长的测量项名称，如 IL_1550nm
+_WAVELENGTH_RE = re.compile(r'_(\d+(?:\.\d+)?)nm$')
+# 流程通过标准的简写，如 max_insertion_loss: 0.5
+_CRITERION_RE = re.compile(r'^(max|min)_(.+)$')
+# 产品型号限值的简写，如 insertion_loss_max: 3.8
+_VARIANT_RE = re.compile(r'^(.+)_(max|min)$')
+
+
+def measurement_wavelength(name: str) -> Optional[float]:
+    """
+    从测量项名称中取出波长
+
+    Args:
+        name: 测量项名称
+
+    Returns:
+        Optional[float]: 波长(nm)，名称不带波长时为None
+    """
+    match = _WAVELENGTH_RE.search(name)
+    return float(match.group(1)) if match else None
+
+
+@dataclass(frozen=True, slots=True)
+class LimitRule:
+    """作用于一组测量项的限值规则"""
+    # 来源（product / variant / flow）和配置中的名称，用于说明判定依据
+    source: str
+    name: str
+    # 测量项名称的通配符模式
+    pattern: str
+    min: Optional[float] = None
+    max: Optional[float] = None
+    # 波长掩码，均为None时作用于所有波长（含不带波长的测量项）
+    wavelengths: Optional[Tuple[float, ...]] = None
+    wavelength_range: Optional[Tuple[float, float]] = None
+
+    def matches(self, name: str) -> bool:
+        """规则是否作用于该测量项"""
+        if not fnmatch.fnmatchcase(name, self.pattern):
+            return False
+        if self.wavelengths is None and self.wavelength_range is None:
+            return True
+        wavelength = measurement_wavelength(name)
+        if wavelength is None:
+            return False
+        if self.wavelengths is not None and not any(
+                math.isclose(wavelength, w) for w in self.wavelengths):
+            return False
+        if self.wavelength_range is not None:
+            low, high = self.wavelength_range
+            if not low <= wavelength <= high:
+                return False
+        return True
+
+
+def _rule_from_spec(source: str, name: str, spec: Dict, pattern: str) -> Optional[LimitRule]:
+    """由 {min, max, pattern, wavelengths, wavelength_range} 生成规则"""
+    if 'min' not in spec and 'max' not in spec:
+        return None
+    wavelengths = spec.get('wavelengths')
+    wavelength_range = spec.get('wavelength_range')
+    return LimitRule(
+        source=source,
+        name=name,
+        pattern=spec.get('pattern', pattern),
+        min=float(spec['min']) if spec.get('min') is not None else None,
+        max=float(spec['max']) if spec.get('max') is not None else None,
+        wavelengths=tuple(float(w) for w in wavelengths) if wavelengths is not None else None,
+        wavelength_range=(tuple(float(w) for w in wavelength_range)
+                          if wavelength_range is not None else None)
+    )
+
+
+def _rules_from_limit(source: str, name: str, limit: Any, pattern: str) -> List[LimitRule]:
+    """一个限值配置项（字典或字典列表）生成的规则"""
+    specs = limit if isinstance(limit, list) else [limit]
+    rules = []
+    for spec in specs:
+        if isinstance(spec, dict):
+            rule = _rule_from_spec(source, name, spec, pattern)
+            if rule is not None:
+                rules.append(rule)
+    return rules
+
+
+def parse_flow_criteria(pass_criteria: Optional[Mapping]) -> List[LimitRule]:
+    """
+    解析流程通过标准
+
+    支持的写法：
+    - max_insertion_loss: 0.5        按物理量名称作用于 IL_*nm
+    - uniformity: 0.1                标量为上限，作用于同名测量项
+    - IL_*nm: {max: 0.5, wavelength_range: [1260, 1360]}
+    - insertion_loss: [{max: 0.6, wavelengths: [1310]}, {max: 0.4, wavelengths: [1550]}]
+
+    Args:
+        pass_criteria: 流程配置中的 pass_criteria
+
+    Returns:
+        List[LimitRule]: 规则
+    """
+    rules: List[LimitRule] = []
+    for name, limit in (pass_criteria or {}).items():
+        if isinstance(limit, (dict, list)):
+            rules.extend(_rules_from_limit('flow', name, limit, QUANTITY_PATTERNS.get(name, name)))
+            continue
+        if not isinstance(limit, (int, float)) or isinstance(limit, bool):
+            continue
+        match = _CRITERION_RE.match(name)
+        if match:
+            bound, quantity = match.groups()
+            pattern = QUANTITY_PATTERNS.get(quantity, quantity)
+        else:
+            bound, pattern = 'max', name
+        rules.append(LimitRule(source='flow', name=name, pattern=pattern, **{bound: float(limit)}))
+    return rules
+
+
+def parse_product_limits(limits: Optional[Mapping],
+                         variant_limits: Optional[Mapping] = None) -> List[LimitRule]:
+    """
+    解析产品限值
+
+    Args:
+        limits: 产品的 limits（物理量名称 -> {min, max, unit, ...}）
+        variant_limits: 产品型号的限值（如 insertion_loss_max: 3.8）
+
+    Returns:
+        List[LimitRule]: 规则
+    """
+    rules: List[LimitRule] = []
+    for name, limit in (limits or {}).items():
+        rules.extend(_rules_from_limit('product', name, limit, QUANTITY_PATTERNS.get(name, name)))
+    for name, value in (variant_limits or {}).items():
+        match = _VARIANT_RE.match(name)
+        if not match or not isinstance(value, (int, float)) or isinstance(value, bool):
+            continue
+        quantity, bound = match.groups()
+        rules.append(LimitRule(source='variant', name=name,
+                               pattern=QUANTITY_PATTERNS.get(quantity, quantity),
+                               **{bound: float(value)}))
+    return rules
+
+
+def unmapped_rules(rules: Iterable[LimitRule]) -> List[LimitRule]:
+    """
+    找出不对应任何已知测量项的规则（名称不在 QUANTITY_PATTERNS 中、未给出 pattern，
+    也不是带波长或通配符的测量项名称）
+
+    Args:
+        rules: 规则
+
+    Returns:
+        List[LimitRule]: 无法作用于测量项的规则
+    """
+    known = set(QUANTITY_PATTERNS.values())
+    return [
+        rule for rule in rules
+        if rule.pattern not in known
+        and not any(c in rule.pattern for c in '*?[')
+        and measurement_wavelength(rule.pattern) is None
+    ]
+
+
+@dataclass(frozen=True, slots=True)
+class LimitPlan:
+    """一个测量项名称序列的判定计划"""
+    # 受限值约束的测量项
+    names: Tuple[str, ...]
+    # 每个测量项的有效下限和上限（无限值时为 ∓inf）
+    lower: np.ndarray
+    upper: np.ndarray
+
+
+def _as_float(value: Any) -> float:
+    """测量值转换为浮点数，非数值按 NaN 处理（判定为不通过）"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class CompiledLimits:
+    """编译后的一组限值规则（一个流程与产品/型号的组合）"""
+
+    # 缓存的名称序列数量上限
+    MAX_PLANS = 256
+
+    def __init__(self, rules: Sequence[LimitRule]):
+        """
+        初始化
+
+        Args:
+            rules: 规则
+        """
+        self.rules = tuple(rules)
+        self._plans: Dict[Tuple[str, ...], LimitPlan] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def plan(self, names: Tuple[str, ...]) -> LimitPlan:
+        """
+        取得测量项名称序列的判定计划
+
+        Args:
+            names: 测量项名称序列
+
+        Returns:
+            LimitPlan: 判定计划
+        """
+        plan = self._plans.get(names)
+        if plan is not None:
+            return plan
+
+        selected, lower, upper = [], [], []
+        for name in names:
+            low, high, matched = -math.inf, math.inf, False
+            low_rank = high_rank = -1
+            for rule in self.rules:
+                if not rule.matches(name):
+                    continue
+                matched = True
+                rank = SOURCE_PRECEDENCE.get(rule.source, 0)
+                # 优先级更高的来源覆盖，同一来源取最严
+                if rule.min is not None:
+                    if rank > low_rank:
+                        low, low_rank = rule.min, rank
+                    elif rank == low_rank:
+                        low = max(low, rule.min)
+                if rule.max is not None:
+                    if rank > high_rank:
+                        high, high_rank = rule.max, rank
+                    elif rank == high_rank:
+                        high = min(high, rule.max)
+            if matched:
+                selected.append(name)
+                lower.append(low)
+                upper.append(high)
+
+        plan = LimitPlan(tuple(selected), np.asarray(lower, dtype=float),
+                         np.asarray(upper, dtype=float))
+        if len(self._plans) < self.MAX_PLANS:
+            self._plans[names] = plan
+        return plan
+
+    def limits_for(self, name: str) -> Tuple[Optional[float], Optional[float]]:
+        """
+        测量项的有效下限和上限
+
+        Args:
+            name: 测量项名称
+
+        Returns:
+            Tuple[Optional[float], Optional[float]]: (下限, 上限)，无限值时为None
+        """
+        plan = self.plan((name,))
+        if not plan.names:
+            return None, None
+        low, high = float(plan.lower[0]), float(plan.upper[0])
+        return (low if math.isfinite(low) else None, high if math.isfinite(high) else None)
+
+    def evaluate(self, measurements: Mapping[str, Any]) -> Dict[str, bool]:
+        """
+        判定一组测量值
+
+        Args:
+            measurements: 测量项 -> 测量值
+
+        Returns:
+            Dict[str, bool]: 受限值约束的测量项 -> 是否通过
+        """
+        plan = self.plan(tuple(measurements))
+        if not plan.names:
+            return {}
+        values = np.fromiter((_as_float(measurements[name]) for name in plan.names),
+                             dtype=float, count=len(plan.names))
+        passed = (values >= plan.lower) & (values <= plan.upper)
+        return dict(zip(plan.names, passed.tolist()))
+
+    def evaluate_batch(self, tables: Sequence[Mapping[str, Any]]) -> List[Dict[str, bool]]:
+        """
+        批量判定多组测量值，名称序列相同的组合并为一个二维数组一次比较
+
+        Args:
+            tables: 测量值表列表
+
+        Returns:
+            List[Dict[str, bool]]: 与 tables 一一对应的判定结果
+        """
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, table in enumerate(tables):
+            groups.setdefault(tuple(table), []).append(i)
+
+        verdicts: List[Dict[str, bool]] = [{} for _ in tables]
+        for names, members in groups.items():
+            plan = self.plan(names)
+            if not plan.names:
+                continue
+            values = np.array([[_as_float(tables[i][name]) for name in plan.names]
+                               for i in members], dtype=float)
+            passed = (values >= plan.lower) & (values <= plan.upper)
+            for row, i in zip(passed.tolist(), members):
+                verdicts[i] = dict(zip(plan.names, row))
+        return verdicts
+
+
+class LimitEngine:
+    """限值引擎：按流程和产品编译并缓存限值规则"""
+
+    def __init__(self, config_manager):
+        """
+        初始化限值引擎
+
+        Args:
+            config_manager: 配置管理器（使用其当前配置快照）
+        """
+        self.config_manager = config_manager
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._cache: Dict[Tuple, CompiledLimits] = {}
+        self._cache_version: Optional[int] = None
+
+    def compile(self, flow_id: str, product_info: Optional[Dict] = None,
+                snapshot=None) -> CompiledLimits:
+        """
+        编译流程与产品的限值
+
+        产品在配置中存在时使用配置中的当前限值（限值修改后重新判定历史结果即按新限值），
+        否则使用 product_info 中记录的 limits
+
+        Args:
+            flow_id: 测试流程ID
+            product_info: 产品信息（product_id、variant、limits）
+            snapshot: 配置快照，默认为当前快照
+
+        Returns:
+            CompiledLimits: 编译后的限值
+        """
+        snapshot = snapshot or self.config_manager.snapshot
+        # 缓存只保留最新版本的配置；进行中的流程固定使用开始时的旧快照时不写入缓存
+        if self._cache_version is None or snapshot.version > self._cache_version:
+            self._cache.clear()
+            self._cache_version = snapshot.version
+        cacheable = snapshot.version == self._cache_version
+
+        product_info = product_info or {}
+        product_id = product_info.get('product_id')
+        variant = product_info.get('variant')
+        product = snapshot.products.get(product_id) if product_id else None
+        recorded = None if product is not None else product_info.get('limits')
+        key = (flow_id, product_id, variant, repr(recorded) if recorded else None)
+
+        compiled = self._cache.get(key) if cacheable else None
+        if compiled is None:
+            flow_config = snapshot.test_flows.get(flow_id) or {}
+            if product is not None:
+                limits = product.get('limits')
+                variant_limits = (product.get('variants') or {}).get(variant) if variant else None
+            else:
+                limits, variant_limits = recorded, None
+            rules = (parse_product_limits(limits, variant_limits) +
+                     parse_flow_criteria(flow_config.get('pass_criteria')))
+            unmapped = unmapped_rules(rules)
+            if unmapped:
+                self.logger.warning(
+                    f"流程 {flow_id} / 产品 {product_id or '-'} 的限值 "
+                    f"{', '.join(sorted({rule.name for rule in unmapped}))} 没有对应的测量项，不参与判定")
+            compiled = CompiledLimits([rule for rule in rules if rule not in unmapped])
+            if cacheable:
+                self._cache[key] = compiled
+        return compiled
+
+    def evaluate(self, result, snapshot=None) -> Dict[str, bool]:
+        """
+        判定一个测试结果的测量值
+
+        Args:
+            result: TestResult
+            snapshot: 配置快照，默认为当前快照
+
+        Returns:
+            Dict[str, bool]: 受限值约束的测量项 -> 是否通过
+        """
+        return self.compile(result.flow_id, result.product_info, snapshot).evaluate(result.measurements)
+
+    def reevaluate(self, results: Iterable, apply: bool = False, snapshot=None) -> List[Dict]:
+        """
+        按当前限值批量重新判定历史结果
+
+        只重新判定已通过或未通过的结果，出错、跳过和提前中止的结果保持原状态；
+        测试用例给出的、限值引擎不覆盖的判定项保留
+
+        Args:
+            results: TestResult 列表（可由 TestResult.from_dict 从保存的结果还原）
+            apply: 是否将新的判定写回结果
+            snapshot: 配置快照，默认为当前快照
+
+        Returns:
+            List[Dict]: 每个结果的 {flow_id, serial_number, previous_status, status, changed, passed_criteria}
+        """
+        from .test_engine import TestStatus  # test_engine 导入本模块，避免循环导入
+
+        results = list(results)
+        groups: Dict[int, Tuple[CompiledLimits, List[int]]] = {}
+        for i, result in enumerate(results):
+            compiled = self.compile(result.flow_id, result.product_info, snapshot)
+            groups.setdefault(id(compiled), (compiled, []))[1].append(i)
+
+        verdicts: List[Dict[str, bool]] = [{} for _ in results]
+        for compiled, members in groups.values():
+            batch = compiled.evaluate_batch([results[i].measurements for i in members])
+            for i, verdict in zip(members, batch):
+                verdicts[i] = verdict
+
+        report = []
+        for result, verdict in zip(results, verdicts):
+            gradable = (result.status in (TestStatus.PASSED, TestStatus.FAILED) and
+                        not result.early_abort)
+            passed_criteria = dict(result.passed_criteria)
+            status = result.status
+            if gradable:
+                passed_criteria.update(verdict)
+                status = TestStatus.PASSED if all(passed_criteria.values()) else TestStatus.FAILED
+            changed = sorted(name for name, passed in passed_criteria.items()
+                             if result.passed_criteria.get(name) != passed)
+            report.append({
+                'flow_id': result.flow_id,
+                'serial_number': result.product_info.get('serial_number'),
+                'previous_status': result.status.value,
+                'status': status.value,
+                'changed': changed,
+                'passed_criteria': passed_criteria
+            })
+            if apply and gradable:
+                result.passed_criteria = passed_criteria
+                result.status = status
+        return report
@@ -0,0 +1,517 @@
+"""
+运行指标
+提供计数器、仪表和直方图，以及 Prometheus 文本格式的内嵌HTTP导出服务。
+指标值按线程分片存储：每个线程只写自己的分片，更新不加锁，
+抓取时再对各分片求和，抓取开销只与指标数量和存活线程数有关，与历史任务数量无关；
+线程结束时其分片并入基础分片后回收
+"""
+import bisect
+import logging
+import math
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 默认直方图桶上界(秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_DURATION_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class _CellOwner:
+    """线程的分片持有者，只由该线程的 threading.local 引用，线程结束时随之释放"""
+    __slots__ = ('cell', '__weakref__')
+
+    def __init__(self, cell: List[float]):
+        self.cell = cell
+
+
+class _Shards:
+    """按线程分片的数值数组"""
+    __slots__ = ('size', '_base', '_cells', '_local', '_lock', '__weakref__')
+
+    def __init__(self, size: int):
+        self.size = size
+        # 已结束线程的分片之和
+        self._base = [0.0] * size
+        self._cells: Dict[int, List[float]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        """当前线程的分片（首次访问时创建）"""
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            owner = self._local.owner = _CellOwner([0.0] * self.size)
+            with self._lock:
+                self._cells[id(owner.cell)] = owner.cell
+            # 线程结束、持有者被释放时并入基础分片（回调不引用 self，不延长其生命周期）
+            weakref.finalize(owner, _Shards._retire, weakref.ref(self), owner.cell)
+        return owner.cell
+
+    @staticmethod
+    def _retire(shards_ref, cell: List[float]):
+        """将结束线程的分片并入基础分片并移除"""
+        shards = shards_ref()
+        if shards is None:
+            return
+        with shards._lock:
+            if shards._cells.pop(id(cell), None) is None:
+                return
+            base = shards._base
+            for i, value in enumerate(cell):
+                base[i] += value
+
+    def totals(self) -> List[float]:
+        """各分片之和"""
+        with self._lock:
+            totals = list(self._base)
+            cells = list(self._cells.values())
+        for cell in cells:
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+    def __len__(self) -> int:
+        """存活线程的分片数"""
+        return len(self._cells)
+
+
+class _CounterChild:
+    __slots__ = ('_shards',)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0):
+        """增加计数"""
+        self._shards.cell()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class _GaugeChild:
+    __slots__ = ('_shards', '_value', '_func')
+
+    def __init__(self):
+        self._shards = _Shards(1)
+        self._value = 0.0
+        self._func: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0):
+        """增加（各线程的增减量分片累加）"""
+        self._shards.cell()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        """减少"""
+        self._shards.cell()[0] -= amount
+
+    def set(self, value: float):
+        """设置为指定值"""
+        self._value = value - self._shards.totals()[0]
+
+    def set_function(self, func: Callable[[], float]):
+        """抓取时调用 func 获取当前值"""
+        self._func = func
+
+    def value(self) -> float:
+        if self._func is not None:
+            return float(self._func())
+        return self._value + self._shards.totals()[0]
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_shards')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # 各桶计数，最后两项为总和与总数
+        self._shards = _Shards(len(bounds) + 3)
+
+    def observe(self, value: float):
+        """记录一个观测值"""
+        cell = self._shards.cell()
+        cell[bisect.bisect_left(self._bounds, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def value(self) -> Tuple[List[float], float, float]:
+        totals = self._shards.totals()
+        return totals[:-2], totals[-2], totals[-1]
+
+
+class _Metric:
+    """指标基类，按标签值组合维护子指标"""
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        """
+        获取指定标签值的子指标（返回值可缓存复用，避免重复查找）
+
+        Args:
+            *values: 按 labelnames 顺序的标签值
+            **kwargs: 按名称指定的标签值
+
+        Returns:
+            子指标
+        """
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签: {self.labelnames}")
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self) -> List[str]:
+        """生成 Prometheus 文本格式的行"""
+        # 0.0.4 文本格式中计数器的 HELP/TYPE 名称与样本名称一致（带 _total 后缀）
+        family = f"{self.name}_total" if self.kind == 'counter' else self.name
+        lines = [f"# HELP {family} {self.documentation}", f"# TYPE {family} {self.kind}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        for values, child in self._items():
+            yield f"{self.name}_total", dict(zip(self.labelnames, values)), child.value()
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def set_function(self, func: Callable[[], float]):
+        self._children[()].set_function(func)
+
+    def _samples(self):
+        for values, child in self._items():
+            try:
+                value = child.value()
+            except Exception:
+                value = math.nan
+            yield self.name, dict(zip(self.labelnames, values)), value
+
+
+class Histogram(_Metric):
+    """直方图"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self):
+        for values, child in self._items():
+            labels = dict(zip(self.labelnames, values))
+            counts, total, count = child.value()
+            cumulative = 0.0
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if value != value:
+        return 'NaN'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"指标已注册且定义不同: {metric.name}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """注册计数器（名称已存在时返回已有指标）"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """注册仪表"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """注册直方图"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        生成 Prometheus 文本格式（0.0.4）的全部指标
+
+        Returns:
+            str: 指标文本
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """内嵌HTTP指标导出服务，在 /metrics 提供 Prometheus 文本格式"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = '0.0.0.0', port: int = 9108):
+        """
+        初始化导出服务
+
+        Args:
+            registry: 指标注册表
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动服务"""
+        if self._server is not None:
+            return
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name='MetricsExporter')
+        self._thread.start()
+        self.logger.info(f"指标导出服务已启动: http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        """停止服务"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+        self._server = None
+        self._thread = None
+        self.logger.info("指标导出服务已停止")
+
+
+class _InstrumentIOMetrics:
+    """单台仪器的通信指标，由驱动在每次通信后调用"""
+    __slots__ = ('_latency', '_errors')
+
+    def __init__(self, latency, errors):
+        self._latency = latency
+        self._errors = errors
+
+    def observe(self, seconds: float, error: bool = False):
+        """
+        记录一次通信
+
+        Args:
+            seconds: 耗时(秒)
+            error: 是否出错
+        """
+        self._latency.observe(seconds)
+        if error:
+            self._errors.inc()
+
+
+class StationMetrics:
+    """测试站指标：调度队列、任务耗时与结果、重试次数、仪器通信延迟与错误、SPC报警"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        """
+        初始化测试站指标
+
+        Args:
+            registry: 指标注册表，默认新建
+        """
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.queue_depth = r.gauge('station_queue_depth', '调度队列中等待的任务数')
+        self.tasks_running = r.gauge('station_tasks_running', '正在执行的任务数')
+        self.tasks = r.counter('station_tasks', '结束的任务数', ('flow', 'status'))
+        self.task_duration = r.histogram('station_task_duration_seconds', '测试流程耗时(秒)',
+                                         ('flow',), TASK_DURATION_BUCKETS)
+        self.retries = r.counter('station_task_retries', '任务重试次数', ('flow',))
+        self.query_latency = r.histogram('station_instrument_query_seconds',
+                                         '仪器单次通信耗时(秒)', ('instrument',),
+                                         QUERY_LATENCY_BUCKETS)
+        self.query_errors = r.counter('station_instrument_errors', '仪器通信错误次数',
+                                      ('instrument',))
+        self.instrument_up = r.gauge('station_instrument_up', '仪器是否已连接', ('instrument',))
+        self.spc_alarms = r.counter('station_spc_alarms', 'SPC失控报警次数',
+                                    ('flow', 'measurement', 'chart'))
+
+    def instrument_io(self, instrument_id: str) -> _InstrumentIOMetrics:
+        """
+        获取仪器的通信指标记录器（传给驱动的 io_metrics 参数）
+
+        Args:
+            instrument_id: 仪器ID
+
+        Returns:
+            通信指标记录器
+        """
+        return _InstrumentIOMetrics(self.query_latency.labels(instrument_id),
+                                    self.query_errors.labels(instrument_id))
+
+    def attach_instrument_manager(self, instrument_manager):
+        """
+        采集仪器管理器的通信指标和连接状态
+
+        Args:
+            instrument_manager: 仪器管理器
+        """
+        instrument_manager.metrics = self
+        for instr_id, driver in instrument_manager.get_managed_instruments().items():
+            driver.io_metrics = self.instrument_io(instr_id)
+        for instr_id in instrument_manager.config_manager.snapshot.instrument_specs:
+            self.instrument_up.labels(instr_id).set_function(
+                lambda i=instr_id: 1.0 if instrument_manager.is_instrument_connected(i) else 0.0
+            )
+
+    def attach_scheduler(self, scheduler):
+        """
+        采集调度器的队列深度、任务结果（含取消）和重试次数
+
+        Args:
+            scheduler: 测试调度器
+        """
+        self.queue_depth.set_function(scheduler.get_queue_size)
+        scheduler.register_callback('on_task_started', self._on_task_started)
+        scheduler.register_callback('on_task_completed', self._on_task_finished)
+        scheduler.register_callback('on_task_failed', self._on_task_finished)
+        scheduler.register_callback('on_task_retry', self._on_task_retry)
+        scheduler.register_callback('on_task_cancelled', self._on_task_cancelled)
+        self.attach_instrument_manager(scheduler.instrument_manager)
+
+    def attach_spc(self, spc):
+        """
+        统计SPC失控报警
+
+        Args:
+            spc: SpcMonitor
+        """
+        spc.register_callback('on_alarm', self._on_spc_alarm)
+
+    def _on_spc_alarm(self, alarm):
+        self.spc_alarms.labels(alarm.flow_id, alarm.name, alarm.chart).inc()
+
+    def _on_task_started(self, task):
+        self.tasks_running.inc()
+
+    def _on_task_finished(self, task):
+        self.tasks_running.dec()
+        self.tasks.labels(task.flow_id, task.status).inc()
+        if task.result is not None:
+            self.task_duration.labels(task.flow_id).observe(task.result.duration)
+
+    def _on_task_cancelled(self, task):
+        self.tasks.labels(task.flow_id, task.status).inc()
+
+    def _on_task_retry(self, task):
+        self.tasks_running.dec()
+        self.retries.labels(task.flow_id).inc()
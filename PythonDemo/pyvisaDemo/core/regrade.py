@@ -0,0 +1,290 @@
+"""
+离线重新判定
+限值修改后，按当前配置重新判定 reports/ 中保存的任务结果（TestScheduler._save_task_result 写出的JSON），
+无需重新测试被测件：
+- 按文件分块流式读取，每块在工作进程中解析并按 (流程, 产品, 型号) 分组，用限值引擎做二维数组判定
+- 多进程并行处理各块，主进程按完成顺序写出判定有变化的记录（JSON Lines）
+- 出错、跳过、取消和提前中止的结果不重新判定
+
+用法:
+    python -m core.regrade --reports reports --output regrade_diff.jsonl
+    python -m core.regrade --reports reports --config config --processes 8 --chunk-size 500
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config_manager import ConfigManager
+from .limit_engine import LimitEngine
+from .serialization import JsonSerializer
+
+
+# 可重新判定的原状态
+GRADABLE_STATUSES = ('passed', 'failed')
+
+# 工作进程内的限值引擎和序列化器（由 _init_worker 创建）
+_worker_engine: Optional[LimitEngine] = None
+_worker_serializer: Optional[JsonSerializer] = None
+
+
+@dataclass(slots=True)
+class RegradeSummary:
+    """重新判定统计"""
+    files: int = 0
+    records: int = 0
+    regraded: int = 0
+    changed: int = 0
+    pass_to_fail: int = 0
+    fail_to_pass: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    # 按流程统计的变化记录数
+    changed_by_flow: Dict[str, int] = field(default_factory=dict)
+
+    def merge(self, other: 'RegradeSummary'):
+        """累加另一块的统计"""
+        for name in ('files', 'records', 'regraded', 'changed', 'pass_to_fail',
+                     'fail_to_pass', 'errors'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for flow_id, count in other.changed_by_flow.items():
+            self.changed_by_flow[flow_id] = self.changed_by_flow.get(flow_id, 0) + count
+
+    def to_dict(self) -> Dict:
+        return {
+            'files': self.files,
+            'records': self.records,
+            'regraded': self.regraded,
+            'changed': self.changed,
+            'pass_to_fail': self.pass_to_fail,
+            'fail_to_pass': self.fail_to_pass,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed, 3),
+            'records_per_second': round(self.records / self.elapsed, 1) if self.elapsed else None,
+            'changed_by_flow': self.changed_by_flow
+        }
+
+
+def iter_result_files(reports_dir: Path) -> Iterator[str]:
+    """
+    列出任务结果文件（跳过追踪记录和 .npy 附属文件）
+
+    Args:
+        reports_dir: 结果目录
+
+    Yields:
+        str: 文件路径
+    """
+    with os.scandir(reports_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if entry.is_file() and name.endswith('.json') and not name.endswith('.trace.json'):
+                yield entry.path
+
+
+def iter_chunks(paths: Iterator[str], chunk_size: int) -> Iterator[List[str]]:
+    """将文件路径按块分组"""
+    while True:
+        chunk = list(islice(paths, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def extract_records(data: Dict, path: str) -> List[Dict]:
+    """
+    从一个任务结果中取出待判定的记录（夹具任务每个被测件一条）
+
+    Args:
+        data: _save_task_result 写出的内容
+        path: 文件路径
+
+    Returns:
+        List[Dict]: 记录，非任务结果文件时为空
+    """
+    result = data.get('result') if isinstance(data, dict) else None
+    if not isinstance(result, dict) or 'task_id' not in data:
+        return []
+    product_info = data.get('product_info') or {}
+    common = {
+        'file': path,
+        'task_id': data['task_id'],
+        'flow_id': data.get('flow_id'),
+        'product_info': product_info,
+        'gradable': data.get('status') != 'cancelled' and not result.get('early_abort')
+    }
+    duts = data.get('duts')
+    if duts:
+        return [
+            dict(common,
+                 serial_number=dut.get('serial_number'),
+                 fixture_position=dut.get('fixture_position'),
+                 status=dut.get('status'),
+                 measurements=dut.get('measurements') or {},
+                 passed_criteria=dut.get('passed_criteria') or {})
+            for dut in duts
+        ]
+    return [dict(common,
+                 serial_number=product_info.get('serial_number'),
+                 status=result.get('status'),
+                 measurements=result.get('measurements') or {},
+                 passed_criteria=result.get('passed_criteria') or {})]
+
+
+def regrade_records(engine: LimitEngine, records: List[Dict]) -> Tuple[List[Dict], RegradeSummary]:
+    """
+    按当前限值重新判定记录
+
+    Args:
+        engine: 限值引擎
+        records: extract_records 取出的记录
+
+    Returns:
+        Tuple[List[Dict], RegradeSummary]: (判定有变化的记录, 统计)
+    """
+    summary = RegradeSummary(records=len(records))
+    groups: Dict[int, Tuple] = {}
+    for i, record in enumerate(records):
+        if not record['gradable'] or record['status'] not in GRADABLE_STATUSES:
+            continue
+        compiled = engine.compile(record['flow_id'], record['product_info'])
+        groups.setdefault(id(compiled), (compiled, []))[1].append(i)
+
+    diffs = []
+    for compiled, members in groups.values():
+        verdicts = compiled.evaluate_batch([records[i]['measurements'] for i in members])
+        summary.regraded += len(members)
+        for i, verdict in zip(members, verdicts):
+            record = records[i]
+            previous = record['passed_criteria']
+            passed_criteria = dict(previous)
+            passed_criteria.update(verdict)
+            status = 'passed' if all(passed_criteria.values()) else 'failed'
+            # 未保存的判定项：原结果通过时视为通过，原结果不合格时未知
+            implied = True if record['status'] == 'passed' else None
+            changed = {}
+            for name, passed in verdict.items():
+                before = previous.get(name, implied)
+                if before is not None and before != passed:
+                    changed[name] = [before, passed]
+            if status == record['status'] and not changed:
+                continue
+
+            summary.changed += 1
+            if status != record['status']:
+                if status == 'failed':
+                    summary.pass_to_fail += 1
+                else:
+                    summary.fail_to_pass += 1
+            flow_id = record['flow_id']
+            summary.changed_by_flow[flow_id] = summary.changed_by_flow.get(flow_id, 0) + 1
+            diff = {
+                'file': record['file'],
+                'task_id': record['task_id'],
+                'flow_id': flow_id,
+                'product_id': record['product_info'].get('product_id'),
+                'serial_number': record['serial_number'],
+                'previous_status': record['status'],
+                'status': status,
+                'changed': changed,
+                'failed': sorted(name for name, passed in passed_criteria.items() if not passed),
+                'limits': {name: list(compiled.limits_for(name)) for name in changed}
+            }
+            if record.get('fixture_position') is not None:
+                diff['fixture_position'] = record['fixture_position']
+            diffs.append(diff)
+    return diffs, summary
+
+
+def _init_worker(config_dir: Optional[str]):
+    """工作进程初始化：加载当前配置"""
+    global _worker_engine, _worker_serializer
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker_engine = LimitEngine(ConfigManager(config_dir))
+    _worker_serializer = JsonSerializer()
+
+
+def _regrade_chunk(paths: List[str]) -> Tuple[List[Dict], RegradeSummary]:
+    """在工作进程中读取并重新判定一块文件"""
+    records: List[Dict] = []
+    errors = 0
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                data = _worker_serializer.loads(f.read())
+        except (OSError, ValueError) as e:
+            logging.getLogger('regrade').warning(f"无法读取结果文件 {path}: {e}")
+            errors += 1
+            continue
+        records.extend(extract_records(data, path))
+    diffs, summary = regrade_records(_worker_engine, records)
+    summary.files = len(paths)
+    summary.errors = errors
+    return diffs, summary
+
+
+def regrade_reports(reports_dir, output, config_dir: Optional[str] = None,
+                    processes: Optional[int] = None, chunk_size: int = 500) -> RegradeSummary:
+    """
+    重新判定目录中保存的全部任务结果，判定有变化的记录写入 JSON Lines 文件
+
+    Args:
+        reports_dir: 结果目录
+        output: 差异输出文件路径
+        config_dir: 配置目录，默认为项目的 config 目录
+        processes: 工作进程数，默认为CPU核数，1 为在当前进程中处理
+        chunk_size: 每块的文件数
+
+    Returns:
+        RegradeSummary: 统计
+    """
+    start = time.perf_counter()
+    processes = processes or os.cpu_count() or 1
+    chunks = iter_chunks(iter_result_files(Path(reports_dir)), chunk_size)
+    serializer = JsonSerializer(indent=0)
+    summary = RegradeSummary()
+
+    with open(output, 'wb') as out:
+        def consume(results):
+            for diffs, chunk_summary in results:
+                summary.merge(chunk_summary)
+                for diff in diffs:
+                    out.write(serializer.dumps(diff) + b'\n')
+
+        if processes == 1:
+            _init_worker(config_dir)
+            consume(map(_regrade_chunk, chunks))
+        else:
+            with multiprocessing.Pool(processes, initializer=_init_worker,
+                                      initargs=(config_dir,)) as pool:
+                consume(pool.imap_unordered(_regrade_chunk, chunks))
+
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按当前限值重新判定已保存的测试结果')
+    default_reports = Path(__file__).parent.parent / 'reports'
+    parser.add_argument('--reports', default=str(default_reports), help='结果目录')
+    parser.add_argument('--config', default=None, help='配置目录（默认为项目的 config 目录）')
+    parser.add_argument('--output', default='regrade_diff.jsonl', help='差异输出文件（JSON Lines）')
+    parser.add_argument('--processes', type=int, default=None, help='工作进程数，默认为CPU核数')
+    parser.add_argument('--chunk-size', type=int, default=500, help='每块的文件数')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    summary = regrade_reports(args.reports, args.output, args.config,
+                              args.processes, args.chunk_size)
+    sys.stdout.write(JsonSerializer().dumps(summary.to_dict()).decode('utf-8') + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,416 @@
+"""
+紧凑结果模型
+大量测试结果常驻内存时（如调度器保存的全部任务），用紧凑的容器代替普通字典和列表：
+- MeasurementTable: 测量值表，测量项名称驻留(intern)并按名称序列共享布局，数值存为连续的 double 数组
+- CompactRecords: 循环步骤的逐波长结果，存为 NumPy 结构化数组
+- MeasurementLog: 测试用例的测量记录，只保存单位和 int64 纳秒时间戳，数值引用测量值表
+- 时间统一存为 int64 纳秒
+各容器都可无损地转换回原有的字典/列表形式（to_plain）
+"""
+import functools
+import sys
+from array import array
+from collections.abc import Mapping, MutableMapping, Sequence
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MISSING = object()
+
+
+def datetime_to_ns(value: Optional[datetime]) -> Optional[int]:
+    """
+    本地时间转换为纳秒整数（带时区的时间先转换为本地时间）
+
+    Args:
+        value: 时间
+
+    Returns:
+        Optional[int]: 自 1970-01-01 起的纳秒数
+    """
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    delta = value - _EPOCH
+    return ((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds) * 1000
+
+
+def ns_to_datetime(value: Optional[int]) -> Optional[datetime]:
+    """
+    纳秒整数转换为本地时间
+
+    Args:
+        value: 纳秒数
+
+    Returns:
+        Optional[datetime]: 时间
+    """
+    if value is None:
+        return None
+    return _EPOCH + timedelta(microseconds=value // 1000)
+
+
+def ns_property(attr: str, doc: str = '') -> property:
+    """生成在 datetime 与纳秒整数属性之间转换的属性"""
+
+    def getter(self):
+        return ns_to_datetime(getattr(self, attr))
+
+    def setter(self, value):
+        setattr(self, attr, datetime_to_ns(value))
+
+    return property(getter, setter, doc=doc)
+
+
+def accepts_datetimes(**aliases: str):
+    """
+    类装饰器：让以纳秒整数存储时间的数据类继续接受 datetime 参数
+
+    构造时既可以使用旧的 datetime 关键字（如 start_time=datetime），
+    也可以在纳秒字段的位置（位置参数或关键字）直接传入 datetime，均转换为纳秒整数
+
+    Args:
+        **aliases: 旧关键字到纳秒字段名的映射，如 start_time='start_ns'
+    """
+    def decorate(cls):
+        init = cls.__init__
+
+        @functools.wraps(init)
+        def __init__(self, *args, **kwargs):
+            for old, new in aliases.items():
+                if old in kwargs:
+                    if new in kwargs:
+                        raise TypeError(f"{cls.__name__}() 不能同时指定 {old} 和 {new}")
+                    kwargs[new] = datetime_to_ns(kwargs.pop(old))
+            init(self, *args, **kwargs)
+            for new in aliases.values():
+                value = getattr(self, new)
+                if isinstance(value, datetime):
+                    setattr(self, new, datetime_to_ns(value))
+
+        cls.__init__ = __init__
+        return cls
+
+    return decorate
+
+
+class _Layout:
+    """
+    测量项名称布局：名称到数组下标的映射
+
+    名称序列相同的测量值表共享同一个布局对象，新增名称时沿缓存的转移得到下一个布局
+    """
+    __slots__ = ('names', 'index', '_next')
+
+    # 缓存的布局数量上限，超出后新布局不再共享
+    MAX_SHARED = 4096
+    _count = 0
+
+    def __init__(self, names: Tuple[str, ...]):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self._next: Dict[str, '_Layout'] = {}
+
+    def extend(self, name: str) -> '_Layout':
+        layout = self._next.get(name)
+        if layout is None:
+            layout = _Layout(self.names + (name,))
+            if _Layout._count < _Layout.MAX_SHARED:
+                _Layout._count += 1
+                self._next[name] = layout
+        return layout
+
+
+_EMPTY_LAYOUT = _Layout(())
+
+
+class MeasurementTable(MutableMapping):
+    """
+    测量值表，用法与 {测量项: 值} 字典相同
+
+    浮点数存入 double 数组，其他类型（整数、布尔、字符串等）原样保存，读出时类型不变
+    """
+    __slots__ = ('_layout', '_values', '_objects')
+
+    def __init__(self, data: Optional[Mapping] = None):
+        self._layout = _EMPTY_LAYOUT
+        self._values = array('d')
+        self._objects: Optional[Dict[str, Any]] = None
+        if data:
+            self.update(data)
+
+    def __getitem__(self, name: str):
+        i = self._layout.index.get(name)
+        if i is None:
+            raise KeyError(name)
+        if self._objects is not None:
+            value = self._objects.get(name, _MISSING)
+            if value is not _MISSING:
+                return value
+        return self._values[i]
+
+    def __setitem__(self, name: str, value):
+        i = self._layout.index.get(name)
+        if i is None:
+            name = sys.intern(str(name))
+            self._layout = self._layout.extend(name)
+            self._values.append(0.0)
+            i = len(self._values) - 1
+        if isinstance(value, (float, np.floating)) and not isinstance(value, np.longdouble):
+            self._values[i] = value
+            if self._objects is not None:
+                self._objects.pop(name, None)
+        else:
+            if self._objects is None:
+                self._objects = {}
+            self._objects[name] = value
+
+    def __delitem__(self, name: str):
+        if name not in self._layout.index:
+            raise KeyError(name)
+        items = [(k, v) for k, v in self.items() if k != name]
+        self._layout = _EMPTY_LAYOUT
+        self._values = array('d')
+        self._objects = None
+        for k, v in items:
+            self[k] = v
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout.names)
+
+    def __len__(self) -> int:
+        return len(self._layout.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._layout.index
+
+    def __repr__(self) -> str:
+        return f"MeasurementTable({dict(self.items())!r})"
+
+    def __reduce__(self):
+        return self.__class__, (dict(self.items()),)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通字典"""
+        return dict(self.items())
+
+
+class MeasurementLog(Mapping):
+    """
+    测试用例的测量记录，按名称给出 {'value', 'unit', 'timestamp'} 字典
+
+    数值不重复保存，从测量值表读取；时间戳存为纳秒整数，读取时生成ISO格式字符串
+    """
+    __slots__ = ('_table', '_index', '_units', '_timestamps')
+
+    def __init__(self, table: MutableMapping):
+        """
+        初始化测量记录
+
+        Args:
+            table: 保存数值的测量值表
+        """
+        self._table = table
+        self._index: Dict[str, int] = {}
+        self._units: List[str] = []
+        self._timestamps = array('q')
+
+    def record(self, name: str, value: Any, unit: str, timestamp: datetime):
+        """
+        记录一个测量项
+
+        Args:
+            name: 测量项名称
+            value: 测量值
+            unit: 单位
+            timestamp: 测量时间
+        """
+        self._table[name] = value
+        ts = datetime_to_ns(timestamp)
+        i = self._index.get(name)
+        if i is None:
+            self._index[sys.intern(str(name))] = len(self._units)
+            self._units.append(sys.intern(unit))
+            self._timestamps.append(ts)
+        else:
+            self._units[i] = sys.intern(unit)
+            self._timestamps[i] = ts
+
+    def __getitem__(self, name: str) -> Dict[str, Any]:
+        i = self._index[name]
+        return {
+            'value': self._table.get(name),
+            'unit': self._units[i],
+            'timestamp': ns_to_datetime(self._timestamps[i]).isoformat()
+        }
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f"MeasurementLog({dict(self.items())!r})"
+
+
+class CompactRecords(Sequence):
+    """
+    字段相同的记录列表（如循环步骤的逐波长结果），存为 NumPy 结构化数组
+
+    只接受可无损还原的字段：布尔、整数、浮点数及等长的数值列表；
+    不满足时 from_records 返回原列表
+    """
+    __slots__ = ('array', '_kinds')
+
+    def __init__(self, data: np.ndarray, kinds: Tuple[str, ...]):
+        """
+        Args:
+            data: 结构化数组
+            kinds: 各字段还原时的类型 (scalar / list / tuple / ndarray)
+        """
+        self.array = data
+        self._kinds = kinds
+
+    @classmethod
+    def from_records(cls, records: List[Any]):
+        """
+        尝试压缩记录列表
+
+        Args:
+            records: 记录列表
+
+        Returns:
+            CompactRecords 或原列表（无法无损压缩时）
+        """
+        if not isinstance(records, list) or not records:
+            return records
+        first = records[0]
+        if not isinstance(first, dict) or not all(isinstance(k, str) and k for k in first):
+            return records
+        keys = tuple(first)
+        if not all(isinstance(r, dict) and tuple(r) == keys for r in records):
+            return records
+
+        dtype = []
+        kinds = []
+        for key in keys:
+            column = [r[key] for r in records]
+            field = _column_dtype(column)
+            if field is None:
+                return records
+            base, shape, kind = field
+            dtype.append((key, base, shape) if shape else (key, base))
+            kinds.append(kind)
+
+        data = np.empty(len(records), dtype=dtype)
+        for key in keys:
+            data[key] = [r[key] for r in records]
+        return cls(data, tuple(kinds))
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self.array)))]
+        return self._record(index)
+
+    def _record(self, index: int) -> Dict[str, Any]:
+        row = self.array[index]
+        record = {}
+        for name, kind in zip(self.array.dtype.names, self._kinds):
+            value = row[name]
+            if kind == 'list':
+                value = value.tolist()
+            elif kind == 'tuple':
+                value = tuple(value.tolist())
+            elif kind == 'ndarray':
+                value = np.array(value)
+            else:
+                value = value.item()
+            record[name] = value
+        return record
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompactRecords):
+            other = other.to_list()
+        return isinstance(other, list) and self.to_list() == other
+
+    def __repr__(self) -> str:
+        return f"CompactRecords({self.to_list()!r})"
+
+    def __reduce__(self):
+        return self.__class__, (self.array, self._kinds)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """还原为字典列表"""
+        return [self._record(i) for i in range(len(self.array))]
+
+
+def _scalar_dtype(values: List[Any]) -> Optional[str]:
+    """同一列标量的 NumPy 类型，无法无损保存时为None"""
+    if all(isinstance(v, (bool, np.bool_)) for v in values):
+        return '?'
+    if all(isinstance(v, (int, np.integer)) and not isinstance(v, (bool, np.bool_))
+           for v in values):
+        if all(-2 ** 63 <= int(v) < 2 ** 63 for v in values):
+            return 'i8'
+        return None
+    if all(isinstance(v, (float, np.float64, np.float32, np.float16)) for v in values):
+        return 'f8'
+    return None
+
+
+def _column_dtype(column: List[Any]) -> Optional[Tuple[str, Tuple[int, ...], str]]:
+    """推断一列的 (基础类型, 子数组形状, 还原类型)"""
+    first = column[0]
+    if isinstance(first, (list, tuple, np.ndarray)):
+        kind = 'ndarray' if isinstance(first, np.ndarray) else type(first).__name__
+        if kind not in ('list', 'tuple', 'ndarray'):
+            return None
+        if any(type(v) is not type(first) for v in column):
+            return None
+        if kind == 'ndarray':
+            if first.ndim != 1 or any(v.shape != first.shape or v.dtype != first.dtype
+                                      for v in column):
+                return None
+            if first.dtype.kind not in 'biuf':
+                return None
+            return first.dtype.str, (len(first),), kind
+        length = len(first)
+        if length == 0 or any(len(v) != length for v in column):
+            return None
+        base = _scalar_dtype([x for v in column for x in v])
+        if base is None:
+            return None
+        return base, (length,), kind
+    base = _scalar_dtype(column)
+    if base is None:
+        return None
+    return base, (), 'scalar'
+
+
+def to_plain(value: Any) -> Any:
+    """
+    将紧凑容器递归还原为普通的字典/列表（用于JSON序列化等）
+
+    Args:
+        value: 任意值
+
+    Returns:
+        还原后的值，普通类型原样返回
+    """
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, (MeasurementTable, MeasurementLog)):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, CompactRecords):
+        return value.to_list()
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    return value
@@ -2,20 +2,26 @@
 测试调度器
 负责管理测试任务队列和调度执行
 """
+import heapq
 import logging
 import threading
 import queue
-import time
 from typing import Dict, Optional, List, Callable, Any
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-import json
 from pathlib import Path
 
+from drivers.clock import get_clock
+
 from .config_manager import ConfigManager
+from .config_watcher import ConfigWatcher
 from .instrument_manager import InstrumentManager
 from .test_engine import TestEngine, TestResult, TestStatus
+from .result_model import datetime_to_ns, to_plain
+from .serialization import JsonSerializer
+from .metrics import MetricsExporter, StationMetrics
+from .spc import SpcMonitor
 
 
 class TaskPriority(Enum):
@@ -26,14 +32,14 @@ class TaskPriority(Enum):
     URGENT = 4
 
 
-@dataclass
+@dataclass(slots=True)
 class TestTask:
     """测试任务"""
     task_id: str
     flow_id: str
     priority: TaskPriority = TaskPriority.NORMAL
     product_info: Dict = field(default_factory=dict)
-    created_at: datetime = field(default_factory=datetime.now)
+    created_at: datetime = field(default_factory=lambda: get_clock().now())
     scheduled_at: Optional[datetime] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
@@ -78,12 +84,9 @@ class TestScheduler:
         self._worker_thread: Optional[threading.Thread] = None
         self._lock = threading.Lock()
         
-        # 配置
-        scheduler_config = config_manager.scheduler_config
-        self.max_retries = scheduler_config.get('max_retries', 3)
-        self.retry_delay = scheduler_config.get('retry_delay', 5)
-        self.auto_save_results = scheduler_config.get('auto_save_results', True)
-        self.results_format = scheduler_config.get('results_format', ['json'])
+        # 配置（配置热加载后自动更新）
+        self._apply_scheduler_config(config_manager.scheduler_config)
+        config_manager.add_reload_listener(self._on_config_reload)
         
         # 回调
         self._callbacks: Dict[str, List[Callable]] = {
@@ -91,12 +94,46 @@ class TestScheduler:
             'on_task_started': [],
             'on_task_completed': [],
             'on_task_failed': [],
+            'on_task_retry': [],
+            'on_task_cancelled': [],
             'on_queue_empty': []
         }
         
+        # 运行指标及其HTTP导出服务
+        self.metrics: Optional[StationMetrics] = None
+        self.metrics_exporter: Optional[MetricsExporter] = None
+        
+        # 测量值的统计过程控制
+        self.spc: Optional[SpcMonitor] = None
+        
+        # 配置文件监视（热加载）
+        self.config_watcher: Optional[ConfigWatcher] = None
+        
         # 任务ID计数器
         self._task_counter = 0
     
+    def _apply_scheduler_config(self, scheduler_config: Dict):
+        """应用调度器配置"""
+        self.max_retries = scheduler_config.get('max_retries', 3)
+        self.retry_delay = scheduler_config.get('retry_delay', 5)
+        self.auto_save_results = scheduler_config.get('auto_save_results', True)
+        self.results_format = scheduler_config.get('results_format', ['json'])
+        self.trace_export = (scheduler_config.get('tracing') or {}).get('export', 'none')
+        self.metrics_config = dict(scheduler_config.get('metrics') or {})
+        self.spc_config = dict(scheduler_config.get('spc') or {})
+        self.config_watch_config = dict(scheduler_config.get('config_watch') or {})
+        serialization = scheduler_config.get('serialization') or {}
+        self.serializer = JsonSerializer(
+            indent=serialization.get('indent', 2),
+            sidecar_threshold=serialization.get('array_sidecar_threshold', 1024)
+        )
+    
+    def _on_config_reload(self, old_snapshot, new_snapshot):
+        """配置重新加载回调"""
+        if old_snapshot.scheduler_config != new_snapshot.scheduler_config:
+            self._apply_scheduler_config(new_snapshot.scheduler_config)
+            self.logger.info("调度器配置已更新")
+    
     def register_callback(self, event: str, callback: Callable):
         """注册回调函数"""
         if event in self._callbacks:
@@ -179,15 +216,15 @@ class TestScheduler:
         Returns:
             List[str]: 任务ID列表
         """
-        product_config = self.config_manager.get_product_config(product_id)
-        if product_config is None:
+        product_spec = self.config_manager.get_product_spec(product_id)
+        if product_spec is None:
             self.logger.error(f"产品不存在: {product_id}")
             return []
         
         product_info = {
             'product_id': product_id,
-            'product_name': product_config.get('name'),
-            'serial_number': serial_number or f"SN_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            'product_name': product_spec.name,
+            'serial_number': serial_number or f"SN_{get_clock().now().strftime('%Y%m%d%H%M%S')}",
             'limits': self.config_manager.get_product_limits(product_id)
         }
         
@@ -204,12 +241,139 @@ class TestScheduler:
         
         return task_ids
     
+    def add_fixture_test(self, product_id: str, serial_numbers: List[str],
+                         priority: TaskPriority = TaskPriority.NORMAL) -> List[str]:
+        """
+        添加夹具测试：多个被测件装在同一夹具中，通过光开关切换
+        
+        产品所需的测试流程配置了 fixture_flow 时，按夹具容量（fixture_size）将被测件分组，
+        每组只排一个夹具流程任务，校准和波长调谐在组内共享；
+        未配置 fixture_flow 的流程仍按被测件逐个排队
+        
+        Args:
+            product_id: 产品ID
+            serial_numbers: 被测件序列号列表，按顺序占用光开关通道 1..N（跳过参考通道）
+            priority: 优先级
+            
+        Returns:
+            List[str]: 任务ID列表
+        """
+        product_spec = self.config_manager.get_product_spec(product_id)
+        if product_spec is None:
+            self.logger.error(f"产品不存在: {product_id}")
+            return []
+        
+        shared_info = {
+            'product_id': product_id,
+            'product_name': product_spec.name,
+            'limits': self.config_manager.get_product_limits(product_id)
+        }
+        
+        task_ids = []
+        for flow_id in self.config_manager.get_product_test_requirements(product_id):
+            flow_config = self.config_manager.get_test_flow(flow_id) or {}
+            fixture_flow = flow_config.get('fixture_flow')
+            if not fixture_flow:
+                for serial_number in serial_numbers:
+                    task_ids.append(self.add_task(
+                        flow_id=flow_id,
+                        priority=priority,
+                        product_info={**shared_info, 'serial_number': serial_number}
+                    ))
+                continue
+            
+            fixture_config = self.config_manager.get_test_flow(fixture_flow) or {}
+            fixture_params = fixture_config.get('parameters', {})
+            fixture_size = fixture_params.get('fixture_size', 8)
+            reference_channel = fixture_params.get('reference_channel')
+            channels = [ch for ch in range(1, fixture_size + 2) if ch != reference_channel][:fixture_size]
+            for start in range(0, len(serial_numbers), fixture_size):
+                group = serial_numbers[start:start + fixture_size]
+                duts = [{'serial_number': sn, 'channel': ch} for sn, ch in zip(group, channels)]
+                task_ids.append(self.add_task(
+                    flow_id=fixture_flow,
+                    priority=priority,
+                    product_info={**shared_info, 'serial_number': ','.join(group), 'duts': duts}
+                ))
+        
+        return task_ids
+    
+    def enable_metrics(self, metrics: Optional[StationMetrics] = None,
+                       serve: bool = True) -> StationMetrics:
+        """
+        启用运行指标采集，并按 scheduler.metrics 配置启动HTTP导出服务
+        
+        Args:
+            metrics: 测试站指标，默认新建
+            serve: 是否启动HTTP导出服务
+            
+        Returns:
+            StationMetrics: 测试站指标
+        """
+        if self.metrics is None:
+            self.metrics = metrics or StationMetrics()
+            self.metrics.attach_scheduler(self)
+            if self.spc is not None:
+                self.metrics.attach_spc(self.spc)
+        if serve and self.metrics_exporter is None:
+            self.metrics_exporter = MetricsExporter(
+                self.metrics.registry,
+                host=self.metrics_config.get('host', '0.0.0.0'),
+                port=self.metrics_config.get('port', 9108)
+            )
+            self.metrics_exporter.start()
+        return self.metrics
+    
+    def enable_spc(self, spc: Optional[SpcMonitor] = None) -> SpcMonitor:
+        """
+        启用测量值的统计过程控制（按 scheduler.spc 配置）
+        
+        Args:
+            spc: SPC实例，默认按配置新建
+            
+        Returns:
+            SpcMonitor: SPC实例
+        """
+        if self.spc is None:
+            self.spc = spc or SpcMonitor(self.spc_config)
+            self.spc.attach_scheduler(self)
+            if self.metrics is not None:
+                self.metrics.attach_spc(self.spc)
+        return self.spc
+    
+    def enable_config_watch(self, watcher: Optional[ConfigWatcher] = None) -> ConfigWatcher:
+        """
+        启动配置文件监视，文件修改后自动重新加载并发布新的配置快照（按 scheduler.config_watch 配置）
+        
+        Args:
+            watcher: 配置监视器，默认按配置新建
+            
+        Returns:
+            ConfigWatcher: 配置监视器
+        """
+        if self.config_watcher is None:
+            self.config_watcher = watcher or ConfigWatcher(
+                self.config_manager,
+                interval=self.config_watch_config.get('interval', 1.0),
+                settle_time=self.config_watch_config.get('settle_time', 0.2)
+            )
+        if not self.config_watcher.is_running:
+            self.config_watcher.start()
+        return self.config_watcher
+    
     def start(self):
         """启动调度器"""
         if self._running:
             self.logger.warning("调度器已在运行")
             return
         
+        if self.spc_config.get('enabled', False):
+            self.enable_spc()
+        if self.metrics_config.get('enabled', False):
+            self.enable_metrics()
+        if self.config_watch_config.get('enabled', False):
+            self.enable_config_watch()
+        
         self._running = True
         self._worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
         self._worker_thread.start()
@@ -225,6 +389,11 @@ class TestScheduler:
         self._running = False
         if wait and self._worker_thread:
             self._worker_thread.join(timeout=30)
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
         self.logger.info("调度器已停止")
     
     def _worker_loop(self):
@@ -238,9 +407,9 @@ class TestScheduler:
                     continue
                 
                 # 检查计划执行时间
-                if task.scheduled_at and datetime.now() < task.scheduled_at:
+                if task.scheduled_at and get_clock().now() < task.scheduled_at:
                     self._task_queue.put(task)
-                    time.sleep(1)
+                    get_clock().sleep(1)
                     continue
                 
                 # 执行任务
@@ -258,8 +427,12 @@ class TestScheduler:
         Args:
             task: 测试任务
         """
+        # 取消时已从队列移除，这里防止取消与出队同时发生时仍执行
+        if task.status == "cancelled":
+            return
+        
         task.status = "running"
-        task.started_at = datetime.now()
+        task.started_at = get_clock().now()
         self._trigger_callback('on_task_started', task)
         self.logger.info(f"开始执行任务: {task.task_id}")
         
@@ -275,13 +448,14 @@ class TestScheduler:
                 task.status = "completed"
                 self._trigger_callback('on_task_completed', task)
             else:
-                # 判断是否需要重试
-                if (task.retry_count < task.max_retries and 
+                # 判断是否需要重试（提前中止为确定不合格，不重试）
+                if (task.retry_count < task.max_retries and not result.early_abort and
                     result.status in [TestStatus.ERROR, TestStatus.FAILED]):
                     task.retry_count += 1
                     task.status = "pending"
+                    self._trigger_callback('on_task_retry', task)
                     self.logger.info(f"任务 {task.task_id} 将重试 ({task.retry_count}/{task.max_retries})")
-                    time.sleep(self.retry_delay)
+                    get_clock().sleep(self.retry_delay)
                     self._task_queue.put(task)
                     return
                 else:
@@ -293,19 +467,101 @@ class TestScheduler:
             task.status = "error"
             self._trigger_callback('on_task_failed', task)
         
-        task.completed_at = datetime.now()
+        task.completed_at = get_clock().now()
         self._completed_tasks.append(task)
         
         # 自动保存结果
         if self.auto_save_results and task.result:
             self._save_task_result(task)
+        
+        # 完整追踪记录（每个流程数百个跨度）已导出，任务结果只保留耗时汇总（result.timing）
+        if task.result is not None:
+            task.result.trace = None
+        
+        if task.result and task.result.early_abort.get('cancel_siblings'):
+            self._cancel_sibling_tasks(task)
+    
+    def _cancel_sibling_tasks(self, task: TestTask):
+        """
+        被测件已确定不合格，取消队列中同一序列号的其余流程
+        
+        Args:
+            task: 提前中止的任务
+        """
+        serial_number = task.product_info.get('serial_number')
+        if not serial_number:
+            return
+        
+        reason = (f"被测件 {serial_number} 在任务 {task.task_id} 中提前中止: "
+                  f"{task.result.early_abort['reason']}")
+        siblings = [t for t in self._all_tasks.values()
+                    if t is not task and t.status == "pending" and
+                    t.product_info.get('serial_number') == serial_number]
+        self._remove_from_queue(siblings)
+        for sibling in siblings:
+            self._mark_cancelled(sibling, reason, {'reason': reason, 'cancelled_by': task.task_id})
+    
+    def cancel_task(self, task_id: str, reason: str = "用户取消") -> bool:
+        """
+        取消尚未开始执行的任务
+        
+        Args:
+            task_id: 任务ID
+            reason: 取消原因
+            
+        Returns:
+            bool: 是否已取消（任务不存在或已开始执行时为False）
+        """
+        task = self.get_task(task_id)
+        if task is None or task.status != "pending":
+            return False
+        self._remove_from_queue([task])
+        self._mark_cancelled(task, reason)
+        return True
+    
+    def _mark_cancelled(self, task: TestTask, reason: str, early_abort: Optional[Dict] = None):
+        """将已移出队列的任务标记为取消，并触发 on_task_cancelled"""
+        now = get_clock().now()
+        task.status = "cancelled"
+        task.completed_at = now
+        task.result = TestResult(
+            flow_id=task.flow_id,
+            flow_name=task.flow_id,
+            status=TestStatus.SKIPPED,
+            start_ns=datetime_to_ns(now),
+            end_ns=datetime_to_ns(now),
+            error_message=reason,
+            product_info=task.product_info,
+            early_abort=early_abort or {}
+        )
+        self._completed_tasks.append(task)
+        self._trigger_callback('on_task_cancelled', task)
+        self.logger.info(f"任务 {task.task_id} 已取消: {reason}")
+        
+        if self.auto_save_results:
+            self._save_task_result(task)
+    
+    def _remove_from_queue(self, tasks: List[TestTask]):
+        """
+        从任务队列中移除任务（取消的任务不再占用队列深度）
+        
+        Args:
+            tasks: 要移除的任务
+        """
+        removed = {id(t) for t in tasks}
+        if not removed:
+            return
+        with self._task_queue.mutex:
+            heap = self._task_queue.queue
+            heap[:] = [t for t in heap if id(t) not in removed]
+            heapq.heapify(heap)
     
     def _save_task_result(self, task: TestTask):
         """保存任务结果"""
         results_dir = Path(__file__).parent.parent / 'reports'
         results_dir.mkdir(exist_ok=True)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        timestamp = get_clock().now().strftime('%Y%m%d_%H%M%S')
         base_name = f"{task.task_id}_{timestamp}"
         
         result_data = {
@@ -320,15 +576,41 @@ class TestScheduler:
             'result': {
                 'status': task.result.status.value if task.result else None,
                 'duration': task.result.duration if task.result else None,
-                'measurements': task.result.measurements if task.result else {},
+                'measurements': to_plain(task.result.measurements) if task.result else {},
+                'passed_criteria': task.result.passed_criteria if task.result else {},
                 'error_message': task.result.error_message if task.result else None
             }
         }
+        if task.result and task.result.early_abort:
+            result_data['result']['early_abort'] = task.result.early_abort
+            result_data['result']['steps'] = [
+                {'step_id': step.step_id, 'name': step.name, 'status': step.status.value,
+                 'error_message': step.error_message}
+                for step in task.result.step_results
+            ]
+        if task.result and task.result.dut_results:
+            result_data['duts'] = [
+                {
+                    'serial_number': dut.product_info.get('serial_number'),
+                    'fixture_position': dut.product_info.get('fixture_position'),
+                    'status': dut.status.value,
+                    'measurements': to_plain(dut.measurements),
+                    'passed_criteria': dut.passed_criteria,
+                    'error_message': dut.error_message
+                }
+                for dut in task.result.dut_results
+            ]
+        if task.result and task.result.timing:
+            result_data['result']['timing'] = task.result.timing
+        trace = task.result.trace if task.result else None
         
         if 'json' in self.results_format:
-            json_path = results_dir / f"{base_name}.json"
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, indent=2, ensure_ascii=False)
+            self.serializer.dump(result_data, results_dir / f"{base_name}.json")
+        
+        # 导出追踪记录，chrome 格式可在 chrome://tracing 或 Perfetto 中打开
+        if trace is not None and self.trace_export in ('chrome', 'otel'):
+            trace_data = trace.to_chrome_trace() if self.trace_export == 'chrome' else trace.to_otel()
+            self.serializer.dump(trace_data, results_dir / f"{base_name}.trace.json")
     
     def get_task(self, task_id: str) -> Optional[TestTask]:
         """获取任务"""
@@ -352,12 +634,14 @@ class TestScheduler:
         return self._task_queue.qsize()
     
     def clear_queue(self):
-        """清空任务队列"""
+        """清空任务队列（队列中的任务标记为取消）"""
         while not self._task_queue.empty():
             try:
-                self._task_queue.get_nowait()
+                task = self._task_queue.get_nowait()
             except queue.Empty:
                 break
+            if task.status == "pending":
+                self._mark_cancelled(task, "任务队列已清空")
         self.logger.info("任务队列已清空")
     
     def get_statistics(self) -> Dict:
@@ -367,6 +651,7 @@ class TestScheduler:
         failed = len([t for t in self._all_tasks.values() if t.status in ["failed", "error"]])
         pending = len([t for t in self._all_tasks.values() if t.status == "pending"])
         running = len([t for t in self._all_tasks.values() if t.status == "running"])
+        cancelled = len([t for t in self._all_tasks.values() if t.status == "cancelled"])
         
         return {
             'total_tasks': total,
@@ -374,6 +659,7 @@ class TestScheduler:
             'failed': failed,
             'pending': pending,
             'running': running,
+            'cancelled': cancelled,
             'queue_size': self.get_queue_size(),
             'success_rate': (completed / total * 100) if total > 0 else 0
         }
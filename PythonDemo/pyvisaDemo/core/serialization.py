@@ -0,0 +1,203 @@
+"""
+结果序列化
+测试结果、报告和追踪记录的JSON读写：
+- 安装了 orjson（可选依赖）时使用 orjson，否则退回标准库 json；两者输出一致，NaN/Inf 都写为 null
+- 直接支持 NumPy 数组/标量、datetime、Enum 以及紧凑结果容器，无需事先转换为列表
+- 元素数达到阈值的大数组另存为 .npy 附属文件，JSON 中只保留引用，读取时可内存映射；
+  覆盖写入时删除旧结果多出的附属文件
+"""
+import glob
+import json
+import logging
+import math
+from collections.abc import Mapping
+from datetime import date, datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from .result_model import CompactRecords
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+
+# JSON 中大数组引用的标记键
+ARRAY_REF_KEY = '$ndarray'
+
+
+def _default(obj: Any) -> Any:
+    """JSON 编码器不认识的类型的转换"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, CompactRecords):
+        return obj.to_list()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+
+def _to_plain(value: Any) -> Any:
+    """转换为标准库 json 可编码的数据，非有限浮点数转为 None（与 orjson 一样写为 null）"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if value is None or isinstance(value, (str, int)):
+        return value
+    if isinstance(value, dict):
+        return {k: _to_plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    return _to_plain(_default(value))
+
+
+class JsonSerializer:
+    """JSON 序列化器"""
+
+    def __init__(self, indent: int = 2, sidecar_threshold: Optional[int] = 1024,
+                 use_orjson: bool = True):
+        """
+        初始化序列化器
+
+        Args:
+            indent: 缩进，0 为紧凑输出（orjson 只支持2个空格的缩进，非0时一律按2处理）
+            sidecar_threshold: 数组元素数达到此值时另存为 .npy 附属文件，None 表示不拆分
+            use_orjson: 是否在可用时使用 orjson
+        """
+        self.indent = indent
+        self.sidecar_threshold = sidecar_threshold
+        self.use_orjson = use_orjson and orjson is not None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @property
+    def backend(self) -> str:
+        """实际使用的编码库"""
+        return 'orjson' if self.use_orjson else 'json'
+
+    def dumps(self, data: Any) -> bytes:
+        """
+        编码为 UTF-8 JSON
+
+        Args:
+            data: 数据
+
+        Returns:
+            bytes: JSON 字节串
+        """
+        if self.use_orjson:
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if self.indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(data, default=_default, option=option)
+        return json.dumps(_to_plain(data), indent=self.indent or None, allow_nan=False,
+                          ensure_ascii=False).encode('utf-8')
+
+    def loads(self, content: Union[bytes, str]) -> Any:
+        """解码 JSON"""
+        if self.use_orjson:
+            return orjson.loads(content)
+        return json.loads(content)
+
+    def dump(self, data: Any, path: Union[str, Path]) -> List[Path]:
+        """
+        写入 JSON 文件，大数组另存为 <文件名>.<序号>.npy，同名文件的旧附属文件中本次没有写入的被删除
+
+        Args:
+            data: 数据（不会被修改）
+            path: JSON 文件路径
+
+        Returns:
+            List[Path]: 写入的附属文件
+        """
+        path = Path(path)
+        sidecars: List[Path] = []
+        if self.sidecar_threshold is not None:
+            data = self._extract_arrays(data, path, sidecars)
+        with open(path, 'wb') as f:
+            f.write(self.dumps(data))
+        self._remove_stale_sidecars(path, sidecars)
+        return sidecars
+
+    def _remove_stale_sidecars(self, path: Path, sidecars: List[Path]):
+        """删除覆盖前的结果留下、本次没有写入的附属文件"""
+        written = {sidecar.name for sidecar in sidecars}
+        for stale in path.parent.glob(f"{glob.escape(path.stem)}.*.npy"):
+            index = stale.name[len(path.stem) + 1:-len('.npy')]
+            if index.isdigit() and stale.name not in written:
+                try:
+                    stale.unlink()
+                except OSError as e:
+                    self.logger.warning(f"删除旧附属文件失败 {stale}: {e}")
+
+    def load(self, path: Union[str, Path], mmap_mode: Optional[str] = None) -> Any:
+        """
+        读取 JSON 文件并还原附属文件中的数组
+
+        Args:
+            path: JSON 文件路径
+            mmap_mode: 附属文件的内存映射方式（如 'r'），None 为读入内存
+
+        Returns:
+            解码后的数据，数组引用还原为 np.ndarray（结构化记录还原为 CompactRecords）
+        """
+        path = Path(path)
+        with open(path, 'rb') as f:
+            data = self.loads(f.read())
+        return self._resolve_arrays(data, path.parent, mmap_mode)
+
+    def _extract_arrays(self, value: Any, path: Path, sidecars: List[Path]) -> Any:
+        """将大数组替换为附属文件引用"""
+        if isinstance(value, dict):
+            return {k: self._extract_arrays(v, path, sidecars) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._extract_arrays(v, path, sidecars) for v in value]
+        if isinstance(value, CompactRecords):
+            array = value.array
+            if array.size * len(array.dtype.names) < self.sidecar_threshold:
+                return value
+            ref = self._save_array(array, path, sidecars)
+            ref['records'] = list(value._kinds)
+            return ref
+        if isinstance(value, np.ndarray) and value.size >= self.sidecar_threshold:
+            if value.dtype.kind not in 'biufc':
+                return value
+            return self._save_array(value, path, sidecars)
+        return value
+
+    def _save_array(self, array: np.ndarray, path: Path, sidecars: List[Path]) -> Dict:
+        """保存一个附属文件并返回引用"""
+        sidecar = path.with_name(f"{path.stem}.{len(sidecars)}.npy")
+        np.save(sidecar, np.ascontiguousarray(array), allow_pickle=False)
+        sidecars.append(sidecar)
+        return {
+            ARRAY_REF_KEY: sidecar.name,
+            'dtype': array.dtype.str if array.dtype.names is None else 'records',
+            'shape': list(array.shape)
+        }
+
+    def _resolve_arrays(self, value: Any, directory: Path, mmap_mode: Optional[str]) -> Any:
+        """将附属文件引用还原为数组"""
+        if isinstance(value, dict):
+            name = value.get(ARRAY_REF_KEY)
+            if isinstance(name, str):
+                array = np.load(directory / name, mmap_mode=mmap_mode, allow_pickle=False)
+                if 'records' in value:
+                    return CompactRecords(array, tuple(value['records']))
+                return array
+            return {k: self._resolve_arrays(v, directory, mmap_mode) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._resolve_arrays(v, directory, mmap_mode) for v in value]
+        return value
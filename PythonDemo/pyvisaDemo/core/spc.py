@@ -0,0 +1,376 @@
+"""
+统计过程控制(SPC)
+订阅调度器的任务结束事件（或测试引擎的流程结束事件），按 (产品, 测试流程, 测量项) 维护流式统计，
+不保存任何原始数据：
+- Welford 算法的运行均值/方差、最小/最大值
+- EWMA 控制图：对小幅持续漂移敏感（如参考跳线逐渐劣化）
+- 双侧 CUSUM 控制图：累积偏离基线的量，检出阶跃性的小偏移
+- 过程能力 Cpk（需要规格限）
+
+每个序列先用前 warmup 个样本估计基线（均值和标准差），之后按基线判断是否失控。
+只统计任务的最终一次运行：重试前的运行、提前中止和出错的运行不计入。
+每个序列的状态大小固定，与测试数量无关
+"""
+import fnmatch
+import logging
+import math
+import numbers
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from drivers.clock import get_clock
+
+from .limit_engine import QUANTITY_PATTERNS
+from .test_engine import TestStatus
+
+
+# 产品限值名称对应的测量项名称模式（products.yaml 的 limits 使用物理量名称）
+PRODUCT_LIMIT_PATTERNS = QUANTITY_PATTERNS
+
+
+class RunningStats:
+    """Welford 运行统计"""
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value: float):
+        """加入一个样本"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def variance(self) -> float:
+        """样本方差"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        """样本标准差"""
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict:
+        return {'count': self.count, 'mean': self.mean, 'std': self.std,
+                'min': self.min, 'max': self.max}
+
+
+@dataclass(slots=True)
+class SpcAlarm:
+    """失控报警"""
+    product: str
+    flow_id: str
+    name: str
+    # ewma / cusum_high / cusum_low / cpk
+    chart: str
+    value: float
+    limit: float
+    count: int
+    serial_number: str
+    timestamp: datetime
+
+
+class SpcSeries:
+    """一个测量序列的 SPC 状态"""
+    __slots__ = ('key', 'stats', 'baseline_mean', 'baseline_std', 'ewma', 'cusum_high',
+                 'cusum_low', 'ewma_alarm', 'cusum_high_alarm', 'cusum_low_alarm', 'cpk_alarm',
+                 'lsl', 'usl', 'alarms')
+
+    def __init__(self, key: Tuple[str, str, str], lsl: Optional[float] = None,
+                 usl: Optional[float] = None):
+        self.key = key
+        self.stats = RunningStats()
+        self.baseline_mean: Optional[float] = None
+        self.baseline_std = 0.0
+        self.ewma = 0.0
+        self.cusum_high = 0.0
+        self.cusum_low = 0.0
+        # 处于失控状态的标志，同一次失控只报警一次
+        self.ewma_alarm = False
+        self.cusum_high_alarm = False
+        self.cusum_low_alarm = False
+        self.cpk_alarm = False
+        self.lsl = lsl
+        self.usl = usl
+        self.alarms = 0
+
+    @property
+    def cpk(self) -> Optional[float]:
+        """过程能力指数，没有规格限或样本不足时为None"""
+        std = self.stats.std
+        if self.stats.count < 2 or std <= 0 or (self.lsl is None and self.usl is None):
+            return None
+        mean = self.stats.mean
+        sides = []
+        if self.usl is not None:
+            sides.append((self.usl - mean) / (3 * std))
+        if self.lsl is not None:
+            sides.append((mean - self.lsl) / (3 * std))
+        return min(sides)
+
+    def to_dict(self) -> Dict:
+        product, flow_id, name = self.key
+        return {
+            'product': product, 'flow_id': flow_id, 'name': name,
+            **self.stats.to_dict(),
+            'baseline_mean': self.baseline_mean, 'baseline_std': self.baseline_std,
+            'ewma': self.ewma, 'cusum_high': self.cusum_high, 'cusum_low': self.cusum_low,
+            'lsl': self.lsl, 'usl': self.usl, 'cpk': self.cpk, 'alarms': self.alarms
+        }
+
+
+class SpcMonitor:
+    """流式统计过程控制"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        """
+        初始化SPC
+
+        Args:
+            config: 配置（scheduler.spc），可包含:
+                warmup: 估计基线的样本数，默认30
+                ewma_lambda: EWMA 平滑系数，默认0.2
+                ewma_l: EWMA 控制限宽度(σ)，默认3
+                cusum_k: CUSUM 允许偏移(σ)，默认0.5
+                cusum_h: CUSUM 判定阈值(σ)，默认5
+                cpk_min: Cpk 报警下限，默认1.33
+                spec_limits: {产品ID: {测量项名称模式: {min, max}}}，优先于该产品的产品限值，
+                    未配置的产品使用产品限值
+        """
+        config = config or {}
+        self.warmup = max(2, int(config.get('warmup', 30)))
+        self.ewma_lambda = float(config.get('ewma_lambda', 0.2))
+        self.ewma_l = float(config.get('ewma_l', 3.0))
+        self.cusum_k = float(config.get('cusum_k', 0.5))
+        self.cusum_h = float(config.get('cusum_h', 5.0))
+        self.cpk_min = float(config.get('cpk_min', 1.33))
+        self.spec_limits: Dict[str, Dict[str, Dict]] = dict(config.get('spec_limits') or {})
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._series: Dict[Tuple[str, str, str], SpcSeries] = {}
+        self._lock = threading.Lock()
+        self._callbacks: Dict[str, List[Callable]] = {'on_alarm': []}
+
+    def register_callback(self, event: str, callback: Callable):
+        """
+        注册回调函数
+
+        Args:
+            event: 事件名称（on_alarm，参数为 SpcAlarm）
+            callback: 回调函数
+        """
+        if event in self._callbacks:
+            self._callbacks[event].append(callback)
+
+    def attach(self, engine):
+        """
+        订阅测试引擎的流程结束事件（直接使用引擎、没有调度器重试时）
+
+        Args:
+            engine: TestEngine
+        """
+        engine.register_callback('on_flow_end', self.observe_result)
+
+    def attach_scheduler(self, scheduler):
+        """
+        订阅调度器的任务结束事件，只统计任务的最终一次运行（重试前的运行不计入）
+
+        Args:
+            scheduler: TestScheduler
+        """
+        scheduler.register_callback('on_task_completed', self._on_task_done)
+        scheduler.register_callback('on_task_failed', self._on_task_done)
+
+    # ------------------------------------------------------------------ 结果
+
+    def _on_task_done(self, task):
+        # 执行异常（status 为 error）时 task.result 可能是重试前的运行
+        if task.result is not None and task.status != 'error':
+            self.observe_result(task.result)
+
+    @staticmethod
+    def _counts(result) -> bool:
+        """运行是否计入统计：提前中止、出错或未完成的运行测量项不完整或有偏，不计入"""
+        return (result.status in (TestStatus.PASSED, TestStatus.FAILED) and
+                not result.early_abort)
+
+    def observe_result(self, result) -> List[SpcAlarm]:
+        """
+        加入一次运行的全部测量项（夹具流程同时加入各被测件的测量项）
+
+        Args:
+            result: TestResult
+
+        Returns:
+            List[SpcAlarm]: 本次触发的报警
+        """
+        if not self._counts(result):
+            return []
+        alarms = self._observe_measurements(result)
+        for dut_result in result.dut_results:
+            if self._counts(dut_result):
+                alarms.extend(self._observe_measurements(dut_result))
+        return alarms
+
+    def _observe_measurements(self, result) -> List[SpcAlarm]:
+        product_info = result.product_info
+        product = str(product_info.get('product_id', ''))
+        serial = str(product_info.get('serial_number', ''))
+        alarms: List[SpcAlarm] = []
+        for name, value in result.measurements.items():
+            if isinstance(value, bool) or not isinstance(value, numbers.Real):
+                continue
+            alarms.extend(self.observe(product, result.flow_id, name, float(value), serial,
+                                       product_info.get('limits')))
+        return alarms
+
+    # ------------------------------------------------------------------ 统计
+
+    def _spec_for(self, product: str, name: str,
+                  product_limits: Optional[Dict]) -> Tuple[Optional[float], Optional[float]]:
+        """测量项的规格限 (下限, 上限)：该产品的 spec_limits，其次为产品限值"""
+        for pattern, limit in (self.spec_limits.get(product) or {}).items():
+            if fnmatch.fnmatchcase(name, pattern):
+                return limit.get('min'), limit.get('max')
+        for limit_name, limit in (product_limits or {}).items():
+            pattern = PRODUCT_LIMIT_PATTERNS.get(limit_name, limit_name)
+            if isinstance(limit, dict) and fnmatch.fnmatchcase(name, pattern):
+                return limit.get('min'), limit.get('max')
+        return None, None
+
+    def observe(self, product: str, flow_id: str, name: str, value: float,
+                serial_number: str = '', product_limits: Optional[Dict] = None) -> List[SpcAlarm]:
+        """
+        加入一个测量值
+
+        Args:
+            product: 产品ID
+            flow_id: 测试流程ID
+            name: 测量项名称
+            value: 测量值
+            serial_number: 被测件序列号（只用于报警信息）
+            product_limits: 产品限值（首次出现该序列时用于确定规格限）
+
+        Returns:
+            List[SpcAlarm]: 本次触发的报警
+        """
+        if not math.isfinite(value):
+            return []
+        key = (product, flow_id, name)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = SpcSeries(key, *self._spec_for(product, name, product_limits))
+            alarms = self._update(series, value, serial_number)
+
+        for alarm in alarms:
+            self.logger.warning(
+                f"SPC报警 [{alarm.chart}] {product}/{flow_id}/{name}: "
+                f"{alarm.value:.4g} 超出 {alarm.limit:.4g}（第{alarm.count}个样本，{serial_number}）"
+            )
+            for callback in self._callbacks['on_alarm']:
+                try:
+                    callback(alarm)
+                except Exception as e:
+                    self.logger.error(f"回调函数执行错误: {e}")
+        return alarms
+
+    def _update(self, series: SpcSeries, value: float, serial_number: str) -> List[SpcAlarm]:
+        stats = series.stats
+        stats.update(value)
+        alarms: List[SpcAlarm] = []
+
+        def alarm(chart: str, chart_value: float, limit: float):
+            series.alarms += 1
+            alarms.append(SpcAlarm(series.key[0], series.key[1], series.key[2], chart,
+                                   chart_value, limit, stats.count, serial_number,
+                                   get_clock().now()))
+
+        if series.baseline_mean is None:
+            # 第一阶段：用前 warmup 个样本估计基线
+            if stats.count >= self.warmup:
+                series.baseline_mean = stats.mean
+                series.baseline_std = stats.std
+                series.ewma = stats.mean
+        elif series.baseline_std > 0:
+            mean, sigma = series.baseline_mean, series.baseline_std
+            lam = self.ewma_lambda
+
+            # EWMA
+            series.ewma = lam * value + (1 - lam) * series.ewma
+            n = stats.count - self.warmup
+            width = self.ewma_l * sigma * math.sqrt(lam / (2 - lam) * (1 - (1 - lam) ** (2 * n)))
+            out = abs(series.ewma - mean) > width
+            if out and not series.ewma_alarm:
+                alarm('ewma', series.ewma, mean + math.copysign(width, series.ewma - mean))
+            series.ewma_alarm = out
+
+            # CUSUM
+            z = (value - mean) / sigma
+            series.cusum_high = max(0.0, series.cusum_high + z - self.cusum_k)
+            series.cusum_low = max(0.0, series.cusum_low - z - self.cusum_k)
+            out = series.cusum_high > self.cusum_h
+            if out and not series.cusum_high_alarm:
+                alarm('cusum_high', series.cusum_high, self.cusum_h)
+            series.cusum_high_alarm = out
+            out = series.cusum_low > self.cusum_h
+            if out and not series.cusum_low_alarm:
+                alarm('cusum_low', series.cusum_low, self.cusum_h)
+            series.cusum_low_alarm = out
+
+        if stats.count >= self.warmup:
+            cpk = series.cpk
+            low = cpk is not None and cpk < self.cpk_min
+            if low and not series.cpk_alarm:
+                alarm('cpk', cpk, self.cpk_min)
+            series.cpk_alarm = low
+        return alarms
+
+    # ------------------------------------------------------------------ 查询
+
+    def get_series(self, product: str, flow_id: str, name: str) -> Optional[SpcSeries]:
+        """获取一个序列的状态"""
+        return self._series.get((product, flow_id, name))
+
+    def summary(self, product: Optional[str] = None, flow_id: Optional[str] = None) -> List[Dict]:
+        """
+        各序列的统计汇总
+
+        Args:
+            product: 只返回该产品的序列
+            flow_id: 只返回该流程的序列
+
+        Returns:
+            List[Dict]: 每个序列的统计量、控制图状态和 Cpk
+        """
+        with self._lock:
+            series_list = list(self._series.values())
+        return [
+            s.to_dict() for s in series_list
+            if (product is None or s.key[0] == product) and (flow_id is None or s.key[1] == flow_id)
+        ]
+
+    def reset(self, product: Optional[str] = None, flow_id: Optional[str] = None):
+        """
+        清除序列（如更换参考跳线、重新校准后重新建立基线）
+
+        Args:
+            product: 只清除该产品的序列
+            flow_id: 只清除该流程的序列
+        """
+        with self._lock:
+            for key in list(self._series):
+                if (product is None or key[0] == product) and (flow_id is None or key[1] == flow_id):
+                    del self._series[key]
@@ -5,14 +5,23 @@
 import logging
 import time
 import importlib
+import copy
 from typing import Dict, Optional, List, Any, Callable
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 import traceback
+from contextlib import contextmanager
+
+from drivers.clock import get_clock
+from drivers.tracing import Trace, span, CATEGORY_FLOW, CATEGORY_STEP, CATEGORY_CALLBACK
 
 from .config_manager import ConfigManager
 from .instrument_manager import InstrumentManager
+from .limit_engine import LimitEngine
+from .result_model import (
+    CompactRecords, MeasurementTable, accepts_datetimes, datetime_to_ns, ns_property, to_plain
+)
 
 
 class TestStatus(Enum):
@@ -26,39 +35,142 @@ class TestStatus(Enum):
     ABORTED = "aborted"
 
 
-@dataclass
+@accepts_datetimes(start_time='start_ns', end_time='end_ns')
+@dataclass(slots=True)
 class StepResult:
-    """测试步骤结果"""
+    """测试步骤结果（时间存为纳秒整数，通过 start_time/end_time 以 datetime 访问）"""
     step_id: int
     name: str
     status: TestStatus
-    start_time: datetime
-    end_time: datetime
+    start_ns: int
+    end_ns: int
     duration: float
     data: Dict = field(default_factory=dict)
     error_message: str = ""
+    # 耗时分解（秒）：scpi通信、sleep等待、callback回调、compute其余计算
+    timing: Dict = field(default_factory=dict)
+    
+    start_time = ns_property('start_ns', '开始时间')
+    end_time = ns_property('end_ns', '结束时间')
+    
+    def to_dict(self) -> Dict:
+        """
+        转换为JSON报告中的步骤字典
+        
+        Returns:
+            Dict: 步骤数据
+        """
+        return {
+            'step_id': self.step_id,
+            'name': self.name,
+            'status': self.status.value,
+            'start_time': self.start_time.isoformat(),
+            'end_time': self.end_time.isoformat(),
+            'duration': self.duration,
+            'data': to_plain(self.data),
+            'error_message': self.error_message,
+            'timing': self.timing
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StepResult':
+        """由 to_dict 的结果还原"""
+        return cls(
+            step_id=data['step_id'],
+            name=data['name'],
+            status=TestStatus(data['status']),
+            start_ns=datetime_to_ns(datetime.fromisoformat(data['start_time'])),
+            end_ns=datetime_to_ns(datetime.fromisoformat(data['end_time'])),
+            duration=data['duration'],
+            data=data.get('data') or {},
+            error_message=data.get('error_message', ''),
+            timing=data.get('timing') or {}
+        )
 
 
-@dataclass
+@accepts_datetimes(start_time='start_ns', end_time='end_ns')
+@dataclass(slots=True)
 class TestResult:
-    """测试结果"""
+    """测试结果（时间存为纳秒整数，测量值存于紧凑的 MeasurementTable）"""
     flow_id: str
     flow_name: str
     status: TestStatus
-    start_time: datetime
-    end_time: Optional[datetime] = None
+    start_ns: int
+    end_ns: Optional[int] = None
     duration: float = 0.0
     step_results: List[StepResult] = field(default_factory=list)
-    measurements: Dict = field(default_factory=dict)
+    measurements: MeasurementTable = field(default_factory=MeasurementTable)
     pass_criteria: Dict = field(default_factory=dict)
     passed_criteria: Dict = field(default_factory=dict)
     error_message: str = ""
     product_info: Dict = field(default_factory=dict)
+    config_version: int = 0
+    # 完整的追踪记录（供导出，调度器保存结果后即释放）及其耗时汇总（长期保留）
+    trace: Optional[Trace] = None
+    timing: Dict = field(default_factory=dict)
+    # 夹具模式下每个被测件的结果（product_info['duts'] 中每项一个）
+    dut_results: List['TestResult'] = field(default_factory=list)
+    # 提前中止信息（触发的测量项、限值、原因、跳过的步骤），未中止时为空
+    early_abort: Dict = field(default_factory=dict)
+    
+    start_time = ns_property('start_ns', '开始时间')
+    end_time = ns_property('end_ns', '结束时间')
+    
+    def to_dict(self) -> Dict:
+        """
+        转换为JSON报告的字典格式
+        
+        Returns:
+            Dict: 报告数据
+        """
+        data = {
+            'flow_id': self.flow_id,
+            'flow_name': self.flow_name,
+            'status': self.status.value,
+            'start_time': self.start_time.isoformat(),
+            'end_time': self.end_time.isoformat() if self.end_ns is not None else None,
+            'duration': self.duration,
+            'product_info': self.product_info,
+            'measurements': self.measurements.to_dict(),
+            'pass_criteria': self.pass_criteria,
+            'passed_criteria': self.passed_criteria,
+            'error_message': self.error_message,
+            'steps': [step.to_dict() for step in self.step_results]
+        }
+        if self.early_abort:
+            data['early_abort'] = self.early_abort
+        if self.timing:
+            data['timing'] = self.timing
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TestResult':
+        """由 to_dict 的结果还原"""
+        end_time = data.get('end_time')
+        return cls(
+            flow_id=data['flow_id'],
+            flow_name=data.get('flow_name', data['flow_id']),
+            status=TestStatus(data['status']),
+            start_ns=datetime_to_ns(datetime.fromisoformat(data['start_time'])),
+            end_ns=datetime_to_ns(datetime.fromisoformat(end_time)) if end_time else None,
+            duration=data.get('duration', 0.0),
+            step_results=[StepResult.from_dict(step) for step in data.get('steps', [])],
+            measurements=MeasurementTable(data.get('measurements')),
+            pass_criteria=data.get('pass_criteria') or {},
+            passed_criteria=data.get('passed_criteria') or {},
+            error_message=data.get('error_message', ''),
+            product_info=data.get('product_info') or {},
+            early_abort=data.get('early_abort') or {},
+            timing=data.get('timing') or {}
+        )
 
 
 class TestEngine:
     """测试引擎"""
     
+    # 提前中止的默认超限量（与测量值同单位），刚超出限值的读数可能只是噪声
+    EARLY_ABORT_MARGIN = 0.5
+    
     def __init__(self, config_manager: ConfigManager, 
                  instrument_manager: InstrumentManager):
         """
@@ -72,11 +184,21 @@ class TestEngine:
         self.instrument_manager = instrument_manager
         self.logger = logging.getLogger(self.__class__.__name__)
         
+        # 限值引擎（产品限值与流程通过标准）
+        self.limit_engine = LimitEngine(config_manager)
+        
         # 当前测试状态
         self.current_result: Optional[TestResult] = None
         self._abort_requested = False
         self._pause_requested = False
         
+        # 当前流程开始时的配置快照（限值判定固定使用该快照）
+        self._snapshot = None
+        
+        # 提前中止策略（当前流程启用时）及已检查的超限记录数
+        self._early_abort_policy: Optional[Dict] = None
+        self._limit_failure_cursor = 0
+        
         # 回调函数
         self._callbacks: Dict[str, List[Callable]] = {
             'on_flow_start': [],
@@ -84,6 +206,7 @@ class TestEngine:
             'on_step_start': [],
             'on_step_end': [],
             'on_measurement': [],
+            'on_dut_result': [],
             'on_error': []
         }
     
@@ -100,11 +223,55 @@ class TestEngine:
     
     def _trigger_callback(self, event: str, *args, **kwargs):
         """触发回调函数"""
-        for callback in self._callbacks.get(event, []):
-            try:
-                callback(*args, **kwargs)
-            except Exception as e:
-                self.logger.error(f"回调函数执行错误: {e}")
+        callbacks = self._callbacks.get(event)
+        if not callbacks:
+            return
+        with span(event, CATEGORY_CALLBACK):
+            for callback in callbacks:
+                try:
+                    callback(*args, **kwargs)
+                except Exception as e:
+                    self.logger.error(f"回调函数执行错误: {e}")
+    
+    def _create_trace(self, flow_id: str, snapshot) -> Optional[Trace]:
+        """
+        按 scheduler.tracing 配置创建流程追踪（默认启用）
+        
+        Args:
+            flow_id: 测试流程ID
+            snapshot: 配置快照
+            
+        Returns:
+            Optional[Trace]: 追踪记录，未启用时为None
+        """
+        tracing = snapshot.scheduler_config.get('tracing') or {}
+        if not tracing.get('enabled', True):
+            return None
+        clock = get_clock()
+        return Trace(flow_id, time_source=clock.monotonic, epoch=clock.time(),
+                     max_spans=tracing.get('max_spans', 100000))
+    
+    @contextmanager
+    def _traced_flow(self, trace: Optional[Trace], flow_name: str):
+        """在追踪激活状态下执行流程，并记录流程跨度"""
+        if trace is None:
+            yield
+            return
+        with trace.activate(), trace.span(flow_name, CATEGORY_FLOW):
+            yield
+    
+    def _apply_step_timing(self):
+        """汇总追踪记录的耗时分解，写入结果和各步骤结果"""
+        trace = self.current_result.trace
+        if trace is None:
+            return
+        self.current_result.timing = trace.summary()
+        steps = {timing['step_id']: timing for timing in self.current_result.timing['steps']}
+        for step_result in self.current_result.step_results:
+            timing = steps.get(step_result.step_id)
+            if timing is not None:
+                step_result.timing = {key: timing[key]
+                                      for key in ('scpi', 'sleep', 'callback', 'compute', 'commands')}
     
     def run_test_flow(self, flow_id: str, product_info: Dict = None) -> TestResult:
         """
@@ -119,85 +286,121 @@ class TestEngine:
         """
         self._abort_requested = False
         
-        # 获取流程配置
-        flow_config = self.config_manager.get_test_flow(flow_id)
+        # 获取流程配置（整个流程使用同一个配置快照，热加载不影响进行中的测试）
+        snapshot = self.config_manager.snapshot
+        flow_config = snapshot.test_flows.get(flow_id)
         if flow_config is None:
             self.logger.error(f"测试流程不存在: {flow_id}")
             return self._create_error_result(flow_id, "测试流程不存在")
+        # 测试用例拿到的是副本，修改参数不会污染已发布的快照
+        flow_config = copy.deepcopy(flow_config)
         
         # 初始化测试结果
         self.current_result = TestResult(
             flow_id=flow_id,
             flow_name=flow_config.get('name', flow_id),
             status=TestStatus.RUNNING,
-            start_time=datetime.now(),
+            start_ns=datetime_to_ns(get_clock().now()),
             pass_criteria=flow_config.get('pass_criteria', {}),
-            product_info=product_info or {}
+            product_info=product_info or {},
+            config_version=snapshot.version
         )
+        self.current_result.dut_results = self._create_dut_results(self.current_result)
+        self._snapshot = snapshot
         
-        self._trigger_callback('on_flow_start', self.current_result)
-        self.logger.info(f"开始执行测试流程: {flow_config.get('name')}")
+        self._early_abort_policy = self._get_early_abort_policy(flow_config, snapshot)
+        self._limit_failure_cursor = 0
         
-        try:
-            # 连接所需仪器
-            if not self.instrument_manager.connect_instruments_for_flow(flow_id):
-                raise RuntimeError("无法连接所需仪器")
+        self.current_result.trace = self._create_trace(flow_id, snapshot)
+        with self._traced_flow(self.current_result.trace, self.current_result.flow_name):
+            self._trigger_callback('on_flow_start', self.current_result)
+            self.logger.info(f"开始执行测试流程: {flow_config.get('name')}")
             
-            # 加载测试类
-            test_class = self._load_test_class(flow_config.get('test_class'))
-            if test_class is None:
-                raise RuntimeError(f"无法加载测试类: {flow_config.get('test_class')}")
+            try:
+                # 连接所需仪器
+                if not self.instrument_manager.connect_instruments_for_flow(flow_id):
+                    raise RuntimeError("无法连接所需仪器")
+                # 连接可选仪器（如专用回损仪），不可用时测试用例使用替代方案
+                self.instrument_manager.connect_optional_instruments_for_flow(flow_id)
             
-            # 创建测试实例
-            test_instance = test_class(
-                config=flow_config,
-                instruments=self._get_required_instruments(flow_config),
-                result=self.current_result
-            )
+                # 加载测试类
+                test_class = self._load_test_class(flow_config.get('test_class'))
+                if test_class is None:
+                    raise RuntimeError(f"无法加载测试类: {flow_config.get('test_class')}")
             
-            # 执行测试步骤
-            steps = flow_config.get('steps', [])
-            for step in steps:
-                if self._abort_requested:
-                    self.logger.warning("测试已中止")
-                    self.current_result.status = TestStatus.ABORTED
-                    break
+                # 创建测试实例（测试用例的限值与最终判定使用同一快照编译的规则）
+                test_instance = test_class(
+                    config=flow_config,
+                    instruments=self._get_required_instruments(flow_config),
+                    result=self.current_result,
+                    limits=self.limit_engine.compile(flow_id, self.current_result.product_info, snapshot),
+                    dut_limits=[self.limit_engine.compile(flow_id, r.product_info, snapshot)
+                                for r in self.current_result.dut_results]
+                )
+            
+                # 执行测试步骤
+                steps = flow_config.get('steps', [])
+                for step in steps:
+                    if self._abort_requested:
+                        self.logger.warning("测试已中止")
+                        self.current_result.status = TestStatus.ABORTED
+                        break
+                
+                    # 暂停等待人工恢复，使用真实时间
+                    while self._pause_requested:
+                        time.sleep(0.1)
                 
-                while self._pause_requested:
-                    time.sleep(0.1)
+                    # 已提前中止：跳过其余步骤（生成报告等 always_run 步骤照常执行）
+                    if (self.current_result.early_abort and step.get('action') not in
+                            self._early_abort_policy.get('always_run', ['generate_report'])):
+                        self.current_result.step_results.append(self._create_skipped_step(step))
+                        self.current_result.early_abort['skipped_steps'].append(step.get('step_id'))
+                        continue
                 
-                step_result = self._execute_step(test_instance, step, flow_config)
-                self.current_result.step_results.append(step_result)
+                    step_result = self._execute_step(test_instance, step, flow_config)
+                    self.current_result.step_results.append(step_result)
                 
-                if step_result.status == TestStatus.FAILED:
-                    self.current_result.status = TestStatus.FAILED
-                    self.current_result.error_message = step_result.error_message
-                    break
+                    if step_result.status == TestStatus.FAILED:
+                        self.current_result.status = TestStatus.FAILED
+                        self.current_result.error_message = step_result.error_message
+                        break
             
-            # 评估测试结果
-            if self.current_result.status == TestStatus.RUNNING:
-                self._evaluate_pass_criteria()
+                # 评估测试结果
+                if self.current_result.status == TestStatus.RUNNING:
+                    if self.current_result.dut_results:
+                        self._evaluate_dut_results()
+                    else:
+                        self._evaluate_pass_criteria()
+                
+                # 提前中止的测量项已确定不合格
+                if self.current_result.early_abort:
+                    if self.current_result.status == TestStatus.PASSED:
+                        self.current_result.status = TestStatus.FAILED
+                    if not self.current_result.error_message:
+                        self.current_result.error_message = self.current_result.early_abort['reason']
+            
+            except Exception as e:
+                self.logger.error(f"测试执行错误: {e}")
+                self.logger.debug(traceback.format_exc())
+                self.current_result.status = TestStatus.ERROR
+                self.current_result.error_message = str(e)
+                self._trigger_callback('on_error', e)
+            
+            # 完成测试
+            self.current_result.end_ns = datetime_to_ns(get_clock().now())
+            self.current_result.duration = (
+                self.current_result.end_ns - self.current_result.start_ns
+            ) / 1e9
+            
+            self._apply_step_timing()
+            self._finish_dut_results()
+            self._trigger_callback('on_flow_end', self.current_result)
+            self.logger.info(
+                f"测试流程完成: {self.current_result.flow_name}, "
+                f"状态: {self.current_result.status.value}, "
+                f"耗时: {self.current_result.duration:.2f}s"
+            )
             
-        except Exception as e:
-            self.logger.error(f"测试执行错误: {e}")
-            self.logger.debug(traceback.format_exc())
-            self.current_result.status = TestStatus.ERROR
-            self.current_result.error_message = str(e)
-            self._trigger_callback('on_error', e)
-        
-        # 完成测试
-        self.current_result.end_time = datetime.now()
-        self.current_result.duration = (
-            self.current_result.end_time - self.current_result.start_time
-        ).total_seconds()
-        
-        self._trigger_callback('on_flow_end', self.current_result)
-        self.logger.info(
-            f"测试流程完成: {self.current_result.flow_name}, "
-            f"状态: {self.current_result.status.value}, "
-            f"耗时: {self.current_result.duration:.2f}s"
-        )
-        
         return self.current_result
     
     def _execute_step(self, test_instance, step: Dict, 
@@ -220,13 +423,13 @@ class TestEngine:
         self.logger.info(f"执行步骤 {step_id}: {step_name}")
         self._trigger_callback('on_step_start', step_id, step_name)
         
-        start_time = datetime.now()
+        start_ns = datetime_to_ns(get_clock().now())
         step_result = StepResult(
             step_id=step_id,
             name=step_name,
             status=TestStatus.RUNNING,
-            start_time=start_time,
-            end_time=start_time,
+            start_ns=start_ns,
+            end_ns=start_ns,
             duration=0
         )
         
@@ -237,20 +440,29 @@ class TestEngine:
             
             method = getattr(test_instance, action)
             
-            # 处理循环执行
-            loop_over = step.get('loop_over')
-            if loop_over and loop_over in flow_config.get('parameters', {}):
-                loop_values = flow_config['parameters'][loop_over]
-                results = []
-                for value in loop_values:
-                    result = method(value, **step.get('parameters', {}))
-                    results.append(result)
-                    self._trigger_callback('on_measurement', action, value, result)
-                step_result.data = {loop_over: results}
-            else:
-                result = method(**step.get('parameters', {}))
-                step_result.data = {'result': result}
-                self._trigger_callback('on_measurement', action, None, result)
+            with span(step_name, CATEGORY_STEP, step_id=step_id, action=action):
+                # 处理循环执行
+                loop_over = step.get('loop_over')
+                if loop_over and loop_over in flow_config.get('parameters', {}):
+                    loop_values = flow_config['parameters'][loop_over]
+                    results = []
+                    for index, value in enumerate(loop_values):
+                        result = method(value, **step.get('parameters', {}))
+                        results.append(result)
+                        self._trigger_callback('on_measurement', action, value, result)
+                        if self._check_early_abort(test_instance, step_id):
+                            skipped = list(loop_values[index + 1:])
+                            self.current_result.early_abort['skipped_values'] = {loop_over: skipped}
+                            break
+                    # 逐波长结果压缩为结构化数组，无法无损压缩时保留原列表
+                    step_result.data = {loop_over: CompactRecords.from_records(results)}
+                    if self.current_result.early_abort.get('skipped_values'):
+                        step_result.data['skipped'] = self.current_result.early_abort['skipped_values']
+                else:
+                    result = method(**step.get('parameters', {}))
+                    step_result.data = {'result': result}
+                    self._trigger_callback('on_measurement', action, None, result)
+                    self._check_early_abort(test_instance, step_id)
             
             step_result.status = TestStatus.PASSED
             
@@ -260,43 +472,149 @@ class TestEngine:
             step_result.status = TestStatus.FAILED
             step_result.error_message = str(e)
         
-        step_result.end_time = datetime.now()
-        step_result.duration = (step_result.end_time - step_result.start_time).total_seconds()
+        step_result.end_ns = datetime_to_ns(get_clock().now())
+        step_result.duration = (step_result.end_ns - step_result.start_ns) / 1e9
         
         self._trigger_callback('on_step_end', step_result)
         return step_result
     
-    def _evaluate_pass_criteria(self):
-        """评估测试通过标准"""
-        if not self.current_result.pass_criteria:
-            self.current_result.status = TestStatus.PASSED
-            return
-        
-        all_passed = True
-        measurements = self.current_result.measurements
+    def _get_early_abort_policy(self, flow_config: Dict, snapshot) -> Optional[Dict]:
+        """
+        获取提前中止策略：流程的 early_abort 配置优先，其次为 scheduler.early_abort
         
-        for criterion, limit in self.current_result.pass_criteria.items():
-            if criterion not in measurements:
-                continue
-            
-            value = measurements[criterion]
-            passed = True
+        Args:
+            flow_config: 流程配置
+            snapshot: 配置快照
             
-            if isinstance(limit, dict):
-                if 'max' in limit and value > limit['max']:
-                    passed = False
-                if 'min' in limit and value < limit['min']:
-                    passed = False
-            else:
-                if value > limit:
-                    passed = False
+        Returns:
+            Optional[Dict]: 启用时的策略，未启用时为None
+        """
+        policy = flow_config.get('early_abort')
+        if policy is None:
+            policy = snapshot.scheduler_config.get('early_abort')
+        if isinstance(policy, bool):
+            policy = {'enabled': policy}
+        if not policy or not policy.get('enabled', False):
+            return None
+        return dict(policy)
+    
+    def _check_early_abort(self, test_instance, step_id: int) -> bool:
+        """
+        检查新出现的超限测量项，确定不合格时记录提前中止：
+        自适应平均以置信区间整体超出限值（'fail'）停止，或超限量达到 margin
+        
+        Args:
+            test_instance: 测试实例
+            step_id: 当前步骤ID
             
-            self.current_result.passed_criteria[criterion] = passed
-            if not passed:
-                all_passed = False
+        Returns:
+            bool: 是否已提前中止
+        """
+        result = self.current_result
+        # 夹具模式下单个被测件不合格不影响其他被测件，不提前中止
+        if self._early_abort_policy is None or result.early_abort or result.dut_results:
+            return bool(result.early_abort)
+        
+        failures = getattr(test_instance, 'limit_failures', [])
+        new_failures = failures[self._limit_failure_cursor:]
+        self._limit_failure_cursor = len(failures)
+        margin = self._early_abort_policy.get('margin', self.EARLY_ABORT_MARGIN)
+        for failure in new_failures:
+            if failure.get('stop_reason') != 'fail' and failure['violation'] < margin:
+                continue
+            above = failure['max'] is not None and failure['value'] > failure['max']
+            limit = failure['max'] if above else failure['min']
+            reason = (f"{failure['name']} = {failure['value']:.4g} 超出限值 {limit}，"
+                      f"确定不合格，提前中止")
+            result.early_abort = {
+                'reason': reason,
+                'measurement': failure['name'],
+                'value': float(failure['value']),
+                'min': failure['min'],
+                'max': failure['max'],
+                'step_id': step_id,
+                'skipped_steps': [],
+                'skipped_values': {},
+                'cancel_siblings': self._early_abort_policy.get('cancel_siblings', True)
+            }
+            result.passed_criteria[failure['name']] = False
+            self.logger.warning(reason)
+            return True
+        return False
+    
+    def _create_skipped_step(self, step: Dict) -> StepResult:
+        """提前中止后跳过的步骤"""
+        now_ns = datetime_to_ns(get_clock().now())
+        step_id = step.get('step_id', 0)
+        return StepResult(
+            step_id=step_id,
+            name=step.get('name', f'Step {step_id}'),
+            status=TestStatus.SKIPPED,
+            start_ns=now_ns,
+            end_ns=now_ns,
+            duration=0,
+            error_message=self.current_result.early_abort['reason']
+        )
+    
+    def _create_dut_results(self, result: TestResult) -> List[TestResult]:
+        """
+        夹具模式下为每个被测件创建独立的测试结果
         
+        Args:
+            result: 夹具流程的测试结果
+            
+        Returns:
+            List[TestResult]: 被测件结果列表，非夹具模式时为空
+        """
+        duts = result.product_info.get('duts') or []
+        shared_info = {k: v for k, v in result.product_info.items() if k != 'duts'}
+        return [
+            TestResult(
+                flow_id=result.flow_id,
+                flow_name=result.flow_name,
+                status=TestStatus.RUNNING,
+                start_ns=result.start_ns,
+                pass_criteria=result.pass_criteria,
+                product_info={**shared_info, **dut, 'fixture_position': index},
+                config_version=result.config_version
+            )
+            for index, dut in enumerate(duts)
+        ]
+    
+    def _evaluate_dut_results(self):
+        """评估每个被测件，全部通过时夹具流程才算通过"""
+        for dut_result in self.current_result.dut_results:
+            self._evaluate_pass_criteria(dut_result)
+        all_passed = all(r.status == TestStatus.PASSED for r in self.current_result.dut_results)
         self.current_result.status = TestStatus.PASSED if all_passed else TestStatus.FAILED
     
+    def _finish_dut_results(self):
+        """补全被测件结果的结束状态和时间，并逐个触发 on_dut_result"""
+        fixture = self.current_result
+        for dut_result in fixture.dut_results:
+            if dut_result.status == TestStatus.RUNNING:
+                # 流程未正常完成时，被测件沿用夹具流程的状态
+                dut_result.status = fixture.status
+                dut_result.error_message = fixture.error_message
+            dut_result.end_ns = fixture.end_ns
+            dut_result.duration = fixture.duration
+            dut_result.step_results = fixture.step_results
+            self._trigger_callback('on_dut_result', dut_result)
+    
+    def _evaluate_pass_criteria(self, result: Optional[TestResult] = None):
+        """
+        评估测试通过标准
+        
+        Args:
+            result: 被评估的结果，默认为当前测试结果
+        """
+        result = result or self.current_result
+        # 产品限值和流程通过标准由限值引擎整体判定，覆盖同名测量项上测试用例的判定，
+        # 其余测试用例已判定的限值（如夹具模式下逐个被测件的判定）保留
+        result.passed_criteria.update(self.limit_engine.evaluate(result, self._snapshot))
+        all_passed = all(result.passed_criteria.values())
+        result.status = TestStatus.PASSED if all_passed else TestStatus.FAILED
+    
     def _load_test_class(self, class_name: str):
         """
         动态加载测试类
@@ -315,10 +633,13 @@ class TestEngine:
             return None
     
     def _get_required_instruments(self, flow_config: Dict) -> Dict:
-        """获取流程所需的仪器实例"""
+        """获取流程所需的仪器实例（含已连接的可选仪器）"""
         instruments = {}
         for instr_id in flow_config.get('instruments_required', []):
             instruments[instr_id] = self.instrument_manager.get_instrument(instr_id)
+        for instr_id in flow_config.get('instruments_optional', []):
+            if self.instrument_manager.is_instrument_connected(instr_id):
+                instruments[instr_id] = self.instrument_manager.get_instrument(instr_id)
         return instruments
     
     def _create_error_result(self, flow_id: str, error_message: str) -> TestResult:
@@ -327,8 +648,8 @@ class TestEngine:
             flow_id=flow_id,
             flow_name=flow_id,
             status=TestStatus.ERROR,
-            start_time=datetime.now(),
-            end_time=datetime.now(),
+            start_ns=datetime_to_ns(get_clock().now()),
+            end_ns=datetime_to_ns(get_clock().now()),
             error_message=error_message
         )
     
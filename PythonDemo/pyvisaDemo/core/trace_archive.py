@@ -0,0 +1,423 @@
+"""
+光谱轨迹归档
+把每次扫描的光谱追加保存到分块的二进制文件中，用于长期保存所有被测件的全部扫描：
+- 波长网格相同、编码相同的轨迹写入同一个数据块，每行一条轨迹，波长网格只保存一次
+- 编码 'float32' 直接保存单精度功率；'delta' 按量化步长(默认0.001 dB)量化后保存相邻点的差值，
+  差值能用 int16 表示时每点2字节，否则用 int32；含 NaN/Inf 的轨迹自动改用 float32
+- 索引按序列号和时间戳查询，每条轨迹一行追加写入 index.jsonl
+- 读取时数据块以 np.memmap 映射，叠加上万条轨迹时按块流式计算，不会整体读入内存
+
+目录结构:
+    <archive>/
+        manifest.json         归档参数、波长网格和数据块列表
+        grids/grid_000000.npy 波长网格(nm, float64)
+        chunks/chunk_000000.bin
+        index.jsonl
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from drivers.clock import get_clock
+
+from .result_model import datetime_to_ns, ns_property
+
+FORMAT_VERSION = 1
+
+# 编码对应的存储类型
+_CODEC_DTYPES = {
+    'float32': np.dtype('<f4'),
+    'delta16': np.dtype('<i2'),
+    'delta32': np.dtype('<i4'),
+}
+
+
+@dataclass(slots=True)
+class TraceEntry:
+    """归档中一条轨迹的索引"""
+    trace_id: int
+    serial_number: str
+    timestamp_ns: int
+    chunk: int
+    row: int
+    # delta 编码时第一个点的量化值
+    base: int = 0
+    meta: Dict = field(default_factory=dict)
+
+    timestamp = ns_property('timestamp_ns', '扫描时间')
+
+    def to_json(self) -> Dict:
+        """索引行"""
+        return {'id': self.trace_id, 'sn': self.serial_number, 'ts': self.timestamp_ns,
+                'chunk': self.chunk, 'row': self.row, 'base': self.base, 'meta': self.meta}
+
+    @classmethod
+    def from_json(cls, data: Dict) -> 'TraceEntry':
+        return cls(data['id'], data['sn'], data['ts'], data['chunk'], data['row'],
+                   data.get('base', 0), data.get('meta') or {})
+
+
+class TraceArchive:
+    """光谱轨迹归档"""
+
+    _shared: Dict[str, 'TraceArchive'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Union[str, Path], codec: str = 'delta', quantum: float = 0.001,
+                 chunk_rows: int = 1024):
+        """
+        打开或创建归档（已有归档沿用创建时的量化步长）
+
+        Args:
+            path: 归档目录
+            codec: 新轨迹的编码，'delta' 或 'float32'
+            quantum: delta 编码的量化步长(dB)
+            chunk_rows: 每个数据块最多保存的轨迹数
+        """
+        if codec not in ('delta', 'float32'):
+            raise ValueError(f"不支持的编码: {codec}")
+        self.path = Path(path)
+        self.codec = codec
+        self.chunk_rows = chunk_rows
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.RLock()
+
+        self._grids: List[Dict] = []
+        self._grid_arrays: Dict[int, np.ndarray] = {}
+        self._chunks: List[Dict] = []
+        self._chunk_rows: List[int] = []
+        self._maps: Dict[int, np.memmap] = {}
+        self._entries: List[TraceEntry] = []
+        self._by_serial: Dict[str, List[TraceEntry]] = {}
+
+        manifest = self.path / 'manifest.json'
+        if manifest.exists():
+            with open(manifest, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.quantum = data['quantum']
+            self._grids = data['grids']
+            self._chunks = data['chunks']
+            self._load_index()
+        else:
+            self.quantum = quantum
+            (self.path / 'grids').mkdir(parents=True, exist_ok=True)
+            (self.path / 'chunks').mkdir(exist_ok=True)
+            self._write_manifest()
+
+    @classmethod
+    def shared(cls, path: Union[str, Path], **kwargs) -> 'TraceArchive':
+        """
+        获取进程内共享的归档实例（同一目录只打开一次）
+
+        Args:
+            path: 归档目录
+            **kwargs: 首次打开时传给构造函数的参数
+
+        Returns:
+            TraceArchive: 归档
+        """
+        key = str(Path(path).resolve())
+        with cls._shared_lock:
+            archive = cls._shared.get(key)
+            if archive is None:
+                archive = cls._shared[key] = cls(path, **kwargs)
+            return archive
+
+    # ------------------------------------------------------------------ 持久化
+
+    def _write_manifest(self):
+        """原子地重写清单"""
+        data = {'version': FORMAT_VERSION, 'quantum': self.quantum,
+                'grids': self._grids, 'chunks': self._chunks}
+        tmp = self.path / 'manifest.json.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path / 'manifest.json')
+
+    def _load_index(self):
+        """读取索引，并截掉中断写入留下的不完整记录"""
+        self._chunk_rows = [0] * len(self._chunks)
+        index_path = self.path / 'index.jsonl'
+        if index_path.exists():
+            with open(index_path, 'rb') as f:
+                content = f.read()
+            complete = content.rfind(b'\n') + 1
+            if complete < len(content):
+                self.logger.warning(f"索引末尾有不完整的记录，已丢弃: {index_path}")
+                os.truncate(index_path, complete)
+            for line in content[:complete].splitlines():
+                if line.strip():
+                    self._add_entry(TraceEntry.from_json(json.loads(line)))
+
+        # 数据已写入但索引未写入的行不可见，截掉以免错位
+        for chunk in self._chunks:
+            file = self.path / chunk['file']
+            expected = (self._chunk_rows[chunk['id']] * chunk['points'] *
+                        _CODEC_DTYPES[chunk['codec']].itemsize)
+            if file.exists() and file.stat().st_size > expected:
+                os.truncate(file, expected)
+
+    def _add_entry(self, entry: TraceEntry):
+        self._entries.append(entry)
+        self._by_serial.setdefault(entry.serial_number, []).append(entry)
+        self._chunk_rows[entry.chunk] = max(self._chunk_rows[entry.chunk], entry.row + 1)
+
+    # ------------------------------------------------------------------ 写入
+
+    def _grid_id(self, wavelengths: np.ndarray) -> int:
+        """查找或登记波长网格"""
+        points = len(wavelengths)
+        for grid in self._grids:
+            if grid['points'] != points:
+                continue
+            if np.array_equal(self.grid(grid['id']), wavelengths):
+                return grid['id']
+        grid_id = len(self._grids)
+        file = f"grids/grid_{grid_id:06d}.npy"
+        np.save(self.path / file, np.asarray(wavelengths, dtype=np.float64))
+        self._grids.append({'id': grid_id, 'file': file, 'points': points,
+                            'start': float(wavelengths[0]), 'stop': float(wavelengths[-1])})
+        return grid_id
+
+    def _chunk_id(self, grid_id: int, codec: str, points: int) -> int:
+        """找到可写入的数据块，已满时新建"""
+        for chunk in reversed(self._chunks):
+            if chunk['grid'] == grid_id and chunk['codec'] == codec:
+                if self._chunk_rows[chunk['id']] < self.chunk_rows:
+                    return chunk['id']
+                break
+        chunk_id = len(self._chunks)
+        self._chunks.append({'id': chunk_id, 'file': f"chunks/chunk_{chunk_id:06d}.bin",
+                             'grid': grid_id, 'codec': codec, 'points': points})
+        self._chunk_rows.append(0)
+        self._write_manifest()
+        return chunk_id
+
+    def _encode(self, powers: np.ndarray) -> Tuple[str, int, np.ndarray]:
+        """编码一条轨迹，返回 (编码, 基值, 行数据)"""
+        if self.codec == 'delta' and np.all(np.isfinite(powers)):
+            quantized = np.rint(powers / self.quantum)
+            if np.abs(quantized).max() < 2 ** 62:
+                quantized = quantized.astype(np.int64)
+                deltas = np.diff(quantized, prepend=quantized[0])
+                for codec in ('delta16', 'delta32'):
+                    info = np.iinfo(_CODEC_DTYPES[codec])
+                    if deltas.min() >= info.min and deltas.max() <= info.max:
+                        return codec, int(quantized[0]), deltas.astype(_CODEC_DTYPES[codec])
+        return 'float32', 0, powers.astype(_CODEC_DTYPES['float32'])
+
+    def append(self, wavelengths: np.ndarray, powers: np.ndarray, serial_number: str,
+               timestamp: Optional[datetime] = None, **meta) -> TraceEntry:
+        """
+        追加一条轨迹
+
+        Args:
+            wavelengths: 波长数组(nm)
+            powers: 功率数组(dBm)
+            serial_number: 被测件序列号
+            timestamp: 扫描时间，默认为当前时间
+            **meta: 附加信息（可JSON序列化），可用于 find 过滤
+
+        Returns:
+            TraceEntry: 新轨迹的索引
+        """
+        wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        powers = np.asarray(powers, dtype=np.float64)
+        if wavelengths.ndim != 1 or wavelengths.shape != powers.shape or not len(powers):
+            raise ValueError("波长和功率必须是等长的一维数组")
+        timestamp_ns = datetime_to_ns(timestamp or get_clock().now())
+        codec, base, row = self._encode(powers)
+
+        with self._lock:
+            grid_id = self._grid_id(wavelengths)
+            chunk_id = self._chunk_id(grid_id, codec, len(powers))
+            entry = TraceEntry(len(self._entries), str(serial_number), timestamp_ns,
+                               chunk_id, self._chunk_rows[chunk_id], base, meta)
+            # 先写数据再写索引，索引行写完整才算追加成功
+            with open(self.path / self._chunks[chunk_id]['file'], 'ab') as f:
+                f.write(row.tobytes())
+            with open(self.path / 'index.jsonl', 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry.to_json(), ensure_ascii=False) + '\n')
+            self._add_entry(entry)
+        return entry
+
+    # ------------------------------------------------------------------ 查询
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def entries(self) -> List[TraceEntry]:
+        """全部轨迹索引（按追加顺序）"""
+        return list(self._entries)
+
+    def find(self, serial_number: Optional[str] = None, start: Optional[datetime] = None,
+             end: Optional[datetime] = None, **meta) -> List[TraceEntry]:
+        """
+        按序列号、时间范围和附加信息查询轨迹
+
+        Args:
+            serial_number: 序列号
+            start: 起始时间（含）
+            end: 结束时间（不含）
+            **meta: 附加信息须相等的字段
+
+        Returns:
+            List[TraceEntry]: 匹配的轨迹，按追加顺序
+        """
+        entries = (self._by_serial.get(str(serial_number), []) if serial_number is not None
+                   else self._entries)
+        start_ns = datetime_to_ns(start) if start is not None else None
+        end_ns = datetime_to_ns(end) if end is not None else None
+        return [
+            e for e in entries
+            if (start_ns is None or e.timestamp_ns >= start_ns)
+            and (end_ns is None or e.timestamp_ns < end_ns)
+            and all(e.meta.get(k) == v for k, v in meta.items())
+        ]
+
+    def get(self, trace_id: int) -> TraceEntry:
+        """按ID获取轨迹索引"""
+        return self._entries[trace_id]
+
+    def grid(self, grid_id: int) -> np.ndarray:
+        """波长网格（只读内存映射）"""
+        array = self._grid_arrays.get(grid_id)
+        if array is None:
+            array = np.load(self.path / self._grids[grid_id]['file'], mmap_mode='r')
+            self._grid_arrays[grid_id] = array
+        return array
+
+    def wavelengths(self, entry: TraceEntry) -> np.ndarray:
+        """轨迹的波长网格"""
+        return self.grid(self._chunks[entry.chunk]['grid'])
+
+    # ------------------------------------------------------------------ 读取
+
+    def _map(self, chunk_id: int) -> np.memmap:
+        """数据块的内存映射，追加了新行时重新映射"""
+        chunk = self._chunks[chunk_id]
+        rows = self._chunk_rows[chunk_id]
+        mapped = self._maps.get(chunk_id)
+        if mapped is None or mapped.shape[0] < rows:
+            mapped = np.memmap(self.path / chunk['file'], dtype=_CODEC_DTYPES[chunk['codec']],
+                               mode='r', shape=(rows, chunk['points']))
+            self._maps[chunk_id] = mapped
+        return mapped
+
+    def _decode(self, chunk_id: int, rows: np.ndarray, bases: np.ndarray) -> np.ndarray:
+        """解码一个数据块中的若干行为 float64 功率"""
+        data = self._map(chunk_id)[rows]
+        if self._chunks[chunk_id]['codec'] == 'float32':
+            return data.astype(np.float64)
+        quantized = np.cumsum(data, axis=1, dtype=np.int64) + bases[:, None]
+        return quantized * self.quantum
+
+    def read(self, entry: Union[TraceEntry, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        读取一条轨迹
+
+        Args:
+            entry: 轨迹索引或ID
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (波长数组nm, 功率数组dBm)
+        """
+        if not isinstance(entry, TraceEntry):
+            entry = self._entries[entry]
+        powers = self._decode(entry.chunk, np.array([entry.row]), np.array([entry.base]))[0]
+        return self.wavelengths(entry), powers
+
+    def iter_blocks(self, entries: List[TraceEntry],
+                    block_size: int = 256) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        按数据块分批读取轨迹，每批最多 block_size 条
+
+        Args:
+            entries: 轨迹索引
+            block_size: 每批的轨迹数
+
+        Yields:
+            (positions, powers): 本批轨迹在 entries 中的位置，及对应的功率矩阵
+        """
+        by_chunk: Dict[int, List[int]] = {}
+        for position, entry in enumerate(entries):
+            by_chunk.setdefault(entry.chunk, []).append(position)
+        for chunk_id, positions in by_chunk.items():
+            positions.sort(key=lambda p: entries[p].row)
+            for i in range(0, len(positions), block_size):
+                block = np.array(positions[i:i + block_size])
+                rows = np.array([entries[p].row for p in block])
+                bases = np.array([entries[p].base for p in block], dtype=np.int64)
+                yield block, self._decode(chunk_id, rows, bases)
+
+    def _check_same_grid(self, entries: List[TraceEntry]) -> np.ndarray:
+        grids = {self._chunks[e.chunk]['grid'] for e in entries}
+        if len(grids) != 1:
+            raise ValueError(f"轨迹必须使用相同的波长网格，实际有 {len(grids)} 种")
+        return self.grid(grids.pop())
+
+    def envelope(self, entries: List[TraceEntry], block_size: int = 256) -> Dict[str, np.ndarray]:
+        """
+        计算多条轨迹的逐点统计（用于叠加显示和金样比对），按块流式计算
+
+        Args:
+            entries: 轨迹索引（须使用相同的波长网格）
+            block_size: 每批读取的轨迹数
+
+        Returns:
+            Dict: {'wavelengths', 'min', 'max', 'mean', 'std', 'count'}
+        """
+        if not entries:
+            raise ValueError("没有轨迹")
+        wavelengths = self._check_same_grid(entries)
+        points = len(wavelengths)
+        lower = np.full(points, np.inf)
+        upper = np.full(points, -np.inf)
+        total = np.zeros(points)
+        total_sq = np.zeros(points)
+        for _, powers in self.iter_blocks(entries, block_size):
+            np.minimum(lower, powers.min(axis=0), out=lower)
+            np.maximum(upper, powers.max(axis=0), out=upper)
+            total += powers.sum(axis=0)
+            total_sq += np.square(powers).sum(axis=0)
+        count = len(entries)
+        mean = total / count
+        std = np.sqrt(np.maximum(total_sq / count - np.square(mean), 0.0))
+        return {'wavelengths': np.asarray(wavelengths), 'min': lower, 'max': upper,
+                'mean': mean, 'std': std, 'count': count}
+
+    def compare(self, entries: List[TraceEntry], reference: np.ndarray,
+                block_size: int = 256) -> np.ndarray:
+        """
+        计算各轨迹与参考（如金样）轨迹的最大偏差，按块流式计算
+
+        Args:
+            entries: 轨迹索引（须使用相同的波长网格）
+            reference: 参考功率数组(dBm)
+            block_size: 每批读取的轨迹数
+
+        Returns:
+            np.ndarray: 与 entries 对应的最大绝对偏差(dB)
+        """
+        wavelengths = self._check_same_grid(entries)
+        reference = np.asarray(reference, dtype=np.float64)
+        if reference.shape != wavelengths.shape:
+            raise ValueError("参考轨迹的点数与波长网格不一致")
+        deviations = np.empty(len(entries))
+        for positions, powers in self.iter_blocks(entries, block_size):
+            deviations[positions] = np.abs(powers - reference).max(axis=1)
+        return deviations
+
+    def close(self):
+        """释放内存映射"""
+        with self._lock:
+            self._maps.clear()
+            self._grid_arrays.clear()
@@ -3,14 +3,34 @@
 """
 from .base_driver import BaseDriver
 from .optical_power_meter import OpticalPowerMeter
+from .return_loss_meter import ReturnLossMeter
 from .optical_switch import OpticalSwitch
 from .osa import OpticalSpectrumAnalyzer
 from .laser_source import LaserSource
+from .traffic_recorder import TrafficRecorder, TrafficReader
+from .replay_driver import ReplayDriver
+from .bus_scheduler import BusScheduler
+from .scpi_sim import SimulatedResource, SimulatedBench
+from .clock import Clock, VirtualClock, get_clock, set_clock
+from .tracing import Trace, current_trace
 
 __all__ = [
     'BaseDriver',
     'OpticalPowerMeter',
+    'ReturnLossMeter',
     'OpticalSwitch',
     'OpticalSpectrumAnalyzer',
-    'LaserSource'
+    'LaserSource',
+    'TrafficRecorder',
+    'TrafficReader',
+    'ReplayDriver',
+    'BusScheduler',
+    'SimulatedResource',
+    'SimulatedBench',
+    'Clock',
+    'VirtualClock',
+    'get_clock',
+    'set_clock',
+    'Trace',
+    'current_trace'
 ]
@@ -4,14 +4,26 @@
 """
 import pyvisa
 from abc import ABC, abstractmethod
-from typing import Optional, Any, Dict
+from contextlib import contextmanager, nullcontext
+from typing import Optional, Any, Dict, Iterator
 import logging
+import threading
 import time
 
+from .traffic_recorder import (
+    TrafficRecorder, EVENT_WRITE, EVENT_READ, EVENT_QUERY, EVENT_BINARY, EVENT_ERROR
+)
+from .bus_scheduler import BusChannel
+from .clock import get_clock
+from .tracing import CATEGORY_SCPI, current_trace
+
 
 class BaseDriver(ABC):
     """仪器驱动基类"""
     
+    # 健康检查使用的轻量查询命令
+    PROBE_COMMAND = "*STB?"
+    
     def __init__(self, resource_string: str, timeout: int = 5000, **kwargs):
         """
         初始化驱动
@@ -19,9 +31,11 @@ class BaseDriver(ABC):
         Args:
             resource_string: VISA资源字符串
             timeout: 超时时间(毫秒)
-            **kwargs: 其他参数
+            **kwargs: 其他参数（instrument_id、parameters、backend、recorder、bus、io_metrics、resource_factory等）
         """
         self.resource_string = resource_string
+        # 仪器ID，用于追踪记录中的仪器标签
+        self.instrument_id = kwargs.get('instrument_id') or resource_string
         self.timeout = timeout
         self.instrument: Optional[pyvisa.Resource] = None
         self.rm: Optional[pyvisa.ResourceManager] = None
@@ -29,7 +43,94 @@ class BaseDriver(ABC):
         self.connected = False
         self.parameters = kwargs.get('parameters', {})
         self._backend = kwargs.get('backend', '')
+        # 资源工厂，用于以仿真资源等替身代替VISA资源
+        self._resource_factory = kwargs.get('resource_factory')
+        self.recorder: Optional[TrafficRecorder] = kwargs.get('recorder')
+        # 串行化对仪器的访问，保证多条命令组成的操作不被其他线程打断
+        self._io_lock = threading.RLock()
+        # 所在总线的通信通道，同一总线上的仪器轮流通信
+        self.bus: Optional[BusChannel] = kwargs.get('bus')
+        # 通信指标记录器（提供 observe(seconds, error)），为None时不统计
+        self.io_metrics = kwargs.get('io_metrics')
+        
+    def _open_resource(self):
+        """
+        打开VISA资源
+        
+        Returns:
+            pyvisa.Resource: 仪器资源
+        """
+        if self._resource_factory is not None:
+            return self._resource_factory(self.resource_string)
+        self.rm = pyvisa.ResourceManager(self._backend)
+        return self.rm.open_resource(self.resource_string)
+    
+    def _transact(self, kind: int, command: str, func, *args, datatype: str = 'f'):
+        """
+        执行一次仪器通信，并按启用情况记录录制数据、追踪跨度和通信指标
+        
+        Args:
+            kind: 事件类型
+            command: SCPI命令
+            func: 实际执行通信的函数
+            *args: 传递给func的参数
+            datatype: 二进制块数据类型
+            
+        Returns:
+            func的返回值
+        """
+        trace = current_trace()
+        metrics = self.io_metrics
+        if trace is None and metrics is None:
+            with self._io_lock, self.bus or nullcontext():
+                return self._do_io(kind, command, func, args, datatype)
+        # 跨度在取得仪器锁和总线之前打开，等待总线的时间计入通信而不是计算时间
+        scpi_span = (trace.span(command or 'READ', CATEGORY_SCPI, instrument=self.instrument_id)
+                     if trace is not None else nullcontext())
+        with scpi_span, self._io_lock, self.bus or nullcontext():
+            start = time.perf_counter()
+            failed = False
+            try:
+                return self._do_io(kind, command, func, args, datatype)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                if metrics is not None:
+                    metrics.observe(time.perf_counter() - start, failed)
+    
+    def _do_io(self, kind: int, command: str, func, args: tuple, datatype: str):
+        """执行通信函数，启用录制时记录结果"""
+        recorder = self.recorder
+        if recorder is None:
+            return func(*args)
+        start = time.perf_counter_ns()
+        try:
+            response = func(*args)
+        except Exception as e:
+            recorder.record(EVENT_ERROR, command, f"{type(e).__name__}: {e}",
+                            start, time.perf_counter_ns() - start)
+            raise
+        recorder.record(kind, command, None if kind == EVENT_WRITE else response,
+                        start, time.perf_counter_ns() - start, datatype)
+        return response
+    
+    @contextmanager
+    def transaction(self) -> Iterator['BaseDriver']:
+        """
+        独占仪器执行一组命令
+        
+        用法:
+            with driver.transaction():
+                driver.write(...)
+                value = driver.query(...)
         
+        Yields:
+            BaseDriver: 驱动自身
+        """
+        with self._io_lock, self.bus or nullcontext():
+            yield self
+    
     def connect(self) -> bool:
         """
         连接仪器
@@ -38,8 +139,10 @@ class BaseDriver(ABC):
             bool: 连接是否成功
         """
         try:
-            self.rm = pyvisa.ResourceManager(self._backend)
-            self.instrument = self.rm.open_resource(self.resource_string)
+            # 断开连接时录制器已关闭，重新连接时新建录制器续写同一录制文件
+            if self.recorder is not None and self.recorder.closed:
+                self.recorder = self.recorder.reopen()
+            self.instrument = self._open_resource()
             self.instrument.timeout = self.timeout
             self.connected = True
             self.logger.info(f"成功连接到仪器: {self.resource_string}")
@@ -53,6 +156,26 @@ class BaseDriver(ABC):
             self.connected = False
             return False
     
+    def reconnect(self) -> bool:
+        """
+        重新建立连接（保留录制器）
+        
+        Returns:
+            bool: 连接是否成功
+        """
+        with self._io_lock:
+            try:
+                if self.instrument:
+                    self.instrument.close()
+                if self.rm:
+                    self.rm.close()
+            except Exception as e:
+                self.logger.debug("关闭旧连接时出错: %s", e)
+            self.instrument = None
+            self.rm = None
+            self.connected = False
+            return self.connect()
+    
     def disconnect(self):
         """断开仪器连接"""
         try:
@@ -60,6 +183,8 @@ class BaseDriver(ABC):
                 self.instrument.close()
             if self.rm:
                 self.rm.close()
+            if self.recorder:
+                self.recorder.close()
             self.connected = False
             self.logger.info(f"已断开仪器连接: {self.resource_string}")
         except Exception as e:
@@ -74,8 +199,8 @@ class BaseDriver(ABC):
         """
         if not self.connected:
             raise RuntimeError("仪器未连接")
-        self.logger.debug(f"发送命令: {command}")
-        self.instrument.write(command)
+        self.logger.debug("发送命令: %s", command)
+        self._transact(EVENT_WRITE, command, self.instrument.write, command)
     
     def read(self) -> str:
         """
@@ -86,8 +211,8 @@ class BaseDriver(ABC):
         """
         if not self.connected:
             raise RuntimeError("仪器未连接")
-        response = self.instrument.read()
-        self.logger.debug(f"接收响应: {response}")
+        response = self._transact(EVENT_READ, "", self.instrument.read)
+        self.logger.debug("接收响应: %s", response)
         return response
     
     def query(self, command: str) -> str:
@@ -102,9 +227,9 @@ class BaseDriver(ABC):
         """
         if not self.connected:
             raise RuntimeError("仪器未连接")
-        self.logger.debug(f"查询命令: {command}")
-        response = self.instrument.query(command)
-        self.logger.debug(f"查询响应: {response}")
+        self.logger.debug("查询命令: %s", command)
+        response = self._transact(EVENT_QUERY, command, self.instrument.query, command)
+        self.logger.debug("查询响应: %s", response)
         return response.strip()
     
     def query_binary(self, command: str) -> bytes:
@@ -119,7 +244,11 @@ class BaseDriver(ABC):
         """
         if not self.connected:
             raise RuntimeError("仪器未连接")
-        return self.instrument.query_binary_values(command, datatype='f', container=list)
+        return self._transact(
+            EVENT_BINARY, command,
+            lambda cmd: self.instrument.query_binary_values(cmd, datatype='f', container=list),
+            command
+        )
     
     def get_idn(self) -> str:
         """
@@ -130,10 +259,29 @@ class BaseDriver(ABC):
         """
         return self.query("*IDN?")
     
+    def probe(self) -> Optional[float]:
+        """
+        健康检查：发送轻量查询并测量往返时间
+        
+        仪器正被其他线程使用（包括 transaction() 中的一组命令尚未完成）时不等待，直接返回None，
+        不会插在分开发送的查询和读取之间
+        
+        Returns:
+            Optional[float]: 往返时间(秒)，仪器忙时为None
+        """
+        if not self._io_lock.acquire(blocking=False):
+            return None
+        try:
+            start = time.perf_counter()
+            self.query(self.PROBE_COMMAND)
+            return time.perf_counter() - start
+        finally:
+            self._io_lock.release()
+    
     def reset(self):
         """重置仪器"""
         self.write("*RST")
-        time.sleep(1)
+        get_clock().sleep(1)
     
     def clear_status(self):
         """清除状态寄存器"""
@@ -146,16 +294,17 @@ class BaseDriver(ABC):
         Args:
             timeout: 超时时间(秒)
         """
+        clock = get_clock()
         self.write("*OPC")
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        start_time = clock.monotonic()
+        while clock.monotonic() - start_time < timeout:
             try:
                 result = self.query("*OPC?")
                 if result == "1":
                     return
             except:
                 pass
-            time.sleep(0.1)
+            clock.sleep(0.1)
         raise TimeoutError("操作超时")
     
     def check_error(self) -> tuple:
@@ -220,6 +369,10 @@ class SimulatedDriver(BaseDriver):
         self.connected = False
         self.logger.info(f"仿真模式: 已断开 {self.resource_string}")
     
+    def reconnect(self) -> bool:
+        self.connected = False
+        return self.connect()
+    
     def write(self, command: str):
         self.logger.debug(f"仿真写入: {command}")
     
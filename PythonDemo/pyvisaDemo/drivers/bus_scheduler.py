@@ -0,0 +1,222 @@
+"""
+总线调度器
+按物理接口（GPIB板卡、TCPIP主机、USB设备）对VISA资源分组，
+同一总线上的通信按仪器轮转公平排队串行执行，不同总线之间并行，
+并统计每台仪器的总线占用情况
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+def bus_key(resource_string: str) -> str:
+    """
+    根据VISA资源字符串推断所在总线
+
+    GPIB按板卡共享总线，TCPIP按主机划分，USB和其他接口按设备划分
+
+    Args:
+        resource_string: VISA资源字符串
+
+    Returns:
+        str: 总线标识，如 GPIB0、TCPIP::192.168.1.100
+    """
+    parts = (resource_string or '').split('::')
+    interface = parts[0].upper()
+    if interface.startswith('GPIB'):
+        return interface if interface != 'GPIB' else 'GPIB0'
+    if interface.startswith('TCPIP') and len(parts) > 1:
+        return f"TCPIP::{parts[1]}"
+    if interface.startswith('ASRL'):
+        return interface
+    return resource_string
+
+
+class _UsageStats:
+    """单台仪器的总线占用统计"""
+    __slots__ = ('transactions', 'busy_time', 'wait_time', 'max_wait', 'contended')
+
+    def __init__(self):
+        self.transactions = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.contended = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'transactions': self.transactions,
+            'busy_time_s': self.busy_time,
+            'wait_time_s': self.wait_time,
+            'max_wait_s': self.max_wait,
+            'contended': self.contended
+        }
+
+
+class BusArbiter:
+    """单条总线的仲裁器：同一时刻只允许一台仪器通信，等待者按仪器轮转获得总线"""
+
+    _PENDING = object()
+
+    def __init__(self, bus_id: str):
+        """
+        初始化仲裁器
+
+        Args:
+            bus_id: 总线标识
+        """
+        self.bus_id = bus_id
+        self._cond = threading.Condition(threading.Lock())
+        self._owner = None
+        self._owner_instrument: Optional[str] = None
+        self._depth = 0
+        self._acquired_at = 0.0
+        self._granted = None
+        # 每台仪器的等待队列，以及有等待者的仪器轮转顺序
+        self._queues: Dict[str, Deque[object]] = {}
+        self._ready: Deque[str] = deque()
+        self._stats: Dict[str, _UsageStats] = {}
+        self._created = time.perf_counter()
+
+    def acquire(self, instrument_id: str):
+        """
+        获取总线（同一线程可重入）
+
+        Args:
+            instrument_id: 发起通信的仪器ID
+        """
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return
+            stats = self._stats.get(instrument_id)
+            if stats is None:
+                stats = self._stats[instrument_id] = _UsageStats()
+
+            start = time.perf_counter()
+            if self._owner is None and not self._ready:
+                waited = 0.0
+            else:
+                token = object()
+                queue = self._queues.get(instrument_id)
+                if queue is None:
+                    queue = self._queues[instrument_id] = deque()
+                if not queue:
+                    self._ready.append(instrument_id)
+                queue.append(token)
+                while self._granted is not token:
+                    self._cond.wait()
+                self._granted = None
+                waited = time.perf_counter() - start
+                stats.contended += 1
+
+            self._owner = me
+            self._owner_instrument = instrument_id
+            self._depth = 1
+            self._acquired_at = time.perf_counter()
+            stats.transactions += 1
+            stats.wait_time += waited
+            if waited > stats.max_wait:
+                stats.max_wait = waited
+
+    def release(self):
+        """释放总线，并交给轮转顺序中的下一台仪器"""
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError(f"总线 {self.bus_id} 未被当前线程占用")
+            self._depth -= 1
+            if self._depth:
+                return
+            self._stats[self._owner_instrument].busy_time += time.perf_counter() - self._acquired_at
+            self._owner = None
+            self._owner_instrument = None
+
+            if self._ready:
+                instrument_id = self._ready.popleft()
+                queue = self._queues[instrument_id]
+                self._granted = queue.popleft()
+                if queue:
+                    self._ready.append(instrument_id)
+                # 总线直接移交给被选中的等待者，防止新来的请求插队
+                self._owner = self._PENDING
+                self._cond.notify_all()
+
+    def get_usage(self) -> Dict:
+        """
+        获取总线占用统计
+
+        Returns:
+            Dict: 总线利用率及各仪器的占用统计
+        """
+        with self._cond:
+            elapsed = time.perf_counter() - self._created
+            busy = sum(s.busy_time for s in self._stats.values())
+            return {
+                'bus': self.bus_id,
+                'utilization': busy / elapsed if elapsed > 0 else 0.0,
+                'busy_time_s': busy,
+                'waiting': sum(len(q) for q in self._queues.values()),
+                'instruments': {k: s.to_dict() for k, s in self._stats.items()}
+            }
+
+
+class BusChannel:
+    """仪器在总线上的通信通道，作为上下文管理器使用"""
+    __slots__ = ('instrument_id', 'arbiter')
+
+    def __init__(self, instrument_id: str, arbiter: BusArbiter):
+        self.instrument_id = instrument_id
+        self.arbiter = arbiter
+
+    @property
+    def bus_id(self) -> str:
+        return self.arbiter.bus_id
+
+    def __enter__(self):
+        self.arbiter.acquire(self.instrument_id)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.arbiter.release()
+        return False
+
+
+class BusScheduler:
+    """总线调度器：管理所有总线的仲裁器"""
+
+    def __init__(self):
+        self._arbiters: Dict[str, BusArbiter] = {}
+        self._lock = threading.Lock()
+
+    def channel(self, instrument_id: str, resource_string: str,
+                bus: Optional[str] = None) -> BusChannel:
+        """
+        获取仪器的总线通道
+
+        Args:
+            instrument_id: 仪器ID
+            resource_string: VISA资源字符串
+            bus: 显式指定的总线标识，为空时由资源字符串推断
+
+        Returns:
+            BusChannel: 总线通道
+        """
+        bus_id = bus or bus_key(resource_string)
+        with self._lock:
+            arbiter = self._arbiters.get(bus_id)
+            if arbiter is None:
+                arbiter = self._arbiters[bus_id] = BusArbiter(bus_id)
+        return BusChannel(instrument_id, arbiter)
+
+    def get_usage(self) -> Dict[str, Dict]:
+        """
+        获取所有总线的占用统计
+
+        Returns:
+            Dict[str, Dict]: {总线标识: 占用统计}
+        """
+        with self._lock:
+            arbiters = list(self._arbiters.values())
+        return {arbiter.bus_id: arbiter.get_usage() for arbiter in arbiters}
@@ -0,0 +1,162 @@
+"""
+时钟抽象
+驱动、测试用例和调度器统一通过时钟获取时间和等待，真实运行时使用系统时钟，
+仿真时可替换为虚拟时钟：等待不消耗真实时间，整条产线可以快于实时地运行，
+而测试时长等统计仍按仿真时间计算
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from .tracing import CATEGORY_SLEEP, current_trace
+
+
+class Clock:
+    """系统时钟"""
+
+    virtual = False
+
+    def time(self) -> float:
+        """当前时间戳(秒)"""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """单调时间(秒)，用于计算时间间隔"""
+        return time.monotonic()
+
+    def now(self) -> datetime:
+        """当前本地时间"""
+        return datetime.fromtimestamp(self.time())
+
+    def sleep(self, seconds: float):
+        """
+        等待指定时间，启用追踪时记录为等待跨度
+
+        Args:
+            seconds: 等待时间(秒)
+        """
+        if seconds <= 0:
+            return
+        trace = current_trace()
+        if trace is None:
+            self._sleep(seconds)
+        else:
+            with trace.span('sleep', CATEGORY_SLEEP, seconds=seconds):
+                self._sleep(seconds)
+
+    def _sleep(self, seconds: float):
+        """实际执行等待（子类实现不同的等待方式）"""
+        time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """
+    虚拟时钟
+
+    调用 sleep 的线程登记自己的唤醒时间；截止时间最早的线程在短暂的让步
+    （settle，真实时间）后仍为最早时，将虚拟时间直接推进到该截止时间并唤醒它。
+    多个仿真工位线程并发时按截止时间先后依次推进，等待过程不消耗真实时间
+    """
+
+    virtual = True
+
+    def __init__(self, start: Optional[float] = None, settle: float = 0.0005):
+        """
+        初始化虚拟时钟
+
+        Args:
+            start: 起始时间戳，默认为当前真实时间
+            settle: 推进时间前等待其他线程登记更早截止时间的真实时长(秒)
+        """
+        self._epoch = time.time() if start is None else start
+        self._now = 0.0
+        self.settle = settle
+        self._cond = threading.Condition()
+        self._sleepers: List[Tuple[float, int]] = []
+        self._seq = itertools.count()
+        self.sleep_count = 0
+        self.slept_time = 0.0
+
+    def time(self) -> float:
+        return self._epoch + self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def _sleep(self, seconds: float):
+        with self._cond:
+            self.sleep_count += 1
+            self.slept_time += seconds
+            deadline = self._now + seconds
+            entry = (deadline, next(self._seq))
+            heapq.heappush(self._sleepers, entry)
+            try:
+                while self._now < deadline:
+                    if self._sleepers[0] is entry:
+                        # 给其他线程登记更早截止时间的机会
+                        self._cond.wait(self.settle)
+                        if self._sleepers[0] is entry and self._now < deadline:
+                            self._now = deadline
+                            self._cond.notify_all()
+                    else:
+                        self._cond.wait()
+            finally:
+                self._sleepers.remove(entry)
+                heapq.heapify(self._sleepers)
+                self._cond.notify_all()
+
+    def advance(self, seconds: float):
+        """
+        手动推进虚拟时间
+
+        Args:
+            seconds: 推进的时长(秒)
+        """
+        with self._cond:
+            self._now += max(0.0, seconds)
+            self._cond.notify_all()
+
+
+_clock: Clock = Clock()
+
+
+def get_clock() -> Clock:
+    """获取当前全局时钟"""
+    return _clock
+
+
+def set_clock(clock: Optional[Clock]) -> Clock:
+    """
+    设置全局时钟
+
+    Args:
+        clock: 新时钟，为None时恢复系统时钟
+
+    Returns:
+        Clock: 原来的时钟
+    """
+    global _clock
+    previous = _clock
+    _clock = clock if clock is not None else Clock()
+    return previous
+
+
+@contextmanager
+def use_clock(clock: Clock) -> Iterator[Clock]:
+    """
+    在上下文中临时使用指定时钟
+
+    用法:
+        with use_clock(VirtualClock()):
+            scheduler.start()
+            ...
+    """
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
@@ -2,9 +2,9 @@
 激光光源驱动
 支持多种型号的激光器和可调谐激光器
 """
-import time
 from typing import Optional, List, Tuple
 from .base_driver import BaseDriver, SimulatedDriver
+from .clock import get_clock
 
 
 class LaserSource(BaseDriver):
@@ -50,7 +50,7 @@ class LaserSource(BaseDriver):
         
         self.write(f":SOUR{self.channel}:WAV {wavelength}NM")
         self.current_wavelength = wavelength
-        time.sleep(0.1)  # 等待波长稳定
+        get_clock().sleep(0.1)  # 等待波长稳定
         self.logger.info(f"设置波长: {wavelength} nm")
     
     def get_wavelength(self) -> float:
@@ -83,7 +83,7 @@ class LaserSource(BaseDriver):
         """打开激光输出"""
         self.write(f":SOUR{self.channel}:POW:STAT 1")
         self.output_enabled = True
-        time.sleep(0.5)  # 等待激光稳定
+        get_clock().sleep(0.5)  # 等待激光稳定
         self.logger.info("激光输出已打开")
     
     def output_off(self):
@@ -128,7 +128,7 @@ class LaserSource(BaseDriver):
         
         while (direction > 0 and current <= stop) or (direction < 0 and current >= stop):
             self.set_wavelength(current)
-            time.sleep(dwell_time)
+            get_clock().sleep(dwell_time)
             yield current
             current += step
     
@@ -152,7 +152,7 @@ class LaserSource(BaseDriver):
         
         while (direction > 0 and current <= stop) or (direction < 0 and current >= stop):
             self.set_power(current)
-            time.sleep(dwell_time)
+            get_clock().sleep(dwell_time)
             yield current
             current += step
     
@@ -246,7 +246,7 @@ class SimulatedLaserSource(SimulatedDriver):
         
         while (direction > 0 and current <= stop) or (direction < 0 and current >= stop):
             self.set_wavelength(current)
-            time.sleep(dwell_time * 0.1)  # 仿真时缩短等待
+            get_clock().sleep(dwell_time * 0.1)  # 仿真时缩短等待
             yield current
             current += step
     
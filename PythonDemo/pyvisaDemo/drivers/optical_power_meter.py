@@ -2,10 +2,10 @@
 光功率计驱动
 支持多种型号的光功率计仪器
 """
-import time
 import random
 from typing import Optional, List, Dict
 from .base_driver import BaseDriver, SimulatedDriver
+from .clock import get_clock
 
 
 class OpticalPowerMeter(BaseDriver):
@@ -116,7 +116,7 @@ class OpticalPowerMeter(BaseDriver):
             float: 光功率值
         """
         self.set_wavelength(wavelength)
-        time.sleep(0.1)  # 等待设置生效
+        get_clock().sleep(0.1)  # 等待设置生效
         return self.measure_power()
     
     def measure_multiple(self, count: int = 10, interval: float = 0.1) -> List[float]:
@@ -135,7 +135,7 @@ class OpticalPowerMeter(BaseDriver):
             power = self.measure_power()
             measurements.append(power)
             if i < count - 1:
-                time.sleep(interval)
+                get_clock().sleep(interval)
         return measurements
     
     def zero_calibration(self):
@@ -179,8 +179,14 @@ class SimulatedOpticalPowerMeter(SimulatedDriver):
         self._idn = "Simulated Optical Power Meter, OPM-1000, SN SIM001"
         self.wavelength = kwargs.get('parameters', {}).get('wavelength', 1550)
         self.unit = 'dBm'
+        self.channel = 1
         self._base_power = -10.0
         
+        # 仿真参数: reflection_channel 通道接环行器反射端口，读数比基准功率低 return_loss(dB)
+        sim = kwargs.get('simulation', {})
+        self.reflection_channel = sim.get('reflection_channel', 2)
+        self.return_loss = sim.get('return_loss', 60.0)
+        
     def _initialize(self):
         self.logger.info("仿真光功率计初始化完成")
     
@@ -195,6 +201,8 @@ class SimulatedOpticalPowerMeter(SimulatedDriver):
         # 模拟测量值，加入随机噪声
         noise = random.gauss(0, 0.05)
         power = self._base_power + noise
+        if self.channel == self.reflection_channel:
+            power -= self.return_loss
         self.logger.debug(f"仿真: 测量功率 {power:.3f} dBm")
         return round(power, 3)
     
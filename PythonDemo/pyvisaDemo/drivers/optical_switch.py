@@ -2,9 +2,9 @@
 光开关驱动
 支持多种光开关设备
 """
-import time
 from typing import Optional, List, Tuple
 from .base_driver import BaseDriver, SimulatedDriver
+from .clock import get_clock
 
 
 class OpticalSwitch(BaseDriver):
@@ -41,7 +41,7 @@ class OpticalSwitch(BaseDriver):
             raise ValueError(f"通道号必须在1到{self.channels}之间")
         
         self.write(f"ROUT:CHAN {channel}")
-        time.sleep(self.switch_time)  # 等待开关动作完成
+        get_clock().sleep(self.switch_time)  # 等待开关动作完成
         self.current_channel = channel
         self.logger.info(f"切换到通道 {channel}")
     
@@ -91,7 +91,7 @@ class OpticalSwitch(BaseDriver):
         for ch in range(1, self.channels + 1):
             self.switch_channel(ch)
             yield ch
-            time.sleep(dwell_time)
+            get_clock().sleep(dwell_time)
     
     def set_switch_speed(self, speed: str):
         """
@@ -174,7 +174,7 @@ class SimulatedOpticalSwitch(SimulatedDriver):
         for ch in range(1, self.channels + 1):
             self.switch_channel(ch)
             yield ch
-            time.sleep(dwell_time * 0.1)  # 仿真时缩短等待时间
+            get_clock().sleep(dwell_time * 0.1)  # 仿真时缩短等待时间
     
     def configure_route(self, input_port: int, output_port: int):
         self._routes.append((input_port, output_port))
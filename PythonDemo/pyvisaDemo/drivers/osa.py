@@ -2,10 +2,12 @@
 光谱分析仪(OSA)驱动
 支持多种型号的光谱分析仪
 """
-import time
+from dataclasses import replace
 import numpy as np
 from typing import Optional, List, Dict, Tuple
 from .base_driver import BaseDriver, SimulatedDriver
+from .clock import get_clock
+from .spectrum_model import SpectrumGenerator, SpectrumModel, SingleModeLaser
 
 
 class OpticalSpectrumAnalyzer(BaseDriver):
@@ -143,14 +145,16 @@ class OpticalSpectrumAnalyzer(BaseDriver):
         Returns:
             Tuple[np.ndarray, np.ndarray]: (波长数组, 功率数组)
         """
-        # 获取波长数据
-        self.write(f":TRAC:DATA:X? TR{trace}")
-        wavelength_str = self.read()
+        # 查询与读取分开发送，整组命令独占仪器，避免健康检查等查询插在中间取走响应
+        with self.transaction():
+            # 获取波长数据
+            self.write(f":TRAC:DATA:X? TR{trace}")
+            wavelength_str = self.read()
+            
+            # 获取功率数据
+            self.write(f":TRAC:DATA:Y? TR{trace}")
+            power_str = self.read()
         wavelengths = np.array([float(x) for x in wavelength_str.split(',')])
-        
-        # 获取功率数据
-        self.write(f":TRAC:DATA:Y? TR{trace}")
-        power_str = self.read()
         powers = np.array([float(x) for x in power_str.split(',')])
         
         return wavelengths * 1e9, powers  # 转换为nm
@@ -165,9 +169,10 @@ class OpticalSpectrumAnalyzer(BaseDriver):
         Returns:
             Tuple[float, float]: (峰值波长nm, 峰值功率dBm)
         """
-        self.write(f":CALC:MARK1:MAX")
-        wavelength = float(self.query(":CALC:MARK1:X?")) * 1e9
-        power = float(self.query(":CALC:MARK1:Y?"))
+        with self.transaction():
+            self.write(f":CALC:MARK1:MAX")
+            wavelength = float(self.query(":CALC:MARK1:X?")) * 1e9
+            power = float(self.query(":CALC:MARK1:Y?"))
         self.logger.info(f"峰值: {wavelength:.3f} nm, {power:.2f} dBm")
         return wavelength, power
     
@@ -264,8 +269,16 @@ class SimulatedOSA(SimulatedDriver):
         self.start_wavelength = params.get('start_wavelength', 1520)
         self.stop_wavelength = params.get('stop_wavelength', 1580)
         self.resolution = params.get('resolution', 0.02)
-        self._peak_wavelength = 1550.0
-        self._peak_power = 0.0
+        self.sensitivity = params.get('sensitivity', 'HIGH1')
+        
+        # 仿真参数: seed 固定随机序列，time_scale 缩放扫描耗时（0为不等待）
+        sim = kwargs.get('simulation', {})
+        self.sweep_time = sim.get('sweep_time', 0.5)
+        self.time_scale = sim.get('time_scale', 1.0)
+        self.generator = SpectrumGenerator(
+            SingleModeLaser(), seed=sim.get('seed'),
+            noise_floor=sim.get('noise_floor', -60.0)
+        )
         
     def _initialize(self):
         self.logger.info("仿真OSA初始化完成")
@@ -285,37 +298,43 @@ class SimulatedOSA(SimulatedDriver):
     def set_resolution(self, resolution: float):
         self.resolution = resolution
     
+    def set_sensitivity(self, sensitivity: str):
+        self.sensitivity = sensitivity
+    
     def single_sweep(self) -> bool:
-        time.sleep(0.5)  # 模拟扫描时间
+        delay = self.sweep_time * self.time_scale
+        if delay > 0:
+            get_clock().sleep(delay)  # 模拟扫描时间
         self.logger.debug("仿真: 扫描完成")
         return True
     
     def get_trace_data(self, trace: str = 'A') -> Tuple[np.ndarray, np.ndarray]:
-        """生成仿真光谱数据"""
-        num_points = int((self.stop_wavelength - self.start_wavelength) / 0.01)
-        wavelengths = np.linspace(self.start_wavelength, self.stop_wavelength, num_points)
-        
-        # 生成高斯峰形状的光谱
-        sigma = 0.1  # 线宽
-        powers = self._peak_power * np.exp(-((wavelengths - self._peak_wavelength)**2) / (2*sigma**2))
-        
-        # 添加噪声基底
-        noise_floor = -60
-        noise = np.random.normal(0, 1, num_points)
-        powers = 10 * np.log10(10**(powers/10) + 10**(noise_floor/10)) + noise * 0.5
-        
-        return wavelengths, powers
+        """生成仿真光谱数据（波长数组为只读的共享网格）"""
+        return self.generator.trace(self.start_wavelength, self.stop_wavelength, self.resolution)
     
     def find_peak(self, trace: str = 'A') -> Tuple[float, float]:
-        return self._peak_wavelength, self._peak_power
+        return self.generator.peak()
     
     def measure_smsr(self) -> float:
-        return 45.0 + np.random.normal(0, 0.5)
+        return self.generator.measure_smsr()
     
     def measure_3db_bandwidth(self) -> float:
-        return 0.08 + np.random.normal(0, 0.01)
+        return self.generator.measure_bandwidth()
     
     def set_peak(self, wavelength: float, power: float):
-        """设置仿真峰值参数"""
-        self._peak_wavelength = wavelength
-        self._peak_power = power
+        """设置仿真峰值参数（单模激光器）"""
+        model = self.generator.model
+        if isinstance(model, SingleModeLaser):
+            model = replace(model, wavelength=wavelength, power=power)
+        else:
+            model = SingleModeLaser(wavelength, power)
+        self.generator.model = model
+    
+    def set_spectrum(self, model: SpectrumModel):
+        """
+        设置仿真光谱模型
+        
+        Args:
+            model: 光谱模型（SingleModeLaser、MultiPeak、DwdmComb等）
+        """
+        self.generator.model = model
@@ -0,0 +1,50 @@
+"""
+回放驱动
+用录制的SCPI通信替代真实仪器，真实驱动代码按原路径全速运行，
+便于在无硬件环境下对测试流程进行性能分析和回归测试
+"""
+from pathlib import Path
+from typing import Type, Union
+
+from .base_driver import BaseDriver
+from .traffic_recorder import TrafficReader, ReplayResource
+
+
+class ReplayDriver:
+    """回放驱动混入类，需与具体驱动类组合使用（见 wrap）"""
+
+    def __init__(self, resource_string: str, recording: Union[str, Path] = None,
+                 strict: bool = True, **kwargs):
+        """
+        初始化回放驱动
+
+        Args:
+            resource_string: VISA资源字符串
+            recording: 录制文件路径
+            strict: 是否要求命令与录制严格一致
+            **kwargs: 传递给具体驱动类的参数
+        """
+        kwargs.pop('recorder', None)
+        super().__init__(resource_string, **kwargs)
+        self.recording = Path(recording) if recording else None
+        self.strict = strict
+
+    def _open_resource(self):
+        """以录制文件代替VISA资源"""
+        if self.recording is None or not self.recording.exists():
+            raise FileNotFoundError(f"录制文件不存在: {self.recording}")
+        self.logger.info(f"回放模式: {self.recording}")
+        return ReplayResource(TrafficReader(self.recording), strict=self.strict)
+
+    @classmethod
+    def wrap(cls, driver_class: Type[BaseDriver]) -> Type[BaseDriver]:
+        """
+        生成指定驱动类的回放版本
+
+        Args:
+            driver_class: 真实驱动类
+
+        Returns:
+            Type[BaseDriver]: 回放驱动类
+        """
+        return type(f"Replay{driver_class.__name__}", (cls, driver_class), {})
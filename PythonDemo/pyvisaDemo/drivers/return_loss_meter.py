@@ -0,0 +1,196 @@
+"""
+回损仪驱动
+内置多波长光源和反射计的专用回波损耗测量仪器（OTDR/OFDR 类反射计），
+配置好波长列表后一次测量操作给出所有波长的回损，无需外部激光器和逐个波长调谐
+"""
+import random
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .base_driver import BaseDriver, SimulatedDriver
+from .clock import get_clock
+
+
+def _parse_values(response: str) -> List[float]:
+    """解析逗号分隔的数值列表"""
+    return [float(x) for x in response.split(',') if x.strip()]
+
+
+def _per_wavelength(wavelengths: Sequence[float], values: List[float], what: str) -> Dict[float, float]:
+    """
+    按波长列表对应读数，数量不一致时报错（zip 会静默截断）
+
+    Raises:
+        RuntimeError: 读数个数与波长个数不一致
+    """
+    if len(values) != len(wavelengths):
+        raise RuntimeError(f"回损仪返回 {len(values)} 个{what}，与 {len(wavelengths)} 个测量波长不一致")
+    return dict(zip(wavelengths, values))
+
+
+class ReturnLossMeter(BaseDriver):
+    """回损仪驱动"""
+
+    def __init__(self, resource_string: str, **kwargs):
+        super().__init__(resource_string, **kwargs)
+        params = kwargs.get('parameters', {})
+        self.wavelengths: List[float] = list(params.get('wavelengths', [1310, 1550]))
+        self.averaging_time = params.get('averaging_time', 0.1)
+        self.measurement_timeout = params.get('measurement_timeout', 30)
+
+    def _initialize(self):
+        """初始化回损仪"""
+        self.clear_status()
+        self.set_wavelengths(self.wavelengths)
+        self.set_averaging_time(self.averaging_time)
+        self.logger.info("回损仪初始化完成")
+
+    def self_test(self) -> bool:
+        """自检"""
+        try:
+            result = self.query("*TST?")
+            return result == "0"
+        except Exception as e:
+            self.logger.error(f"自检失败: {e}")
+            return False
+
+    def set_wavelengths(self, wavelengths: Sequence[float]):
+        """
+        设置测量波长列表（一次测量操作覆盖全部波长）
+
+        Args:
+            wavelengths: 波长列表(nm)
+        """
+        values = ','.join(f"{w}NM" for w in wavelengths)
+        self.write(f"SENS:WAV:LIST {values}")
+        self.wavelengths = list(wavelengths)
+        self.logger.info(f"设置测量波长: {self.wavelengths} nm")
+
+    def get_wavelengths(self) -> List[float]:
+        """获取测量波长列表(nm)"""
+        return [w * 1e9 for w in _parse_values(self.query("SENS:WAV:LIST?"))]
+
+    def set_averaging_time(self, avg_time: float):
+        """
+        设置每次测量的平均时间
+
+        Args:
+            avg_time: 平均时间(秒)
+        """
+        self.write(f"SENS:RL:ATIME {avg_time}")
+        self.averaging_time = avg_time
+        self.logger.info(f"设置平均时间: {avg_time} s")
+
+    def reference_calibration(self) -> Dict[float, float]:
+        """
+        参考校准（测试端口接参考终端）
+
+        Returns:
+            Dict[float, float]: 各波长的参考功率(dBm)
+        """
+        self.write("SENS:CORR:COLL:REF")
+        self.wait_operation_complete(timeout=self.measurement_timeout)
+        powers = _parse_values(self.query("FETC:POW:REF?"))
+        self.logger.info("回损仪参考校准完成")
+        return _per_wavelength(self.wavelengths, powers, "参考功率")
+
+    def measure_return_loss(self, wavelengths: Optional[Sequence[float]] = None) -> Dict[float, float]:
+        """
+        单次测量所有波长的回损
+
+        Args:
+            wavelengths: 波长列表(nm)，与当前设置不同时先重新设置，默认使用当前设置
+
+        Returns:
+            Dict[float, float]: 波长 -> 回损(dB)
+            
+        Raises:
+            RuntimeError: 返回的回损个数与波长个数不一致
+        """
+        if wavelengths is not None and list(wavelengths) != self.wavelengths:
+            self.set_wavelengths(wavelengths)
+        self.write("INIT")
+        self.wait_operation_complete(timeout=self.measurement_timeout)
+        values = _parse_values(self.query("FETC:RL?"))
+        return _per_wavelength(self.wavelengths, values, "回损值")
+
+    def measure_multiple(self, count: int = 3,
+                         wavelengths: Optional[Sequence[float]] = None) -> Dict[float, List[float]]:
+        """
+        多次单次测量
+
+        Args:
+            count: 测量次数
+            wavelengths: 波长列表(nm)，默认使用当前设置
+
+        Returns:
+            Dict[float, List[float]]: 波长 -> 各次回损(dB)
+        """
+        readings: Dict[float, List[float]] = {}
+        for _ in range(count):
+            for wavelength, value in self.measure_return_loss(wavelengths).items():
+                readings.setdefault(wavelength, []).append(value)
+        return readings
+
+
+class SimulatedReturnLossMeter(SimulatedDriver):
+    """仿真回损仪"""
+
+    def __init__(self, resource_string: str, **kwargs):
+        super().__init__(resource_string, **kwargs)
+        self._idn = "Simulated Return Loss Meter, RLM-100, SN SIM005"
+        params = kwargs.get('parameters', {})
+        self.wavelengths: List[float] = list(params.get('wavelengths', [1310, 1550]))
+        self.averaging_time = params.get('averaging_time', 0.1)
+
+        # 仿真参数: return_loss 为被测件回损(dB)，time_scale 缩放测量耗时（0为不等待）
+        sim = kwargs.get('simulation', {})
+        self.return_loss = sim.get('return_loss', 55.0)
+        self.noise = sim.get('noise', 0.2)
+        self.time_scale = sim.get('time_scale', 1.0)
+        self.random = random.Random(sim.get('seed'))
+        self._reference_power = 0.0
+
+    def _initialize(self):
+        self.logger.info("仿真回损仪初始化完成")
+
+    def self_test(self) -> bool:
+        return True
+
+    def set_wavelengths(self, wavelengths: Sequence[float]):
+        self.wavelengths = list(wavelengths)
+        self.logger.debug(f"仿真: 设置测量波长 {self.wavelengths} nm")
+
+    def get_wavelengths(self) -> List[float]:
+        return list(self.wavelengths)
+
+    def set_averaging_time(self, avg_time: float):
+        self.averaging_time = avg_time
+
+    def reference_calibration(self) -> Dict[float, float]:
+        get_clock().sleep(self.averaging_time * self.time_scale)
+        return {w: self._reference_power for w in self.wavelengths}
+
+    def measure_return_loss(self, wavelengths: Optional[Sequence[float]] = None) -> Dict[float, float]:
+        if wavelengths is not None:
+            self.wavelengths = list(wavelengths)
+        # 所有波长在同一次测量操作中完成，耗时与波长数无关
+        get_clock().sleep(self.averaging_time * self.time_scale)
+        sigma = self.noise * np.sqrt(0.1 / max(self.averaging_time, 1e-4))
+        return {
+            w: round(self.return_loss - 0.002 * (w - 1550) + self.random.gauss(0, sigma), 3)
+            for w in self.wavelengths
+        }
+
+    def measure_multiple(self, count: int = 3,
+                         wavelengths: Optional[Sequence[float]] = None) -> Dict[float, List[float]]:
+        readings: Dict[float, List[float]] = {}
+        for _ in range(count):
+            for wavelength, value in self.measure_return_loss(wavelengths).items():
+                readings.setdefault(wavelength, []).append(value)
+        return readings
+
+    def set_return_loss(self, return_loss: float):
+        """设置仿真被测件回损"""
+        self.return_loss = return_loss
@@ -0,0 +1,934 @@
+"""
+SCPI仿真后端
+为每类仪器提供有状态的SCPI命令模型，并以本地的VISA资源替身对外提供服务，
+真实驱动的完整代码路径可以在无硬件环境下以每秒数千条命令的速度运行，
+用于负载测试和吞吐量分析
+"""
+import logging
+import math
+import random
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from pyvisa import constants
+from pyvisa.errors import VisaIOError
+
+from .clock import get_clock
+from .spectrum_model import SpectrumGenerator, SpectrumModel, SingleModeLaser
+
+
+# SCPI标准错误
+ERR_NONE = (0, "No error")
+ERR_UNDEFINED_HEADER = (-113, "Undefined header")
+ERR_DATA_TYPE = (-104, "Data type error")
+ERR_ILLEGAL_VALUE = (-224, "Illegal parameter value")
+ERR_OUT_OF_RANGE = (-222, "Data out of range")
+ERR_QUERY_INTERRUPTED = (-410, "Query INTERRUPTED")
+ERR_QUERY_UNTERMINATED = (-420, "Query UNTERMINATED")
+ERR_QUEUE_OVERFLOW = (-350, "Queue overflow")
+
+_ERROR_QUEUE_SIZE = 30
+
+# 数值参数: 数值 + 可选单位
+_NUMBER = re.compile(r'\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([A-Za-z]*)\s*$')
+_UNIT_SCALE = {'': 1.0, 'NM': 1e-9, 'UM': 1e-6, 'M': 1.0, 'PM': 1e-12,
+               'DBM': 1.0, 'DB': 1.0, 'W': 1.0, 'MW': 1e-3, 'UW': 1e-6, 'S': 1.0, 'MS': 1e-3}
+
+Response = Union[None, str, Sequence[float], np.ndarray]
+
+
+class ScpiError(Exception):
+    """命令执行错误，对应SCPI错误队列中的一条记录"""
+
+    def __init__(self, error: Tuple[int, str], detail: str = ""):
+        super().__init__(f"{error[0]},{error[1]}")
+        self.code, self.message = error
+        if detail:
+            self.message = f"{self.message}; {detail}"
+
+
+def scpi(*patterns: str):
+    """
+    注册SCPI命令处理函数
+
+    Args:
+        *patterns: 命令头正则表达式（大写，不含前导冒号），捕获组作为位置参数传给处理函数
+    """
+    def decorator(func):
+        func._scpi_patterns = patterns
+        return func
+    return decorator
+
+
+def parse_number(args: str, unit: str = '') -> float:
+    """
+    解析带单位的数值参数
+
+    Args:
+        args: 参数字符串，如 "1550NM"、"-3.5"
+        unit: 期望的基本单位（'M' 表示以米为单位返回波长）
+
+    Returns:
+        float: 数值
+    """
+    match = _NUMBER.match(args)
+    if match is None:
+        raise ScpiError(ERR_DATA_TYPE, args.strip())
+    value = float(match.group(1))
+    suffix = match.group(2).upper()
+    if suffix not in _UNIT_SCALE:
+        raise ScpiError(ERR_ILLEGAL_VALUE, f"未知单位 {suffix}")
+    if unit == 'M' and suffix == '' and value > 1:
+        # 未带单位的大数值按纳米处理
+        return value * 1e-9
+    return value * _UNIT_SCALE[suffix]
+
+
+def parse_bool(args: str) -> bool:
+    """解析布尔参数（0/1/ON/OFF）"""
+    value = args.strip().upper()
+    if value in ('1', 'ON'):
+        return True
+    if value in ('0', 'OFF'):
+        return False
+    raise ScpiError(ERR_ILLEGAL_VALUE, value)
+
+
+class SimulatedBench:
+    """
+    仿真光路
+
+    激光器的输出经过被测器件后到达功率计和光谱分析仪，被测器件的反射光经环行器到达功率计的反射通道，
+    使各仪器模型之间的读数相互一致
+    """
+
+    def __init__(self, insertion_loss: float = 0.5, default_power: float = -10.0,
+                 return_loss: float = 60.0):
+        """
+        初始化光路
+
+        Args:
+            insertion_loss: 被测器件插入损耗(dB)
+            default_power: 没有激光器输出时功率计读到的功率(dBm)
+            return_loss: 被测器件回波损耗(dB)
+        """
+        self.insertion_loss = insertion_loss
+        self.return_loss = return_loss
+        self.default_power = default_power
+        self.laser: Optional['LaserSourceModel'] = None
+
+    def source(self) -> Optional[Tuple[float, float]]:
+        """
+        当前光源输出
+
+        Returns:
+            Optional[Tuple[float, float]]: (波长nm, 功率dBm)，光源关闭时为None
+        """
+        laser = self.laser
+        if laser is None or not laser.output_enabled:
+            return None
+        return laser.wavelength * 1e9, laser.power
+
+    def received_power(self) -> float:
+        """到达接收端的功率(dBm)"""
+        source = self.source()
+        if source is None:
+            return self.default_power
+        return source[1] - self.insertion_loss
+
+    def reflected_power(self) -> float:
+        """被测器件反射回来的功率(dBm)"""
+        source = self.source()
+        power = self.default_power if source is None else source[1]
+        return power - self.return_loss
+
+
+class ScpiModel:
+    """SCPI仪器模型基类，实现IEEE 488.2公共命令和错误队列"""
+
+    IDN = "Simulated,SCPI-MODEL,SIM0000,1.0"
+
+    _handlers: List[Tuple['re.Pattern', Callable]] = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        handlers = []
+        seen = set()
+        for klass in cls.__mro__:
+            for name, func in vars(klass).items():
+                if name in seen or not hasattr(func, '_scpi_patterns'):
+                    continue
+                seen.add(name)
+                for pattern in func._scpi_patterns:
+                    handlers.append((re.compile(pattern), func))
+        cls._handlers = handlers
+
+    def __init__(self, bench: Optional[SimulatedBench] = None, seed: Optional[int] = None,
+                 parameters: Optional[Dict] = None, operation_time: float = 0.0,
+                 time_scale: float = 1.0):
+        """
+        初始化仪器模型
+
+        Args:
+            bench: 共享的仿真光路
+            seed: 随机数种子，相同种子产生相同的读数序列
+            parameters: 仪器配置参数
+            operation_time: 耗时操作（扫描、校准）的仿真时长(秒)
+            time_scale: 仿真耗时缩放系数，0表示不等待
+        """
+        self.bench = bench or SimulatedBench()
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.parameters = parameters or {}
+        self.operation_time = operation_time
+        self.time_scale = time_scale
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._errors: Deque[Tuple[int, str]] = deque()
+        self._esr = 0
+        self._busy_until = 0.0
+        self._dispatch_cache: Dict[str, Tuple[Callable, Tuple]] = {}
+        self.command_count = 0
+        self.reset()
+
+    # ========== 命令分派 ==========
+
+    def execute(self, command: str) -> Response:
+        """
+        执行一条命令（可包含以分号分隔的多条命令）
+
+        Args:
+            command: SCPI命令
+
+        Returns:
+            Response: 查询命令的响应，非查询命令为None
+        """
+        responses = []
+        for part in command.split(';'):
+            part = part.strip()
+            if not part:
+                continue
+            response = self._execute_one(part)
+            if response is not None:
+                responses.append(response)
+        if not responses:
+            return None
+        if len(responses) == 1:
+            return responses[0]
+        return ';'.join(format_response(r) for r in responses)
+
+    def _execute_one(self, command: str) -> Response:
+        self.command_count += 1
+        header, _, args = command.partition(' ')
+        header = header.lstrip(':').upper()
+        entry = self._dispatch_cache.get(header)
+        if entry is None:
+            entry = self._resolve(header)
+            if entry is None:
+                self.push_error(ERR_UNDEFINED_HEADER, header)
+                return None
+            self._dispatch_cache[header] = entry
+        handler, groups = entry
+        try:
+            return handler(self, args.strip(), *groups)
+        except ScpiError as e:
+            self.push_error((e.code, e.message))
+            return None
+
+    def _resolve(self, header: str) -> Optional[Tuple[Callable, Tuple]]:
+        for pattern, handler in self._handlers:
+            match = pattern.fullmatch(header)
+            if match:
+                return handler, match.groups()
+        return None
+
+    # ========== 错误队列和状态 ==========
+
+    def push_error(self, error: Tuple[int, str], detail: str = ""):
+        """向错误队列追加一条错误"""
+        code, message = error
+        if detail:
+            message = f"{message}; {detail}"
+        if len(self._errors) >= _ERROR_QUEUE_SIZE:
+            self._errors[-1] = ERR_QUEUE_OVERFLOW
+        else:
+            self._errors.append((code, message))
+        # 命令错误(-1xx)置ESR第5位，执行错误(-2xx)置第4位，查询错误(-4xx)置第2位
+        if -199 <= code <= -100:
+            self._esr |= 0x20
+        elif -299 <= code <= -200:
+            self._esr |= 0x10
+        elif -499 <= code <= -400:
+            self._esr |= 0x04
+        self.logger.debug("SCPI错误: %s,%s", code, message)
+
+    @property
+    def error_count(self) -> int:
+        """错误队列中的错误条数"""
+        return len(self._errors)
+
+    def start_operation(self, duration: Optional[float] = None):
+        """开始一个耗时操作，*OPC? 在操作完成后才返回"""
+        duration = self.operation_time if duration is None else duration
+        duration *= self.time_scale
+        self._busy_until = max(self._busy_until, get_clock().monotonic() + duration)
+
+    @property
+    def busy(self) -> bool:
+        """是否有未完成的操作"""
+        return get_clock().monotonic() < self._busy_until
+
+    def wait_complete(self):
+        """等待所有操作完成"""
+        clock = get_clock()
+        remaining = self._busy_until - clock.monotonic()
+        if remaining > 0:
+            clock.sleep(remaining)
+
+    def reset(self):
+        """恢复出厂设置（子类扩展）"""
+        self._busy_until = 0.0
+
+    # ========== IEEE 488.2 公共命令 ==========
+
+    @scpi(r'\*IDN\?')
+    def _idn(self, args):
+        return self.IDN
+
+    @scpi(r'\*RST')
+    def _rst(self, args):
+        self.reset()
+
+    @scpi(r'\*CLS')
+    def _cls(self, args):
+        self._errors.clear()
+        self._esr = 0
+
+    @scpi(r'\*TST\?')
+    def _tst(self, args):
+        return "0"
+
+    @scpi(r'\*OPC')
+    def _opc(self, args):
+        if not self.busy:
+            self._esr |= 0x01
+
+    @scpi(r'\*OPC\?')
+    def _opc_query(self, args):
+        self.wait_complete()
+        return "1"
+
+    @scpi(r'\*WAI')
+    def _wai(self, args):
+        self.wait_complete()
+
+    @scpi(r'\*ESR\?')
+    def _esr_query(self, args):
+        esr, self._esr = self._esr, 0
+        return str(esr)
+
+    @scpi(r'\*STB\?')
+    def _stb(self, args):
+        stb = 0
+        if self._errors:
+            stb |= 0x04
+        if self._esr:
+            stb |= 0x20
+        return str(stb)
+
+    @scpi(r'SYST(?:EM)?:ERR(?:OR)?(?::NEXT)?\?')
+    def _syst_err(self, args):
+        code, message = self._errors.popleft() if self._errors else ERR_NONE
+        return f'{code},"{message}"'
+
+
+class PowerMeterModel(ScpiModel):
+    """光功率计模型"""
+
+    IDN = "Simulated,OPM-1000,SIM001,2.0"
+
+    def reset(self):
+        super().reset()
+        self.wavelength = 1550e-9
+        self.unit_watt = False
+        self.averaging_time = 0.1
+        self.range = -10.0
+        self.auto_range = True
+        self.reference = 0.0
+        self.zero_offset = 0.0
+        self.noise = float(self.parameters.get('noise', 0.05))
+        # 接环行器反射端口的通道，读到被测器件的反射功率
+        self.reflection_channel = int(self.parameters.get('reflection_channel', 2))
+
+    def read_power_dbm(self, channel: int = 1) -> float:
+        """计算指定通道的当前读数(dBm)，平均时间越长噪声越小"""
+        sigma = self.noise * math.sqrt(0.1 / max(self.averaging_time, 1e-4))
+        power = (self.bench.reflected_power() if channel == self.reflection_channel
+                 else self.bench.received_power())
+        return power - self.zero_offset + self.random.gauss(0, sigma)
+
+    @scpi(r'SENS(\d*):POW:WAV')
+    def _set_wavelength(self, args, channel):
+        self.wavelength = parse_number(args, 'M')
+
+    @scpi(r'SENS(\d*):POW:WAV\?')
+    def _get_wavelength(self, args, channel):
+        return f"{self.wavelength:.6E}"
+
+    @scpi(r'SENS(\d*):POW:UNIT')
+    def _set_unit(self, args, channel):
+        value = args.strip().upper()
+        if value in ('0', 'DBM'):
+            self.unit_watt = False
+        elif value in ('1', 'W', 'WATT'):
+            self.unit_watt = True
+        else:
+            raise ScpiError(ERR_ILLEGAL_VALUE, value)
+
+    @scpi(r'SENS(\d*):POW:UNIT\?')
+    def _get_unit(self, args, channel):
+        return "1" if self.unit_watt else "0"
+
+    @scpi(r'SENS(\d*):POW:ATIME')
+    def _set_atime(self, args, channel):
+        value = parse_number(args)
+        if not 1e-4 <= value <= 10:
+            raise ScpiError(ERR_OUT_OF_RANGE, args)
+        self.averaging_time = value
+
+    @scpi(r'SENS(\d*):POW:ATIME\?')
+    def _get_atime(self, args, channel):
+        return f"{self.averaging_time:.6E}"
+
+    @scpi(r'SENS(\d*):POW:RANG')
+    def _set_range(self, args, channel):
+        self.range = parse_number(args)
+        self.auto_range = False
+
+    @scpi(r'SENS(\d*):POW:RANG:AUTO')
+    def _set_auto_range(self, args, channel):
+        self.auto_range = parse_bool(args)
+
+    @scpi(r'(?:READ|FETC|MEAS)(\d*):POW\?')
+    def _read_power(self, args, channel):
+        power = self.read_power_dbm(int(channel or 1))
+        if self.unit_watt:
+            return f"{10 ** (power / 10) * 1e-3:.6E}"
+        return f"{power:.3f}"
+
+    @scpi(r'SENS(\d*):CORR:COLL:ZERO')
+    def _zero(self, args, channel):
+        self.zero_offset = 0.0
+        self.start_operation()
+
+    @scpi(r'SENS(\d*):CORR:COLL:REF:VAL')
+    def _set_reference(self, args, channel):
+        self.reference = parse_number(args)
+
+
+class LaserSourceModel(ScpiModel):
+    """激光光源模型"""
+
+    IDN = "Simulated,TLS-1000,SIM004,2.0"
+
+    def __init__(self, bench: Optional[SimulatedBench] = None, **kwargs):
+        super().__init__(bench, **kwargs)
+        self.bench.laser = self
+
+    def reset(self):
+        super().reset()
+        low, high = self.parameters.get('wavelength_range', [1260, 1650])
+        self.wavelength_range = (low * 1e-9, high * 1e-9)
+        self.power_range = tuple(self.parameters.get('power_range', [-15, 13]))
+        self.wavelength = float(self.parameters.get('default_wavelength', 1550)) * 1e-9
+        self.power = float(self.parameters.get('default_power', 0))
+        self.output_enabled = False
+        self.coherence_control = False
+        self.power_mode = 'MAN'
+
+    @scpi(r'SOUR(\d*):WAV')
+    def _set_wavelength(self, args, channel):
+        value = parse_number(args, 'M')
+        if not self.wavelength_range[0] - 1e-15 <= value <= self.wavelength_range[1] + 1e-15:
+            raise ScpiError(ERR_OUT_OF_RANGE, args)
+        self.wavelength = value
+
+    @scpi(r'SOUR(\d*):WAV\?')
+    def _get_wavelength(self, args, channel):
+        return f"{self.wavelength:.6E}"
+
+    @scpi(r'SOUR(\d*):POW')
+    def _set_power(self, args, channel):
+        value = parse_number(args)
+        if not self.power_range[0] <= value <= self.power_range[1]:
+            raise ScpiError(ERR_OUT_OF_RANGE, args)
+        self.power = value
+
+    @scpi(r'SOUR(\d*):POW\?')
+    def _get_power(self, args, channel):
+        return f"{self.power:.3f}"
+
+    @scpi(r'SOUR(\d*):POW:STAT')
+    def _set_state(self, args, channel):
+        self.output_enabled = parse_bool(args)
+
+    @scpi(r'SOUR(\d*):POW:STAT\?')
+    def _get_state(self, args, channel):
+        return "1" if self.output_enabled else "0"
+
+    @scpi(r'SOUR(\d*):POW:ACT\?')
+    def _get_actual_power(self, args, channel):
+        if not self.output_enabled:
+            return "-1.000000E+02"
+        return f"{self.power + self.random.gauss(0, 0.01):.3f}"
+
+    @scpi(r'SOUR(\d*):POW:MODE')
+    def _set_mode(self, args, channel):
+        mode = args.strip().upper()
+        if mode not in ('APC', 'MAN', 'ACC'):
+            raise ScpiError(ERR_ILLEGAL_VALUE, mode)
+        self.power_mode = mode
+
+    @scpi(r'SOUR(\d*):AM:STAT')
+    def _set_coherence(self, args, channel):
+        self.coherence_control = parse_bool(args)
+
+
+class OpticalSwitchModel(ScpiModel):
+    """光开关模型"""
+
+    IDN = "Simulated,OSW-100,SIM002,2.0"
+
+    def reset(self):
+        super().reset()
+        self.channels = int(self.parameters.get('channels', 8))
+        self.channel = 1
+        self.speed = 'NORMAL'
+        self.routes: List[Tuple[int, int]] = []
+
+    @scpi(r'ROUT:CHAN')
+    def _set_channel(self, args):
+        value = parse_number(args)
+        if value != int(value) or not 1 <= value <= self.channels:
+            raise ScpiError(ERR_OUT_OF_RANGE, args)
+        self.channel = int(value)
+        self.start_operation()
+
+    @scpi(r'ROUT:CHAN\?')
+    def _get_channel(self, args):
+        return str(self.channel)
+
+    @scpi(r'ROUT:CHAN:COUN\?')
+    def _get_count(self, args):
+        return str(self.channels)
+
+    @scpi(r'ROUT:SWIT:SPEED')
+    def _set_speed(self, args):
+        speed = args.strip().upper()
+        if speed not in ('FAST', 'NORMAL', 'SLOW'):
+            raise ScpiError(ERR_ILLEGAL_VALUE, speed)
+        self.speed = speed
+
+    @staticmethod
+    def _parse_route(args: str) -> Tuple[int, int]:
+        match = re.fullmatch(r'\s*\(@\s*(\d+)\s*,\s*(\d+)\s*\)\s*', args)
+        if match is None:
+            raise ScpiError(ERR_DATA_TYPE, args)
+        return int(match.group(1)), int(match.group(2))
+
+    @scpi(r'ROUT:CLOS')
+    def _close_route(self, args):
+        route = self._parse_route(args)
+        if route not in self.routes:
+            self.routes.append(route)
+
+    @scpi(r'ROUT:OPEN')
+    def _open_route(self, args):
+        route = self._parse_route(args)
+        if route in self.routes:
+            self.routes.remove(route)
+
+    @scpi(r'ROUT:OPEN:ALL')
+    def _open_all(self, args):
+        self.routes.clear()
+
+    @scpi(r'ROUT:CLOS:STAT\?')
+    def _route_state(self, args):
+        return ','.join(f"(@{i},{o})" for i, o in self.routes)
+
+
+class OSAModel(ScpiModel):
+    """光谱分析仪模型"""
+
+    IDN = "Simulated,OSA-2000,SIM003,2.0"
+
+    def __init__(self, bench: Optional[SimulatedBench] = None, **kwargs):
+        super().__init__(bench, **kwargs)
+        self.generator = SpectrumGenerator(seed=self.seed)
+        self.rng = self.generator.rng
+        # 显式设置的光谱模型，为None时跟随光路中的激光器
+        self.spectrum: Optional[SpectrumModel] = None
+
+    def reset(self):
+        super().reset()
+        self.start = float(self.parameters.get('start_wavelength', 1520)) * 1e-9
+        self.stop = float(self.parameters.get('stop_wavelength', 1580)) * 1e-9
+        self.resolution = float(self.parameters.get('resolution', 0.02)) * 1e-9
+        self.sensitivity = str(self.parameters.get('sensitivity', 'HIGH1'))
+        self.sweep_mode = 'SING'
+        self.reference_level = 0.0
+        self.scale = 10.0
+        self.threshold = -50.0
+        self.osnr_bandwidths = (0.1e-9, 0.1e-9)
+        self.marker = (0.0, -100.0)
+        self.traces: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.saved_traces: Dict[str, str] = {}
+
+    # ========== 光谱计算 ==========
+
+    def _update_model(self):
+        """根据光路中的光源更新光谱模型"""
+        if self.spectrum is not None:
+            self.generator.model = self.spectrum
+            return
+        source = self.bench.source()
+        if source is None:
+            wavelength, power = 1550.0, 0.0
+        else:
+            wavelength, power = source[0], source[1] - self.bench.insertion_loss
+        model = self.generator.model
+        if (not isinstance(model, SingleModeLaser) or model.wavelength != wavelength
+                or model.power != power):
+            self.generator.model = SingleModeLaser(wavelength, power)
+
+    def _peak(self) -> Tuple[float, float]:
+        self._update_model()
+        return self.generator.peak()
+
+    def _sweep(self):
+        """执行一次扫描，生成轨迹A"""
+        self._update_model()
+        wavelengths, powers = self.generator.trace(self.start * 1e9, self.stop * 1e9,
+                                                   self.resolution * 1e9)
+        self.traces['TRA'] = (wavelengths * 1e-9, powers)
+
+    def _trace(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        name = (name or 'TRA').strip().upper()
+        if name not in self.traces:
+            self._sweep()
+        return self.traces.get(name) or self.traces['TRA']
+
+    # ========== 设置 ==========
+
+    @scpi(r'SENS:WAV:STAR')
+    def _set_start(self, args):
+        self.start = parse_number(args, 'M')
+
+    @scpi(r'SENS:WAV:STOP')
+    def _set_stop(self, args):
+        self.stop = parse_number(args, 'M')
+
+    @scpi(r'SENS:WAV:CENT')
+    def _set_center(self, args):
+        span = self.stop - self.start
+        center = parse_number(args, 'M')
+        self.start, self.stop = center - span / 2, center + span / 2
+
+    @scpi(r'SENS:WAV:SPAN')
+    def _set_span(self, args):
+        center = (self.start + self.stop) / 2
+        span = parse_number(args, 'M')
+        self.start, self.stop = center - span / 2, center + span / 2
+
+    @scpi(r'SENS:WAV:(STAR|STOP)\?')
+    def _get_range(self, args, which):
+        return f"{self.start if which == 'STAR' else self.stop:.6E}"
+
+    @scpi(r'SENS:BAND:RES')
+    def _set_resolution(self, args):
+        self.resolution = parse_number(args, 'M')
+
+    @scpi(r'SENS:SENS')
+    def _set_sensitivity(self, args):
+        value = args.strip().upper()
+        if value not in ('NORM', 'NHLD', 'NAUT', 'MID', 'HIGH1', 'HIGH2', 'HIGH3'):
+            raise ScpiError(ERR_ILLEGAL_VALUE, value)
+        self.sensitivity = value
+
+    @scpi(r'DISP:TRAC:Y:RLEV')
+    def _set_reference_level(self, args):
+        self.reference_level = parse_number(args)
+
+    @scpi(r'DISP:TRAC:Y:PDIV')
+    def _set_scale(self, args):
+        self.scale = parse_number(args)
+
+    # ========== 扫描 ==========
+
+    @scpi(r'INIT:SMOD')
+    def _set_sweep_mode(self, args):
+        mode = args.strip().upper()
+        if mode not in ('SING', 'REP', 'AUTO', 'SEGM'):
+            raise ScpiError(ERR_ILLEGAL_VALUE, mode)
+        self.sweep_mode = mode
+
+    @scpi(r'INIT')
+    def _init(self, args):
+        self._sweep()
+        self.start_operation()
+
+    @scpi(r'ABOR')
+    def _abort(self, args):
+        self._busy_until = 0.0
+
+    # ========== 轨迹和分析 ==========
+
+    @scpi(r'TRAC:DATA:X\?')
+    def _trace_x(self, args):
+        return self._trace(args)[0]
+
+    @scpi(r'TRAC:DATA:Y\?')
+    def _trace_y(self, args):
+        return self._trace(args)[1]
+
+    @scpi(r'CALC:MARK1:MAX')
+    def _marker_max(self, args):
+        wavelengths, powers = self._trace('TRA')
+        index = int(np.argmax(powers))
+        self.marker = (float(wavelengths[index]), float(powers[index]))
+
+    @scpi(r'CALC:MARK1:X\?')
+    def _marker_x(self, args):
+        return f"{self.marker[0]:.6E}"
+
+    @scpi(r'CALC:MARK1:Y\?')
+    def _marker_y(self, args):
+        return f"{self.marker[1]:.3f}"
+
+    @scpi(r'CALC:PAR:SMSR\?')
+    def _smsr(self, args):
+        self._update_model()
+        return f"{self.generator.measure_smsr():.3f}"
+
+    @scpi(r'CALC:PAR:BWD:3DB\?')
+    def _bandwidth(self, args):
+        self._update_model()
+        return f"{self.generator.measure_bandwidth() * 1e-9:.6E}"
+
+    @scpi(r'CALC:PAR:OSNR:(SBW|NBW)')
+    def _set_osnr_bandwidth(self, args, which):
+        value = parse_number(args, 'M')
+        signal_bw, noise_bw = self.osnr_bandwidths
+        self.osnr_bandwidths = (value, noise_bw) if which == 'SBW' else (signal_bw, value)
+
+    @scpi(r'CALC:PAR:OSNR\?')
+    def _osnr(self, args):
+        _, peak_power = self._peak()
+        return f"{peak_power + 60.0 + self.rng.normal(0, 0.3):.3f}"
+
+    @scpi(r'CALC:PAR:ANA:THR')
+    def _set_threshold(self, args):
+        self.threshold = parse_number(args)
+
+    @scpi(r'CALC:DATA:ANA\?')
+    def _analysis(self, args):
+        peak_wl, peak_power = self._peak()
+        if peak_power < self.threshold:
+            return "0"
+        return f"1,{peak_wl * 1e-9:.6E},{peak_power:.3f}"
+
+    @scpi(r'MMEM:STOR:TRAC')
+    def _store_trace(self, args):
+        trace, _, filename = args.partition(',')
+        self.saved_traces[filename.strip().strip("'\"")] = trace.strip().upper()
+
+
+class ReturnLossMeterModel(ScpiModel):
+    """回损仪模型：INIT 一次测量波长列表中的所有波长"""
+
+    IDN = "Simulated,RLM-100,SIM005,2.0"
+
+    def reset(self):
+        super().reset()
+        self.wavelengths = [1310e-9, 1550e-9]
+        self.averaging_time = 0.1
+        self.source_power = 0.0
+        self.noise = float(self.parameters.get('noise', 0.2))
+        self.results: List[float] = []
+
+    @scpi(r'SENS:WAV:LIST')
+    def _set_wavelengths(self, args):
+        wavelengths = [parse_number(item, 'M') for item in args.split(',') if item.strip()]
+        if not wavelengths:
+            raise ScpiError(ERR_DATA_TYPE, args)
+        self.wavelengths = wavelengths
+
+    @scpi(r'SENS:WAV:LIST\?')
+    def _get_wavelengths(self, args):
+        return self.wavelengths
+
+    @scpi(r'SENS:RL:ATIME')
+    def _set_atime(self, args):
+        value = parse_number(args)
+        if not 1e-3 <= value <= 10:
+            raise ScpiError(ERR_OUT_OF_RANGE, args)
+        self.averaging_time = value
+
+    @scpi(r'SENS:RL:ATIME\?')
+    def _get_atime(self, args):
+        return f"{self.averaging_time:.6E}"
+
+    @scpi(r'SENS:CORR:COLL:REF')
+    def _reference(self, args):
+        self.start_operation(self.averaging_time)
+
+    @scpi(r'FETC:POW:REF\?')
+    def _reference_power(self, args):
+        return [self.source_power] * len(self.wavelengths)
+
+    @scpi(r'INIT')
+    def _init(self, args):
+        sigma = self.noise * math.sqrt(0.1 / self.averaging_time)
+        self.results = [self.bench.return_loss - 0.002 * (w * 1e9 - 1550) + self.random.gauss(0, sigma)
+                        for w in self.wavelengths]
+        # 所有波长在同一次测量操作中完成
+        self.start_operation(self.averaging_time)
+
+    @scpi(r'FETC:RL\?')
+    def _fetch(self, args):
+        self.wait_complete()
+        return self.results
+
+
+# 驱动类型 -> 仪器模型
+MODEL_MAP: Dict[str, type] = {
+    'optical_power_meter': PowerMeterModel,
+    'laser_source': LaserSourceModel,
+    'optical_switch': OpticalSwitchModel,
+    'osa': OSAModel,
+    'return_loss_meter': ReturnLossMeterModel,
+}
+
+
+def format_response(response: Response) -> str:
+    """将模型响应格式化为ASCII文本"""
+    if response is None:
+        return ""
+    if isinstance(response, str):
+        return response
+    return ','.join(f"{value:.6E}" for value in response)
+
+
+class SimulatedResource:
+    """
+    VISA资源替身
+
+    提供与pyvisa消息型资源相同的 write/read/query/query_binary_values 接口，
+    命令交给SCPI模型执行，可配置每次通信的延迟
+    """
+
+    def __init__(self, model: ScpiModel, resource_name: str = "SIM::INSTR",
+                 latency: float = 0.0):
+        """
+        初始化资源替身
+
+        Args:
+            model: SCPI仪器模型
+            resource_name: 资源名称
+            latency: 每次通信的仿真延迟(秒)
+        """
+        self.model = model
+        self.resource_name = resource_name
+        self.latency = latency
+        self.timeout = 5000
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self._output: Deque[Response] = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _check_open(self):
+        if self._closed:
+            raise VisaIOError(constants.StatusCode.error_connection_lost)
+
+    def _delay(self):
+        if self.latency > 0:
+            get_clock().sleep(self.latency)
+
+    def write(self, command: str) -> int:
+        """发送命令，查询命令的响应放入输出缓冲等待读取"""
+        self._check_open()
+        self._delay()
+        with self._lock:
+            if self._output:
+                # 前一条查询的响应尚未读取即发送新命令
+                self._output.clear()
+                self.model.push_error(ERR_QUERY_INTERRUPTED)
+            response = self.model.execute(command)
+            if response is not None:
+                self._output.append(response)
+        return len(command) + len(self.write_termination)
+
+    def _read_response(self) -> Response:
+        self._check_open()
+        with self._lock:
+            if not self._output:
+                self.model.push_error(ERR_QUERY_UNTERMINATED)
+                raise VisaIOError(constants.StatusCode.error_timeout)
+            return self._output.popleft()
+
+    def read(self) -> str:
+        """读取响应文本"""
+        self._delay()
+        return format_response(self._read_response())
+
+    def query(self, command: str) -> str:
+        """发送查询并读取响应"""
+        self.write(command)
+        return self.read()
+
+    def query_binary_values(self, command: str, datatype: str = 'f', container=list,
+                            **kwargs) -> Any:
+        """发送查询并以二进制块方式读取数值数组"""
+        self.write(command)
+        self._delay()
+        response = self._read_response()
+        if isinstance(response, str):
+            values = [float(x) for x in response.split(',') if x]
+        else:
+            values = response
+        if container is np.ndarray:
+            return np.asarray(values, dtype=datatype)
+        if datatype in ('f', 'd') and isinstance(values, np.ndarray):
+            values = values.astype(np.float32 if datatype == 'f' else np.float64).tolist()
+        return container(values)
+
+    def clear(self):
+        """清除输出缓冲"""
+        with self._lock:
+            self._output.clear()
+
+    def close(self):
+        self._closed = True
+
+
+def create_model(driver_type: str, bench: Optional[SimulatedBench] = None,
+                 **kwargs) -> ScpiModel:
+    """
+    创建仪器模型
+
+    Args:
+        driver_type: 驱动类型（与仪器配置中的 driver 一致）
+        bench: 共享的仿真光路
+        **kwargs: 传给模型的参数（seed、parameters、operation_time、time_scale）
+
+    Returns:
+        ScpiModel: 仪器模型
+    """
+    model_class = MODEL_MAP.get(driver_type)
+    if model_class is None:
+        raise ValueError(f"没有对应的SCPI仿真模型: {driver_type}")
+    return model_class(bench, **kwargs)
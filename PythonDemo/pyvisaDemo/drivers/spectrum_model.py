@@ -0,0 +1,199 @@
+"""
+仿真光谱模型
+以不可变的谱线模型（单模激光、多峰、DWDM梳状谱）描述光谱，按扫描范围和分辨率
+向量化地生成轨迹，波长网格和无噪声光谱均缓存复用，噪声由每台仪器独立的
+numpy 随机数发生器产生，相同种子得到完全相同的轨迹序列
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# 光速(m/s)
+_C = 299792458.0
+# 高斯线型 FWHM 与标准差之比
+_FWHM_TO_SIGMA = 1 / 2.3548200450309493
+
+
+@lru_cache(maxsize=32)
+def wavelength_grid(start: float, stop: float, step: float) -> np.ndarray:
+    """
+    获取波长网格（按范围和采样间隔缓存，只读）
+
+    Args:
+        start: 起始波长(nm)
+        stop: 终止波长(nm)
+        step: 采样间隔(nm)
+
+    Returns:
+        np.ndarray: 波长数组(nm)
+    """
+    count = max(2, int(round((stop - start) / step)) + 1)
+    grid = np.linspace(start, stop, count)
+    grid.setflags(write=False)
+    return grid
+
+
+@dataclass(frozen=True)
+class SpectralLine:
+    """一条谱线"""
+    wavelength: float
+    power: float
+    linewidth: float = 0.08
+
+
+@dataclass(frozen=True)
+class SpectrumModel:
+    """光谱模型基类，子类实现 lines()"""
+
+    def lines(self) -> Tuple[SpectralLine, ...]:
+        """返回模型包含的全部谱线"""
+        raise NotImplementedError
+
+    def peak(self) -> SpectralLine:
+        """最强谱线"""
+        return max(self.lines(), key=lambda line: line.power)
+
+    @property
+    def smsr(self) -> float:
+        """边模抑制比(dB)，单峰时视为无穷大"""
+        powers = sorted((line.power for line in self.lines()), reverse=True)
+        return powers[0] - powers[1] if len(powers) > 1 else float('inf')
+
+
+@dataclass(frozen=True)
+class SingleModeLaser(SpectrumModel):
+    """单纵模激光器：主模两侧各有一个边模"""
+    wavelength: float = 1550.0
+    power: float = 0.0
+    linewidth: float = 0.08
+    side_mode_suppression: float = 45.0
+    mode_spacing: float = 0.8
+
+    def lines(self) -> Tuple[SpectralLine, ...]:
+        side = self.power - self.side_mode_suppression
+        return (
+            SpectralLine(self.wavelength, self.power, self.linewidth),
+            SpectralLine(self.wavelength - self.mode_spacing, side, self.linewidth),
+            SpectralLine(self.wavelength + self.mode_spacing, side - 1.0, self.linewidth),
+        )
+
+
+@dataclass(frozen=True)
+class MultiPeak(SpectrumModel):
+    """任意多峰光谱"""
+    peaks: Tuple[SpectralLine, ...] = field(default_factory=tuple)
+
+    def lines(self) -> Tuple[SpectralLine, ...]:
+        return self.peaks
+
+
+@dataclass(frozen=True)
+class DwdmComb(SpectrumModel):
+    """DWDM梳状谱：按ITU频率网格等间隔排列的信道"""
+    center: float = 1550.12
+    spacing_ghz: float = 100.0
+    channels: int = 40
+    power: float = -10.0
+    linewidth: float = 0.05
+    tilt: float = 0.0
+    ripple: float = 0.0
+
+    def lines(self) -> Tuple[SpectralLine, ...]:
+        f0 = _C / (self.center * 1e-9)
+        offsets = np.arange(self.channels) - (self.channels - 1) / 2
+        wavelengths = _C / (f0 + offsets * self.spacing_ghz * 1e9) * 1e9
+        # 倾斜按信道位置线性分布，纹波为周期性起伏
+        span = max(self.channels - 1, 1)
+        powers = (self.power + self.tilt * offsets / span +
+                  self.ripple * np.sin(2 * np.pi * offsets / 8))
+        return tuple(
+            SpectralLine(float(wl), float(p), self.linewidth)
+            for wl, p in sorted(zip(wavelengths, powers))
+        )
+
+
+@lru_cache(maxsize=32)
+def _clean_spectrum(model: SpectrumModel, start: float, stop: float, step: float,
+                    resolution: float) -> np.ndarray:
+    """计算无噪声的线性光谱(mW)，结果只读并缓存"""
+    grid = wavelength_grid(start, stop, step)
+    lines = model.lines()
+    linear = np.zeros_like(grid)
+    if lines:
+        centers = np.array([line.wavelength for line in lines])
+        peaks = 10 ** (np.array([line.power for line in lines]) / 10)
+        # 谱线宽度与仪器分辨率带宽合成
+        widths = np.hypot([line.linewidth for line in lines], resolution) * _FWHM_TO_SIGMA
+        # 只计算每条谱线 ±8σ 范围内的点
+        lo = np.searchsorted(grid, centers - 8 * widths)
+        hi = np.searchsorted(grid, centers + 8 * widths)
+        for center, peak, sigma, i, j in zip(centers, peaks, widths, lo, hi):
+            if i < j:
+                x = (grid[i:j] - center) / sigma
+                linear[i:j] += peak * np.exp(-0.5 * x * x)
+    linear.setflags(write=False)
+    return linear
+
+
+class SpectrumGenerator:
+    """光谱轨迹发生器"""
+
+    def __init__(self, model: Optional[SpectrumModel] = None, seed: Optional[int] = None,
+                 noise_floor: float = -60.0, noise_sigma: float = 0.2,
+                 sampling_step: float = 0.01):
+        """
+        初始化发生器
+
+        Args:
+            model: 光谱模型，默认为1550nm单模激光器
+            seed: 随机数种子
+            noise_floor: 噪声基底(dBm)
+            noise_sigma: 测量噪声标准差(dB)
+            sampling_step: 采样间隔(nm)
+        """
+        self.model = model or SingleModeLaser()
+        self.rng = np.random.default_rng(seed)
+        self.noise_floor = noise_floor
+        self.noise_sigma = noise_sigma
+        self.sampling_step = sampling_step
+
+    def trace(self, start: float, stop: float,
+              resolution: float = 0.02) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        生成一条扫描轨迹
+
+        Args:
+            start: 起始波长(nm)
+            stop: 终止波长(nm)
+            resolution: 分辨率带宽(nm)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (波长数组nm, 功率数组dBm)，波长数组为只读的共享网格
+        """
+        start, stop = float(start), float(stop)
+        step, resolution = float(self.sampling_step), float(resolution)
+        grid = wavelength_grid(start, stop, step)
+        linear = _clean_spectrum(self.model, start, stop, step, resolution)
+        powers = np.log10(linear + 10 ** (self.noise_floor / 10))
+        powers *= 10
+        powers += self.rng.normal(0.0, self.noise_sigma, grid.size)
+        return grid, powers
+
+    def peak(self) -> Tuple[float, float]:
+        """最强谱线的(波长nm, 功率dBm)"""
+        line = self.model.peak()
+        return line.wavelength, line.power
+
+    def measure_smsr(self, sigma: float = 0.5) -> float:
+        """带测量噪声的边模抑制比(dB)"""
+        smsr = self.model.smsr
+        if not np.isfinite(smsr):
+            smsr = self.model.peak().power - self.noise_floor
+        return float(smsr + self.rng.normal(0.0, sigma))
+
+    def measure_bandwidth(self, sigma: float = 0.005) -> float:
+        """带测量噪声的3dB带宽(nm)"""
+        return float(self.model.peak().linewidth + self.rng.normal(0.0, sigma))
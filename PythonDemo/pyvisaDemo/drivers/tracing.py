@@ -0,0 +1,322 @@
+"""
+耗时追踪
+以跨度(span)记录测试步骤、SCPI通信、等待和回调的起止时间，按线程维护嵌套关系，
+可汇总为各步骤的耗时分解，也可导出为 Chrome trace-event 或 OpenTelemetry 格式的JSON。
+线程上没有激活的追踪时所有记录接口直接返回，开销只有一次线程局部变量查找
+"""
+import itertools
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+# 跨度类别
+CATEGORY_FLOW = 'flow'
+CATEGORY_STEP = 'step'
+CATEGORY_SCPI = 'scpi'
+CATEGORY_SLEEP = 'sleep'
+CATEGORY_CALLBACK = 'callback'
+
+_local = threading.local()
+
+
+class Span:
+    """一个追踪跨度"""
+    __slots__ = ('span_id', 'parent_id', 'name', 'category', 'start', 'end',
+                 'thread_id', 'attributes')
+
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, category: str,
+                 start: float, thread_id: int, attributes: Dict):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = start
+        self.thread_id = thread_id
+        self.attributes = attributes
+
+    @property
+    def duration(self) -> float:
+        """持续时间(秒)"""
+        return self.end - self.start
+
+
+class _ActiveSpan:
+    """跨度的上下文管理器"""
+    __slots__ = ('trace', 'name', 'category', 'attributes', 'span', 'stack')
+
+    def __init__(self, trace: 'Trace', name: str, category: str, attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self.span = None
+        self.stack = None
+
+    def __enter__(self) -> Optional[Span]:
+        self.stack = self.trace._stack()
+        self.span = self.trace._open(self.name, self.category, self.attributes, self.stack)
+        return self.span
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None and self.span is not None:
+            self.span.attributes['error'] = exc_type.__name__
+        self.trace._close(self.span, self.stack)
+        return False
+
+
+class _NullSpan:
+    """未启用追踪时使用的空上下文"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """一次测试流程的追踪记录"""
+
+    def __init__(self, name: str = '', time_source: Optional[Callable[[], float]] = None,
+                 epoch: Optional[float] = None, max_spans: int = 100000):
+        """
+        初始化追踪记录
+
+        Args:
+            name: 追踪名称（通常为流程ID）
+            time_source: 单调时间源(秒)，默认为 time.perf_counter
+            epoch: time_source 当前读数对应的Unix时间戳，默认为当前时间
+            max_spans: 最多保留的跨度数，超出后只计数不记录
+        """
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._time = time_source or time.perf_counter
+        self._origin = self._time()
+        self.epoch = time.time() if epoch is None else epoch
+        self._ids = itertools.count(1)
+        self._stacks: Dict[int, List[Span]] = {}
+
+    def _stack(self) -> List[Span]:
+        """当前线程的跨度栈"""
+        thread_id = threading.get_ident()
+        stack = self._stacks.get(thread_id)
+        if stack is None:
+            stack = self._stacks[thread_id] = []
+        return stack
+
+    def _open(self, name: str, category: str, attributes: Dict,
+              stack: List[Span]) -> Optional[Span]:
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        span = Span(next(self._ids), stack[-1].span_id if stack else None, name, category,
+                    self._time() - self._origin, threading.get_ident(), attributes)
+        # list.append 是原子操作，多个线程可同时记录
+        self.spans.append(span)
+        stack.append(span)
+        return span
+
+    def _close(self, span: Optional[Span], stack: List[Span]):
+        if span is None:
+            return
+        span.end = self._time() - self._origin
+        if stack and stack[-1] is span:
+            stack.pop()
+
+    def span(self, name: str, category: str = CATEGORY_STEP, **attributes) -> _ActiveSpan:
+        """
+        创建一个跨度
+
+        用法:
+            with trace.span('扫描光谱', 'step', action='sweep'):
+                ...
+
+        Args:
+            name: 跨度名称
+            category: 跨度类别
+            **attributes: 附加标签
+
+        Returns:
+            上下文管理器，进入时返回 Span（超出容量时为None）
+        """
+        return _ActiveSpan(self, name, category, attributes)
+
+    def activate(self) -> '_Activation':
+        """
+        在当前线程上激活此追踪，驱动和时钟的记录都写入此追踪
+
+        用法:
+            with trace.activate():
+                run_steps()
+        """
+        return _Activation(self)
+
+    def summary(self) -> Dict:
+        """
+        汇总耗时分解
+
+        每个步骤的耗时分为仪器通信、等待、回调和其余的计算时间
+
+        Returns:
+            Dict: {'total': {类别: 秒}, 'steps': [{step_id, name, duration, scpi, sleep, callback, compute, commands}], ...}
+        """
+        by_id = {span.span_id: span for span in self.spans}
+        steps: Dict[int, Dict] = {}
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            if span.category == CATEGORY_STEP:
+                steps[span.span_id] = {
+                    'step_id': span.attributes.get('step_id'),
+                    'name': span.name, 'duration': span.duration,
+                    CATEGORY_SCPI: 0.0, CATEGORY_SLEEP: 0.0, CATEGORY_CALLBACK: 0.0,
+                    'commands': 0
+                }
+
+        for span in self.spans:
+            if span.category not in (CATEGORY_SCPI, CATEGORY_SLEEP, CATEGORY_CALLBACK):
+                continue
+            # 只统计最外层的一段，避免通信内部的等待或回调中的通信被重复计入
+            parent = by_id.get(span.parent_id)
+            if parent is not None and parent.category in (CATEGORY_SCPI, CATEGORY_SLEEP,
+                                                          CATEGORY_CALLBACK):
+                continue
+            totals[span.category] = totals.get(span.category, 0.0) + span.duration
+            while parent is not None and parent.category != CATEGORY_STEP:
+                parent = by_id.get(parent.parent_id)
+            if parent is not None:
+                entry = steps[parent.span_id]
+                entry[span.category] += span.duration
+                if span.category == CATEGORY_SCPI:
+                    entry['commands'] += 1
+
+        for entry in steps.values():
+            entry['compute'] = max(0.0, entry['duration'] - entry[CATEGORY_SCPI] -
+                                   entry[CATEGORY_SLEEP] - entry[CATEGORY_CALLBACK])
+
+        return {
+            'trace_id': self.trace_id,
+            'spans': len(self.spans),
+            'dropped': self.dropped,
+            'total': totals,
+            'steps': list(steps.values())
+        }
+
+    def to_chrome_trace(self) -> Dict:
+        """
+        导出为 Chrome trace-event 格式（可在 chrome://tracing 或 Perfetto 中打开）
+
+        Returns:
+            Dict: {'traceEvents': [...]}
+        """
+        pid = os.getpid()
+        events = [{
+            'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+            'args': {'name': self.name or 'test'}
+        }]
+        for span in self.spans:
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': span.start * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': span.attributes
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'trace_id': self.trace_id, 'dropped': self.dropped}}
+
+    def to_otel(self, service_name: str = 'pyvisaDemo') -> Dict:
+        """
+        导出为 OpenTelemetry (OTLP/JSON) 格式
+
+        Args:
+            service_name: 服务名称
+
+        Returns:
+            Dict: {'resourceSpans': [...]}
+        """
+        base = int(self.epoch * 1e9)
+
+        def attributes(values: Dict) -> List[Dict]:
+            result = []
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    result.append({'key': key, 'value': {'boolValue': value}})
+                elif isinstance(value, int):
+                    result.append({'key': key, 'value': {'intValue': str(value)}})
+                elif isinstance(value, float):
+                    result.append({'key': key, 'value': {'doubleValue': value}})
+                else:
+                    result.append({'key': key, 'value': {'stringValue': str(value)}})
+            return result
+
+        spans = []
+        for span in self.spans:
+            spans.append({
+                'traceId': self.trace_id,
+                'spanId': f"{span.span_id:016x}",
+                'parentSpanId': f"{span.parent_id:016x}" if span.parent_id else '',
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': str(base + int(span.start * 1e9)),
+                'endTimeUnixNano': str(base + int(span.end * 1e9)),
+                'attributes': attributes({'category': span.category,
+                                          'thread.id': span.thread_id, **span.attributes})
+            })
+        return {'resourceSpans': [{
+            'resource': {'attributes': attributes({'service.name': service_name})},
+            'scopeSpans': [{'scope': {'name': 'pyvisaDemo.tracing'}, 'spans': spans}]
+        }]}
+
+
+class _Activation:
+    """追踪激活的上下文管理器"""
+    __slots__ = ('trace', 'previous')
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self.previous = None
+
+    def __enter__(self) -> Trace:
+        self.previous = getattr(_local, 'trace', None)
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.trace = self.previous
+        return False
+
+
+def current_trace() -> Optional[Trace]:
+    """获取当前线程激活的追踪，未激活时为None"""
+    return getattr(_local, 'trace', None)
+
+
+def span(name: str, category: str, **attributes):
+    """
+    在当前线程激活的追踪中创建跨度，未激活时返回空上下文
+
+    Args:
+        name: 跨度名称
+        category: 跨度类别
+        **attributes: 附加标签
+
+    Returns:
+        上下文管理器
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NULL_SPAN
+    return _ActiveSpan(trace, name, category, attributes)
@@ -0,0 +1,391 @@
+"""
+SCPI通信录制器
+以紧凑的二进制格式记录仪器的每一次写入、读取、查询和二进制块传输，
+数据写入内存映射的环形缓冲文件，开销极低，可用于离线回放和性能分析
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Union, Dict
+
+
+# 事件类型
+EVENT_WRITE = 1
+EVENT_READ = 2
+EVENT_QUERY = 3
+EVENT_BINARY = 4
+EVENT_ERROR = 5
+
+EVENT_NAMES = {
+    EVENT_WRITE: 'write',
+    EVENT_READ: 'read',
+    EVENT_QUERY: 'query',
+    EVENT_BINARY: 'binary',
+    EVENT_ERROR: 'error',
+}
+
+# 环形缓冲回绕标记
+_WRAP = 0xFF
+
+_MAGIC = b'SCPIREC\x00'
+_VERSION = 1
+
+# 文件头: magic, version, header_size, capacity, head, tail, count, dropped, epoch_wall_ns, epoch_perf_ns
+_HEADER = struct.Struct('<8sHHIQQQQqq')
+_LABEL_OFFSET = _HEADER.size
+_LABEL_SIZE = 64
+HEADER_SIZE = 128
+
+# 记录头: kind, datatype, command_len, payload_len, start_ns, duration_ns
+_RECORD = struct.Struct('<BcHIqq')
+
+DEFAULT_CAPACITY = 8 * 1024 * 1024
+
+Payload = Union[None, str, bytes, List[float]]
+
+
+@dataclass
+class TrafficEvent:
+    """一条通信记录"""
+    kind: int
+    command: str
+    payload: Payload
+    timestamp_ns: int
+    duration_ns: int
+
+    @property
+    def kind_name(self) -> str:
+        """事件类型名称"""
+        return EVENT_NAMES.get(self.kind, 'unknown')
+
+
+class TrafficRecorder:
+    """基于内存映射环形缓冲的SCPI通信录制器"""
+
+    def __init__(self, path: Union[str, Path], capacity: int = DEFAULT_CAPACITY,
+                 label: str = ""):
+        """
+        打开（或创建）录制文件
+
+        Args:
+            path: 录制文件路径，已存在且格式匹配时继续追加
+            capacity: 环形缓冲容量(字节)
+            label: 文件标签，一般为VISA资源字符串
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.label = label
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a+b')
+        self._open(capacity, label)
+
+    def _open(self, capacity: int, label: str):
+        """映射文件，并在格式不匹配时重新初始化"""
+        size = HEADER_SIZE + capacity
+        existing = os.fstat(self._file.fileno()).st_size
+        if existing != size:
+            self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+
+        magic, version, _, old_capacity, head, tail, count, dropped, epoch_wall, epoch_perf = \
+            _HEADER.unpack_from(self._mm, 0)
+        if existing == size and magic == _MAGIC and version == _VERSION and old_capacity == capacity:
+            # 续写已有录制，时间基准沿用文件中的记录
+            self._epoch_wall_ns = epoch_wall
+            self._epoch_perf_ns = time.perf_counter_ns() - (time.time_ns() - epoch_wall)
+        else:
+            head = tail = count = dropped = 0
+            self._epoch_wall_ns = time.time_ns()
+            self._epoch_perf_ns = time.perf_counter_ns()
+            encoded = label.encode('utf-8')[:_LABEL_SIZE]
+            self._mm[_LABEL_OFFSET:_LABEL_OFFSET + _LABEL_SIZE] = encoded.ljust(_LABEL_SIZE, b'\x00')
+
+        self.capacity = capacity
+        self._head = head
+        self._tail = tail
+        self._count = count
+        self._dropped = dropped
+        self._write_header()
+
+    def _write_header(self):
+        _HEADER.pack_into(
+            self._mm, 0, _MAGIC, _VERSION, HEADER_SIZE, self.capacity,
+            self._head, self._tail, self._count, self._dropped,
+            self._epoch_wall_ns, self._epoch_perf_ns
+        )
+
+    # ========== 环形缓冲操作 ==========
+
+    def _normalize(self, pos: int) -> int:
+        """跳过缓冲区尾部的回绕区域"""
+        if pos + _RECORD.size > self.capacity or self._mm[HEADER_SIZE + pos] == _WRAP:
+            return 0
+        return pos
+
+    def _evict(self):
+        """丢弃最旧的一条记录"""
+        _, _, cmd_len, payload_len, _, _ = _RECORD.unpack_from(self._mm, HEADER_SIZE + self._tail)
+        self._count -= 1
+        self._tail += _RECORD.size + cmd_len + payload_len
+        if self._count:
+            # 读指针始终指向有效记录，越过回绕标记时立即归零
+            self._tail = self._normalize(self._tail)
+
+    def _reserve(self, size: int) -> int:
+        """为新记录腾出空间并返回写入位置"""
+        if self._head + size > self.capacity:
+            # 回绕: 位于写指针之后的记录最旧，全部淘汰
+            while self._count and self._tail >= self._head:
+                self._evict()
+            if self._head + _RECORD.size <= self.capacity:
+                self._mm[HEADER_SIZE + self._head] = _WRAP
+            self._head = 0
+        while self._count and self._head <= self._tail < self._head + size:
+            self._evict()
+        if self._count == 0:
+            self._tail = self._head
+        return self._head
+
+    # ========== 录制接口 ==========
+
+    def record(self, kind: int, command: str, payload: Payload = None,
+               start_ns: int = 0, duration_ns: int = 0, datatype: str = 'f'):
+        """
+        记录一条通信事件
+
+        Args:
+            kind: 事件类型(EVENT_*)
+            command: SCPI命令
+            payload: 响应内容（文本、字节或浮点数列表）
+            start_ns: 开始时间(time.perf_counter_ns)
+            duration_ns: 耗时(纳秒)
+            datatype: 二进制块的数据类型字符
+        """
+        cmd = command.encode('utf-8')
+        if payload is None:
+            data = b''
+            type_code = b'\x00'
+        elif isinstance(payload, str):
+            data = payload.encode('utf-8')
+            type_code = b'\x00'
+        elif isinstance(payload, (bytes, bytearray)):
+            data = bytes(payload)
+            type_code = b'b'
+        else:
+            data = array(datatype, payload).tobytes()
+            type_code = datatype.encode('ascii')
+
+        size = _RECORD.size + len(cmd) + len(data)
+        with self._lock:
+            if size > self.capacity // 2:
+                self._dropped += 1
+                self._write_header()
+                return
+            pos = HEADER_SIZE + self._reserve(size)
+            _RECORD.pack_into(self._mm, pos, kind, type_code, len(cmd), len(data),
+                              start_ns - self._epoch_perf_ns, duration_ns)
+            pos += _RECORD.size
+            self._mm[pos:pos + len(cmd)] = cmd
+            pos += len(cmd)
+            self._mm[pos:pos + len(data)] = data
+            self._head += size
+            self._count += 1
+            self._write_header()
+
+    @property
+    def event_count(self) -> int:
+        """缓冲区中的记录条数"""
+        return self._count
+
+    @property
+    def dropped_count(self) -> int:
+        """因超出容量被丢弃的记录条数"""
+        return self._dropped
+
+    def flush(self):
+        """将缓冲区刷新到磁盘"""
+        with self._lock:
+            if not self._mm.closed:
+                self._mm.flush()
+
+    @property
+    def closed(self) -> bool:
+        """录制文件是否已关闭"""
+        return self._file.closed
+
+    def reopen(self) -> 'TrafficRecorder':
+        """
+        以相同的文件、容量和标签新建录制器（续写已有录制）
+
+        Returns:
+            TrafficRecorder: 新的录制器
+        """
+        return TrafficRecorder(self.path, self.capacity, self.label)
+
+    def close(self):
+        """关闭录制文件"""
+        with self._lock:
+            if not self._mm.closed:
+                self._mm.flush()
+                self._mm.close()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class TrafficReader:
+    """录制文件读取器"""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        读取录制文件
+
+        Args:
+            path: 录制文件路径
+        """
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._data = f.read()
+
+        magic, version, header_size, capacity, head, tail, count, dropped, epoch_wall, _ = \
+            _HEADER.unpack_from(self._data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"不是有效的录制文件: {self.path}")
+
+        self.capacity = capacity
+        self.event_count = count
+        self.dropped_count = dropped
+        self.epoch_wall_ns = epoch_wall
+        self.label = self._data[_LABEL_OFFSET:_LABEL_OFFSET + _LABEL_SIZE].rstrip(b'\x00').decode('utf-8')
+        self._header_size = header_size
+        self._tail = tail
+
+    def _normalize(self, pos: int) -> int:
+        if pos + _RECORD.size > self.capacity or self._data[self._header_size + pos] == _WRAP:
+            return 0
+        return pos
+
+    def __iter__(self) -> Iterator[TrafficEvent]:
+        return self.events()
+
+    def __len__(self) -> int:
+        return self.event_count
+
+    def events(self) -> Iterator[TrafficEvent]:
+        """
+        按时间顺序遍历所有记录
+
+        Yields:
+            TrafficEvent: 通信记录
+        """
+        data = self._data
+        pos = self._tail
+        for _ in range(self.event_count):
+            pos = self._normalize(pos)
+            offset = self._header_size + pos
+            kind, type_code, cmd_len, payload_len, start_ns, duration_ns = \
+                _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            command = data[offset:offset + cmd_len].decode('utf-8')
+            offset += cmd_len
+            raw = data[offset:offset + payload_len]
+
+            if type_code == b'\x00':
+                payload = raw.decode('utf-8') if kind != EVENT_WRITE else None
+            elif type_code == b'b':
+                payload = raw
+            else:
+                payload = array(type_code.decode('ascii'), raw).tolist()
+
+            yield TrafficEvent(
+                kind=kind,
+                command=command,
+                payload=payload,
+                timestamp_ns=self.epoch_wall_ns + start_ns,
+                duration_ns=duration_ns
+            )
+            pos += _RECORD.size + cmd_len + payload_len
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        按命令汇总通信耗时
+
+        Returns:
+            Dict[str, Dict]: {命令: {'count', 'total_s', 'max_s'}}
+        """
+        stats: Dict[str, Dict] = {}
+        for event in self.events():
+            entry = stats.setdefault(event.command, {'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            seconds = event.duration_ns / 1e9
+            entry['count'] += 1
+            entry['total_s'] += seconds
+            entry['max_s'] = max(entry['max_s'], seconds)
+        return stats
+
+
+class ReplayResource:
+    """以录制文件模拟pyvisa资源，按顺序返回录制的响应"""
+
+    def __init__(self, reader: TrafficReader, strict: bool = True):
+        """
+        初始化回放资源
+
+        Args:
+            reader: 录制文件读取器
+            strict: 严格模式下命令必须与录制完全一致，否则向后查找匹配的记录
+        """
+        self._events = list(reader.events())
+        self._position = 0
+        self.strict = strict
+        self.timeout = 0
+        self.resource_name = reader.label
+
+    def _next(self, kind: int, command: Optional[str]) -> TrafficEvent:
+        """取出下一条与请求匹配的记录"""
+        while self._position < len(self._events):
+            event = self._events[self._position]
+            self._position += 1
+            matched = (event.kind in (kind, EVENT_ERROR) and
+                       (command is None or event.command == command))
+            if matched:
+                if event.kind == EVENT_ERROR:
+                    raise RuntimeError(f"回放录制的错误: {event.command}: {event.payload}")
+                return event
+            if self.strict:
+                raise RuntimeError(
+                    f"回放不匹配: 期望 {EVENT_NAMES.get(kind)} {command!r}, "
+                    f"录制为 {event.kind_name} {event.command!r}"
+                )
+        raise RuntimeError(f"录制已回放完毕: {EVENT_NAMES.get(kind)} {command!r}")
+
+    @property
+    def remaining(self) -> int:
+        """尚未回放的记录条数"""
+        return len(self._events) - self._position
+
+    def write(self, command: str) -> int:
+        self._next(EVENT_WRITE, command)
+        return len(command)
+
+    def read(self) -> str:
+        return self._next(EVENT_READ, None).payload
+
+    def query(self, command: str) -> str:
+        return self._next(EVENT_QUERY, command).payload
+
+    def query_binary_values(self, command: str, datatype: str = 'f',
+                            container=list, **kwargs):
+        return container(self._next(EVENT_BINARY, command).payload)
+
+    def close(self):
+        self._position = len(self._events)
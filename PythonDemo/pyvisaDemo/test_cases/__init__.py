@@ -5,10 +5,12 @@ from .base_test import BaseTest
 from .insertion_loss_test import InsertionLossTest
 from .return_loss_test import ReturnLossTest
 from .spectrum_test import SpectrumTest
+from .fixture_insertion_loss_test import FixtureInsertionLossTest
 
 __all__ = [
     'BaseTest',
     'InsertionLossTest',
     'ReturnLossTest',
-    'SpectrumTest'
+    'SpectrumTest',
+    'FixtureInsertionLossTest'
 ]
@@ -0,0 +1,168 @@
+"""
+自适应平均
+按需增加读数次数：每读一批后计算均值的置信区间，
+- 置信区间整体落在限值(扣除保护带)以内 → 判定通过，停止
+- 置信区间整体落在限值以外 → 判定失败，停止
+- 置信区间半宽达到目标精度 → 停止（临界被测件由此得到更多读数）
+- 达到最大读数次数 → 停止
+远离限值的被测件只需少量读数，临界的被测件读数更多
+
+每批读数后都重新检查置信区间，多次检查会使误判概率累积超过 1-confidence，
+因此每次检查的置信水平按最多检查次数做 Bonferroni 校正；
+标准差不低于读数分辨率的量化噪声，避免几个相同的量化读数得到零宽置信区间而立即停止
+"""
+import math
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Callable, Dict, List, Optional
+
+from drivers.clock import get_clock
+
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Student t 分布的分位数
+
+    df 为1、2时使用解析式，更大时使用 Cornish-Fisher 展开（df>=3 时误差小于0.1%）
+
+    Args:
+        p: 概率 (0.5, 1)
+        df: 自由度
+
+    Returns:
+        float: 分位数
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) * math.sqrt(2 / (4 * p * (1 - p)))
+    z = NormalDist().inv_cdf(p)
+    z2 = z * z
+    return (z
+            + z * (z2 + 1) / (4 * df)
+            + z * ((5 * z2 + 16) * z2 + 3) / (96 * df ** 2)
+            + z * (((3 * z2 + 19) * z2 + 17) * z2 - 15) / (384 * df ** 3)
+            + z * ((((79 * z2 + 776) * z2 + 1482) * z2 - 1920) * z2 - 945) / (92160 * df ** 4))
+
+
+@dataclass(slots=True)
+class AveragingResult:
+    """平均结果"""
+    # 换算后数值（如插损）的均值、标准差和置信区间半宽
+    mean: float
+    std: float
+    half_width: float
+    count: int
+    # 停止原因: pass / fail / precision / max_samples / fixed
+    reason: str
+    # 原始读数
+    readings: List[float] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {'mean': self.mean, 'std': self.std, 'half_width': self.half_width,
+                'count': self.count, 'reason': self.reason}
+
+
+class AdaptiveAverager:
+    """自适应平均器"""
+
+    def __init__(self, min_samples: int = 3, max_samples: int = 10, confidence: float = 0.95,
+                 ci_target: float = 0.01, guard_band: float = 0.0, batch_size: int = 1,
+                 interval: float = 0.0, resolution: float = 0.0):
+        """
+        初始化自适应平均器
+
+        Args:
+            min_samples: 最少读数次数（不少于3）
+            max_samples: 最多读数次数
+            confidence: 整个序贯判定的双侧置信水平（各次检查按检查次数校正）
+            ci_target: 目标置信区间半宽（与换算后数值同单位）
+            guard_band: 判定通过时在限值内侧保留的保护带
+            batch_size: 达到最少次数后每批追加的读数次数
+            interval: 两批读数之间的等待时间(秒)
+            resolution: 读数分辨率（与换算后数值同单位），标准差不低于其量化噪声 resolution/√12
+        """
+        self.min_samples = max(3, int(min_samples))
+        self.max_samples = max(self.min_samples, int(max_samples))
+        self.confidence = confidence
+        self.ci_target = ci_target
+        self.guard_band = guard_band
+        self.batch_size = max(1, int(batch_size))
+        self.interval = interval
+        self.resolution = resolution
+        # 最多检查次数：最少读数后一次，之后每批一次
+        self.looks = 1 + math.ceil((self.max_samples - self.min_samples) / self.batch_size)
+        self._p = 1 - (1 - confidence) / (2 * self.looks)
+        self._std_floor = resolution / math.sqrt(12)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> Optional['AdaptiveAverager']:
+        """
+        按测试参数中的 adaptive_averaging 配置创建，未启用时返回None
+
+        Args:
+            config: {enabled, min_samples, max_samples, confidence, ci_target, guard_band, ...}
+
+        Returns:
+            Optional[AdaptiveAverager]: 自适应平均器
+        """
+        if not config or not config.get('enabled', True):
+            return None
+        keys = ('min_samples', 'max_samples', 'confidence', 'ci_target', 'guard_band',
+                'batch_size', 'interval', 'resolution')
+        return cls(**{k: config[k] for k in keys if k in config})
+
+    def measure(self, read: Callable[[int], List[float]], lower: Optional[float] = None,
+                upper: Optional[float] = None,
+                transform: Optional[Callable[[float], float]] = None) -> AveragingResult:
+        """
+        读数直到可以停止
+
+        Args:
+            read: 读数函数，参数为本批次数，返回读数列表（如 power_meter.measure_multiple）
+            lower: 下限（换算后数值），None 表示无下限
+            upper: 上限（换算后数值），None 表示无上限
+            transform: 读数到被判定数值的换算（如 功率 → 插损），默认不换算
+
+        Returns:
+            AveragingResult: 平均结果
+        """
+        readings: List[float] = []
+        count, mean, m2 = 0, 0.0, 0.0
+        batch = self.min_samples
+        while True:
+            values = read(batch)
+            readings.extend(values)
+            for reading in values:
+                value = transform(reading) if transform else reading
+                count += 1
+                delta = value - mean
+                mean += delta / count
+                m2 += delta * (value - mean)
+
+            std = math.sqrt(m2 / (count - 1)) if count > 1 else 0.0
+            half_width = t_quantile(self._p, count - 1) * max(std, self._std_floor) / math.sqrt(count)
+            reason = self._decide(mean, half_width, lower, upper)
+            if reason is None and half_width <= self.ci_target:
+                reason = 'precision'
+            if reason is None and count >= self.max_samples:
+                reason = 'max_samples'
+            if reason is not None:
+                return AveragingResult(mean, std, half_width, count, reason, readings)
+
+            batch = min(self.batch_size, self.max_samples - count)
+            if self.interval > 0:
+                get_clock().sleep(self.interval)
+
+    def _decide(self, mean: float, half_width: float, lower: Optional[float],
+                upper: Optional[float]) -> Optional[str]:
+        """按置信区间做序贯判定，无法判定时返回None"""
+        if lower is None and upper is None:
+            return None
+        low, high = mean - half_width, mean + half_width
+        if (upper is not None and low > upper) or (lower is not None and high < lower):
+            return 'fail'
+        if ((upper is None or high <= upper - self.guard_band) and
+                (lower is None or low >= lower + self.guard_band)):
+            return 'pass'
+        return None
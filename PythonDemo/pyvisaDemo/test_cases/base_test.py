@@ -3,16 +3,24 @@
 所有测试用例的基础类
 """
 import logging
+import math
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
 import numpy as np
 
+from drivers.clock import get_clock
+from core.limit_engine import CompiledLimits, parse_flow_criteria
+from core.result_model import MeasurementLog
+
+from .adaptive_averaging import AdaptiveAverager, AveragingResult, t_quantile
+
 
 class BaseTest(ABC):
     """测试基类"""
     
-    def __init__(self, config: Dict, instruments: Dict, result):
+    def __init__(self, config: Dict, instruments: Dict, result,
+                 limits: Optional[CompiledLimits] = None,
+                 dut_limits: Optional[Sequence[CompiledLimits]] = None):
         """
         初始化测试
         
@@ -20,6 +28,8 @@ class BaseTest(ABC):
             config: 测试流程配置
             instruments: 仪器实例字典
             result: TestResult对象
+            limits: 限值引擎按流程开始时的配置快照编译的限值，默认只使用流程通过标准
+            dut_limits: 夹具模式下各被测件的限值，默认与 limits 相同
         """
         self.config = config
         self.instruments = instruments
@@ -28,9 +38,24 @@ class BaseTest(ABC):
         self.pass_criteria = config.get('pass_criteria', {})
         self.logger = logging.getLogger(self.__class__.__name__)
         
-        # 测试数据存储
-        self.measurements: Dict[str, Any] = {}
+        # 测试数据存储（数值写入 result.measurements，这里只另存单位和时间戳）
+        self.measurements = MeasurementLog(result.measurements)
         self.reference_values: Dict[str, float] = {}
+        
+        # 夹具模式下的被测件列表及各自的结果
+        self.duts: List[Dict] = result.product_info.get('duts') or []
+        self.dut_results: List = getattr(result, 'dut_results', [])
+        
+        # 限值（与引擎最终判定使用同一套规则）
+        self.limits = limits if limits is not None else CompiledLimits(
+            parse_flow_criteria(self.pass_criteria))
+        self.dut_limits: List[CompiledLimits] = list(dut_limits or [])
+        
+        # 超出限值的测量项 {name, value, min, max, violation}，供引擎提前中止判断
+        self.limit_failures: List[Dict] = []
+        
+        # 自适应平均（测试参数 adaptive_averaging），未配置时按固定次数读数
+        self.averager = AdaptiveAverager.from_config(self.parameters.get('adaptive_averaging'))
     
     def initialize_instruments(self) -> bool:
         """
@@ -58,6 +83,22 @@ class BaseTest(ABC):
         """获取仪器实例"""
         return self.instruments.get(instrument_id)
     
+    def limits_for(self, name: str, dut_index: Optional[int] = None) -> Tuple[Optional[float], Optional[float]]:
+        """
+        测量项的有效限值（产品/型号限值优先于流程通过标准）
+        
+        Args:
+            name: 测量项名称
+            dut_index: 夹具模式下被测件的序号
+            
+        Returns:
+            Tuple[Optional[float], Optional[float]]: (下限, 上限)，无限值时为None
+        """
+        limits = self.limits
+        if dut_index is not None and dut_index < len(self.dut_limits):
+            limits = self.dut_limits[dut_index]
+        return limits.limits_for(name)
+    
     def add_measurement(self, name: str, value: Any, unit: str = ""):
         """
         添加测量结果
@@ -67,16 +108,48 @@ class BaseTest(ABC):
             value: 测量值
             unit: 单位
         """
-        self.measurements[name] = {
-            'value': value,
-            'unit': unit,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.result.measurements[name] = value
+        self.measurements.record(name, value, unit, get_clock().now())
         self.logger.info(f"测量: {name} = {value} {unit}")
     
+    def add_dut_measurement(self, dut_index: int, name: str, value: Any, unit: str = ""):
+        """
+        添加夹具中某个被测件的测量结果
+        
+        Args:
+            dut_index: 被测件在夹具中的序号
+            name: 测量项名称
+            value: 测量值
+            unit: 单位
+        """
+        self.dut_results[dut_index].measurements[name] = value
+        serial = self.duts[dut_index].get('serial_number', dut_index)
+        self.logger.info(f"测量[{serial}]: {name} = {value} {unit}")
+    
+    def check_dut_limit(self, dut_index: int, name: str, value: float,
+                        min_val: float = None, max_val: float = None,
+                        averaged: Optional[AveragingResult] = None) -> bool:
+        """
+        检查夹具中某个被测件的测量值，并记入该被测件的判定结果
+        
+        Args:
+            dut_index: 被测件在夹具中的序号
+            name: 测量项名称
+            value: 测量值
+            min_val: 最小限值
+            max_val: 最大限值
+            averaged: 得到该测量值的平均结果
+            
+        Returns:
+            bool: 是否在限值范围内
+        """
+        serial = self.duts[dut_index].get('serial_number', dut_index)
+        passed = self.check_limit(f"{serial}/{name}", value, min_val, max_val, averaged)
+        self.dut_results[dut_index].passed_criteria[name] = passed
+        return passed
+    
     def check_limit(self, name: str, value: float, 
-                   min_val: float = None, max_val: float = None) -> bool:
+                   min_val: float = None, max_val: float = None,
+                   averaged: Optional[AveragingResult] = None) -> bool:
         """
         检查测量值是否在限值范围内
         
@@ -85,6 +158,7 @@ class BaseTest(ABC):
             value: 测量值
             min_val: 最小限值
             max_val: 最大限值
+            averaged: 得到该测量值的平均结果，其停止原因随超限记录一起供提前中止判断
             
         Returns:
             bool: 是否在限值范围内
@@ -101,9 +175,49 @@ class BaseTest(ABC):
         
         if passed:
             self.logger.info(f"{name}: {value} 在限值范围内")
+        else:
+            violation = max(
+                value - max_val if max_val is not None else 0.0,
+                min_val - value if min_val is not None else 0.0
+            )
+            self.limit_failures.append({'name': name, 'value': value, 'min': min_val,
+                                        'max': max_val, 'violation': violation,
+                                        'stop_reason': averaged.reason if averaged else None})
         
         return passed
     
+    def average_readings(self, read: Callable[[int], List[float]], count: int,
+                         lower: Optional[float] = None, upper: Optional[float] = None,
+                         transform: Optional[Callable[[float], float]] = None) -> AveragingResult:
+        """
+        多次读数取平均，启用自适应平均时读数次数由置信区间和限值决定
+        
+        Args:
+            read: 读数函数，参数为读数次数（如 power_meter.measure_multiple）
+            count: 未启用自适应平均时的固定读数次数
+            lower: 被判定数值的下限
+            upper: 被判定数值的上限
+            transform: 读数到被判定数值的换算（如 功率 → 插损）
+            
+        Returns:
+            AveragingResult: 平均结果
+        """
+        # 无穷大的限值等同于没有限值
+        if lower is not None and math.isinf(lower):
+            lower = None
+        if upper is not None and math.isinf(upper):
+            upper = None
+        if self.averager is not None:
+            return self.averager.measure(read, lower, upper, transform)
+        
+        readings = read(count)
+        values = np.array([transform(r) for r in readings] if transform else readings, dtype=float)
+        std = float(np.std(values, ddof=1)) if len(values) > 1 else 0.0
+        half_width = (t_quantile(0.975, len(values) - 1) * std / math.sqrt(len(values))
+                      if len(values) > 1 else 0.0)
+        return AveragingResult(float(np.mean(values)), std, half_width, len(values), 'fixed',
+                               list(readings))
+    
     def calculate_statistics(self, values: list) -> Dict:
         """
         计算统计数据
@@ -138,13 +252,12 @@ class BaseTest(ABC):
         Returns:
             float: 稳定后的测量值
         """
-        import time
-        
-        start_time = time.time()
+        clock = get_clock()
+        start_time = clock.monotonic()
         prev_value = measure_func()
         
-        while time.time() - start_time < timeout:
-            time.sleep(interval)
+        while clock.monotonic() - start_time < timeout:
+            clock.sleep(interval)
             current_value = measure_func()
             
             if abs(current_value - prev_value) < threshold:
@@ -0,0 +1,154 @@
+"""
+夹具插入损耗测试
+一个夹具通过光开关连接多个被测件，每个波长只调谐一次激光器，
+在该波长下测量参考功率后依次切换光开关扫描所有被测件，再进入下一个波长。
+激光器调谐次数由 被测件数×波长数 降为 波长数，每个被测件仍得到独立的测试结果
+"""
+from typing import Dict, List
+import numpy as np
+
+from drivers.clock import get_clock
+
+from .insertion_loss_test import InsertionLossTest
+
+
+class FixtureInsertionLossTest(InsertionLossTest):
+    """夹具插入损耗测试"""
+
+    def __init__(self, config: Dict, instruments: Dict, result, **kwargs):
+        super().__init__(config, instruments, result, **kwargs)
+
+        self.switch = self.get_instrument('optical_switch')
+
+        # 参考通道：直通光路所在的开关通道。不配置时参考功率会在上一个被测件的光路上测得，
+        # 各被测件的插损变成相对另一个被测件的值，因此必须配置
+        self.reference_channel = self.parameters.get('reference_channel')
+        self.switch_settling_time = self.parameters.get('switch_settling_time', 0.1)
+        if self.reference_channel is None:
+            raise ValueError("夹具测试需要配置 reference_channel（直通参考光路所在的开关通道）")
+
+        # 每个被测件的测试数据 {序号: {波长: 插损}}
+        self.dut_losses: Dict[int, Dict[float, float]] = {i: {} for i in range(len(self.duts))}
+        self.laser_retunes = 0
+
+        if not self.duts:
+            raise ValueError("夹具测试需要在 product_info['duts'] 中指定被测件")
+        for index, dut in enumerate(self.duts):
+            if dut.get('channel', index + 1) == self.reference_channel:
+                raise ValueError(f"被测件 {dut.get('serial_number', index)} 占用了参考通道 {self.reference_channel}")
+
+    def _tune(self, wavelength: float):
+        """将激光器和功率计调到指定波长"""
+        self.laser.set_wavelength(wavelength)
+        self.laser.set_power(self.input_power)
+        self.laser.output_on()
+        self.power_meter.set_wavelength(wavelength)
+        self.laser_retunes += 1
+        get_clock().sleep(self.settling_time)
+
+    def _measure_reference(self, wavelength: float) -> float:
+        """在已调好的波长下测量参考功率"""
+        self.switch.switch_channel(self.reference_channel)
+        get_clock().sleep(self.switch_settling_time)
+        powers = self.power_meter.measure_multiple(count=self.measurement_count)
+        ref_power = float(np.mean(powers))
+        self.reference_powers[wavelength] = ref_power
+        self.reference_values[f'reference_{wavelength}nm'] = ref_power
+        self.logger.info(f"参考功率 @ {wavelength} nm: {ref_power:.3f} dBm")
+        return ref_power
+
+    def measure_fixture_wavelength(self, wavelength: float) -> Dict:
+        """
+        在一个波长下测量夹具中的所有被测件
+
+        Args:
+            wavelength: 波长(nm)
+
+        Returns:
+            Dict: 该波长下各被测件的测量结果
+        """
+        self.logger.info(f"夹具测量 @ {wavelength} nm，被测件数: {len(self.duts)}")
+        self._tune(wavelength)
+        ref_power = self._measure_reference(wavelength)
+
+        duts = []
+        for index, dut in enumerate(self.duts):
+            min_il, max_il = self.limits_for(f'IL_{wavelength}nm', index)
+            self.switch.switch_channel(dut.get('channel', index + 1))
+            get_clock().sleep(self.switch_settling_time)
+
+            averaged = self.average_readings(
+                lambda count: self.power_meter.measure_multiple(count=count),
+                self.measurement_count, lower=min_il, upper=max_il, transform=lambda p: ref_power - p
+            )
+            powers = averaged.readings
+            output_power = float(np.mean(powers))
+            insertion_loss = ref_power - output_power
+            self.dut_losses[index][wavelength] = insertion_loss
+
+            self.add_dut_measurement(index, f'IL_{wavelength}nm', insertion_loss, 'dB')
+            self.add_dut_measurement(index, f'output_power_{wavelength}nm', output_power, 'dBm')
+            passed = self.check_dut_limit(index, f'IL_{wavelength}nm', insertion_loss, min_il, max_il,
+                                          averaged)
+
+            duts.append({
+                'serial_number': dut.get('serial_number'),
+                'output_power': output_power,
+                'insertion_loss': insertion_loss,
+                'std_dev': float(np.std(powers)),
+                'samples': averaged.count,
+                'passed': passed
+            })
+
+        return {'wavelength': wavelength, 'reference_power': ref_power, 'duts': duts}
+
+    def evaluate_uniformity(self) -> List[Dict]:
+        """
+        计算每个被测件在各波长间的插损均匀性
+
+        Returns:
+            List[Dict]: 各被测件的均匀性结果
+        """
+        results = []
+        for index, losses in self.dut_losses.items():
+            if len(losses) < 2:
+                continue
+            uniformity = max(losses.values()) - min(losses.values())
+            self.add_dut_measurement(index, 'uniformity', uniformity, 'dB')
+            passed = self.check_dut_limit(index, 'uniformity', uniformity,
+                                          *self.limits_for('uniformity', index))
+            results.append({
+                'serial_number': self.duts[index].get('serial_number'),
+                'uniformity': uniformity,
+                'passed': passed
+            })
+        return results
+
+    def generate_report(self) -> Dict:
+        """
+        生成夹具测试报告数据
+
+        Returns:
+            Dict: 报告数据
+        """
+        return {
+            'test_name': '夹具插入损耗测试',
+            'test_class': self.__class__.__name__,
+            'parameters': {
+                'wavelengths': self.wavelengths,
+                'input_power': self.input_power,
+                'measurement_count': self.measurement_count,
+                'reference_channel': self.reference_channel
+            },
+            'laser_retunes': self.laser_retunes,
+            'reference_powers': self.reference_powers,
+            'duts': [
+                {
+                    'serial_number': dut.get('serial_number'),
+                    'channel': dut.get('channel', index + 1),
+                    'insertion_losses': self.dut_losses[index],
+                    'passed': all(self.dut_results[index].passed_criteria.values())
+                }
+                for index, dut in enumerate(self.duts)
+            ]
+        }
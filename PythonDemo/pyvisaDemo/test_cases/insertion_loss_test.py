@@ -2,18 +2,20 @@
 插入损耗测试
 测量光器件的插入损耗
 """
-import time
 from typing import Dict, List, Any, Optional
 import numpy as np
 
+from drivers.clock import get_clock
+
 from .base_test import BaseTest
+from .reference_model import ReferenceModel
 
 
 class InsertionLossTest(BaseTest):
     """插入损耗测试"""
     
-    def __init__(self, config: Dict, instruments: Dict, result):
-        super().__init__(config, instruments, result)
+    def __init__(self, config: Dict, instruments: Dict, result, **kwargs):
+        super().__init__(config, instruments, result, **kwargs)
         
         # 获取仪器
         self.laser = self.get_instrument('laser_source')
@@ -24,6 +26,9 @@ class InsertionLossTest(BaseTest):
         self.input_power = self.parameters.get('input_power', 0)
         self.measurement_count = self.parameters.get('measurement_count', 3)
         self.settling_time = self.parameters.get('settling_time', 0.5)
+        # 参考功率扫描插值（测试参数 reference_sweep），未启用时逐个波长校准
+        self.reference_sweep: Dict = self.parameters.get('reference_sweep') or {}
+        self.reference_model: Optional[ReferenceModel] = None
         
         # 测试数据
         self.reference_powers: Dict[float, float] = {}
@@ -33,7 +38,8 @@ class InsertionLossTest(BaseTest):
     def calibrate_reference(self, wavelength: float = None, **kwargs) -> float:
         """
         校准参考功率
-        直接连接激光器和功率计测量参考功率
+        直接连接激光器和功率计测量参考功率；启用参考功率扫描时在此建立（或刷新已过期的）参考模型，
+        测量步骤只使用本流程在此取得的模型
         
         Args:
             wavelength: 波长(nm)，如果不指定则使用默认波长
@@ -44,6 +50,15 @@ class InsertionLossTest(BaseTest):
         if wavelength is None:
             wavelength = self.parameters.get('default_wavelength', 1550)
         
+        # 参考模型有效范围内的波长直接插值，不再调谐激光器
+        model = self.get_reference_model()
+        if model is not None and model.covers(wavelength):
+            ref_power = model.power_at(wavelength)
+            self.reference_powers[wavelength] = ref_power
+            self.reference_values[f'reference_{wavelength}nm'] = ref_power
+            self.logger.info(f"参考功率 @ {wavelength} nm: {ref_power:.3f} dBm (参考模型插值)")
+            return ref_power
+        
         self.logger.info(f"校准参考功率 @ {wavelength} nm")
         
         # 设置激光器
@@ -55,7 +70,7 @@ class InsertionLossTest(BaseTest):
         self.power_meter.set_wavelength(wavelength)
         
         # 等待稳定
-        time.sleep(self.settling_time)
+        get_clock().sleep(self.settling_time)
         
         # 测量多次取平均
         powers = self.power_meter.measure_multiple(count=self.measurement_count)
@@ -67,6 +82,90 @@ class InsertionLossTest(BaseTest):
         self.logger.info(f"参考功率 @ {wavelength} nm: {ref_power:.3f} dBm")
         return ref_power
     
+    @property
+    def reference_sweep_enabled(self) -> bool:
+        """是否启用参考功率扫描"""
+        return bool(self.reference_sweep) and self.reference_sweep.get('enabled', True)
+    
+    def get_reference_model(self) -> Optional[ReferenceModel]:
+        """
+        获取参考功率模型，未启用时返回None
+        
+        扫描范围默认为测试波长中激光器可调谐部分的最小到最大波长；
+        shared 为真（默认）时同一光源/功率计和扫描参数的模型在有效期内由各被测件共享。
+        扫描需要激光器与功率计直连，只能在校准步骤中调用
+        
+        Returns:
+            Optional[ReferenceModel]: 参考功率模型
+        """
+        if not self.reference_sweep_enabled:
+            return None
+        config = self.reference_sweep
+        if self.reference_model is not None and not self.reference_model.expired:
+            return self.reference_model
+        
+        low, high = getattr(self.laser, 'wavelength_range', None) or (-np.inf, np.inf)
+        tunable = [w for w in self.wavelengths if low <= w <= high]
+        start = config.get('start', min(tunable) if tunable else None)
+        stop = config.get('stop', max(tunable) if tunable else None)
+        if start is None or stop is None or stop <= start:
+            return None
+        step = config.get('step', 5)
+        method = config.get('method', 'cubic')
+        max_age = config.get('max_age', 3600)
+        
+        dwell_time = config.get('dwell_time', 0.05)
+        count = config.get('count', self.measurement_count)
+        
+        def acquire() -> ReferenceModel:
+            self.logger.info(f"参考功率扫描 {start}-{stop} nm，步进 {step} nm")
+            return ReferenceModel.acquire(
+                self.laser, self.power_meter, start, stop, step,
+                input_power=self.input_power,
+                settling_time=self.settling_time,
+                dwell_time=dwell_time,
+                count=count,
+                method=method,
+                max_age=max_age
+            )
+        
+        if config.get('shared', True):
+            # 键包含全部扫描参数，参数不同的流程不共享模型
+            key = (getattr(self.laser, 'resource_string', id(self.laser)),
+                   getattr(self.power_meter, 'resource_string', id(self.power_meter)),
+                   self.input_power, start, stop, step, method,
+                   count, dwell_time, self.settling_time)
+            self.reference_model = ReferenceModel.shared(key, acquire)
+        else:
+            self.reference_model = acquire()
+        return self.reference_model
+    
+    def _reference_from_pinned_model(self, wavelength: float):
+        """
+        由校准步骤取得的参考模型插值参考功率
+        
+        此时被测件已接入光路，不能重新扫描（会把被测件的损耗当作参考），
+        模型在流程进行中过期时仍使用它
+        
+        Args:
+            wavelength: 波长(nm)
+            
+        Raises:
+            RuntimeError: 校准步骤没有建立参考模型，或波长不在模型有效范围内
+        """
+        model = self.reference_model
+        if model is None:
+            raise RuntimeError("没有参考功率模型，需先执行 calibrate_reference 步骤")
+        low, high = model.valid_range
+        if not low <= wavelength <= high:
+            raise RuntimeError(f"波长 {wavelength} nm 不在参考模型有效范围 {low}-{high} nm 内")
+        if model.expired:
+            self.logger.warning(f"参考模型已超过有效期（{model.age:.0f} s），本流程仍使用校准步骤取得的模型")
+        ref_power = float(model.interpolate(wavelength))
+        self.reference_powers[wavelength] = ref_power
+        self.reference_values[f'reference_{wavelength}nm'] = ref_power
+        self.logger.info(f"参考功率 @ {wavelength} nm: {ref_power:.3f} dBm (参考模型插值)")
+    
     def measure_insertion_loss(self, wavelength: float) -> Dict:
         """
         测量指定波长的插入损耗
@@ -81,7 +180,10 @@ class InsertionLossTest(BaseTest):
         
         # 确保有参考功率
         if wavelength not in self.reference_powers:
-            self.calibrate_reference(wavelength)
+            if self.reference_sweep_enabled:
+                self._reference_from_pinned_model(wavelength)
+            else:
+                self.calibrate_reference(wavelength)
         
         ref_power = self.reference_powers[wavelength]
         
@@ -93,10 +195,15 @@ class InsertionLossTest(BaseTest):
         self.power_meter.set_wavelength(wavelength)
         
         # 等待稳定
-        time.sleep(self.settling_time)
+        get_clock().sleep(self.settling_time)
         
-        # 测量DUT后的功率
-        powers = self.power_meter.measure_multiple(count=self.measurement_count)
+        # 测量DUT后的功率（启用自适应平均时按插损限值决定读数次数）
+        min_il, max_il = self.limits_for(f'IL_{wavelength}nm')
+        averaged = self.average_readings(
+            lambda count: self.power_meter.measure_multiple(count=count),
+            self.measurement_count, lower=min_il, upper=max_il, transform=lambda p: ref_power - p
+        )
+        powers = averaged.readings
         output_power = np.mean(powers)
         
         # 计算插入损耗
@@ -111,8 +218,7 @@ class InsertionLossTest(BaseTest):
         self.add_measurement(f'output_power_{wavelength}nm', output_power, 'dBm')
         
         # 检查限值
-        max_il = self.pass_criteria.get('max_insertion_loss', float('inf'))
-        passed = self.check_limit(f'IL_{wavelength}nm', insertion_loss, max_val=max_il)
+        passed = self.check_limit(f'IL_{wavelength}nm', insertion_loss, min_il, max_il, averaged)
         
         result = {
             'wavelength': wavelength,
@@ -121,6 +227,8 @@ class InsertionLossTest(BaseTest):
             'insertion_loss': insertion_loss,
             'measurements': powers,
             'std_dev': float(np.std(powers)),
+            'samples': averaged.count,
+            'stop_reason': averaged.reason,
             'passed': passed
         }
         
@@ -150,8 +258,8 @@ class InsertionLossTest(BaseTest):
             uniformity = max(il_values) - min(il_values)
             self.add_measurement('uniformity', uniformity, 'dB')
             
-            max_dev = self.pass_criteria.get('max_deviation', float('inf'))
-            self.check_limit('uniformity', uniformity, max_val=max_dev)
+            min_dev, max_dev = self.limits_for('uniformity')
+            self.check_limit('uniformity', uniformity, min_dev, max_dev)
         
         return results
     
@@ -171,6 +279,7 @@ class InsertionLossTest(BaseTest):
                 'measurement_count': self.measurement_count
             },
             'reference_powers': self.reference_powers,
+            'reference_model': self.reference_model.to_dict() if self.reference_model else None,
             'insertion_losses': self.insertion_losses,
             'measurements': self.measurements,
             'pass_criteria': self.pass_criteria,
@@ -184,10 +293,8 @@ class InsertionLossTest(BaseTest):
                 'max_il': max(il_values),
                 'avg_il': np.mean(il_values),
                 'uniformity': max(il_values) - min(il_values),
-                'all_passed': all(
-                    il <= self.pass_criteria.get('max_insertion_loss', float('inf'))
-                    for il in il_values
-                )
+                'all_passed': all(self.limits.evaluate(
+                    {f'IL_{w}nm': il for w, il in self.insertion_losses.items()}).values())
             }
         
         return report
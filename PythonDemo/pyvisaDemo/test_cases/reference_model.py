@@ -0,0 +1,251 @@
+"""
+参考功率模型
+一次波长扫描测得参考功率曲线，存为插值表（线性或自然三次样条），
+有效波长范围内的任意波长直接插值得到参考功率，不再逐个波长调谐激光器校准。
+模型带有有效期，同一套光源/功率计的模型在进程内共享，有效期内多个被测件复用同一次扫描；
+仪器重新连接后基于该仪器的共享模型作废
+"""
+import threading
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from drivers.clock import get_clock
+from core.result_model import datetime_to_ns, ns_property
+
+
+def _natural_spline_moments(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """自然三次样条各节点的二阶导数（追赶法解三对角方程组）"""
+    n = len(x)
+    h = np.diff(x)
+    moments = np.zeros(n)
+    if n < 3:
+        return moments
+    # 内部节点: h[i-1]*M[i-1] + 2(h[i-1]+h[i])*M[i] + h[i]*M[i+1] = 6*(斜率差)
+    diag = 2 * (h[:-1] + h[1:])
+    rhs = 6 * (np.diff(y[1:]) / h[1:] - np.diff(y[:-1]) / h[:-1])
+    for i in range(1, n - 2):
+        w = h[i] / diag[i - 1]
+        diag[i] -= w * h[i]
+        rhs[i] -= w * rhs[i - 1]
+    inner = np.zeros(n - 2)
+    inner[-1] = rhs[-1] / diag[-1]
+    for i in range(n - 4, -1, -1):
+        inner[i] = (rhs[i] - h[i + 1] * inner[i + 1]) / diag[i]
+    moments[1:-1] = inner
+    return moments
+
+
+class ReferenceModel:
+    """参考功率模型"""
+
+    # 进程内共享的模型 {键: 模型}，键以光源、功率计的资源字符串开头
+    _shared: Dict[Tuple, 'ReferenceModel'] = {}
+    # 每个键的扫描锁：同一键只扫描一次，不同光源/功率计组合的扫描互不等待
+    _key_locks: Dict[Tuple, threading.Lock] = {}
+    # 保护上面两个字典，不在扫描期间持有
+    _shared_lock = threading.Lock()
+
+    acquired_at = ns_property('acquired_ns', '扫描时间')
+
+    def __init__(self, wavelengths: Sequence[float], powers: Sequence[float],
+                 method: str = 'cubic', max_age: Optional[float] = None,
+                 acquired_ns: Optional[int] = None):
+        """
+        初始化参考功率模型
+
+        Args:
+            wavelengths: 扫描波长(nm)
+            powers: 各波长的参考功率(dBm)
+            method: 插值方法，'cubic'（自然三次样条）或 'linear'
+            max_age: 有效期(秒)，None 表示不过期
+            acquired_ns: 扫描时间(纳秒)，默认为当前时间
+        """
+        if method not in ('cubic', 'linear'):
+            raise ValueError(f"不支持的插值方法: {method}")
+        order = np.argsort(wavelengths)
+        self.wavelengths = np.asarray(wavelengths, dtype=float)[order]
+        self.powers = np.asarray(powers, dtype=float)[order]
+        if len(self.wavelengths) < 2 or np.any(np.diff(self.wavelengths) <= 0):
+            raise ValueError("参考扫描至少需要两个不同的波长点")
+        self.method = method if len(self.wavelengths) >= 3 else 'linear'
+        self.max_age = max_age
+        self.acquired_ns = acquired_ns if acquired_ns is not None else datetime_to_ns(get_clock().now())
+        self._moments = (_natural_spline_moments(self.wavelengths, self.powers)
+                         if self.method == 'cubic' else None)
+
+    @property
+    def valid_range(self) -> Tuple[float, float]:
+        """有效波长范围(nm)"""
+        return float(self.wavelengths[0]), float(self.wavelengths[-1])
+
+    @property
+    def age(self) -> float:
+        """距扫描的时间(秒)"""
+        return (datetime_to_ns(get_clock().now()) - self.acquired_ns) / 1e9
+
+    @property
+    def expired(self) -> bool:
+        """是否已超过有效期"""
+        return self.max_age is not None and self.age > self.max_age
+
+    def covers(self, wavelength: float) -> bool:
+        """
+        波长是否可由模型给出参考功率（在有效范围内且未过期）
+
+        Args:
+            wavelength: 波长(nm)
+
+        Returns:
+            bool: 是否可用
+        """
+        low, high = self.valid_range
+        return low <= wavelength <= high and not self.expired
+
+    def interpolate(self, wavelengths) -> np.ndarray:
+        """
+        插值得到参考功率（不检查有效范围）
+
+        Args:
+            wavelengths: 波长或波长数组(nm)
+
+        Returns:
+            np.ndarray: 参考功率(dBm)
+        """
+        xq = np.asarray(wavelengths, dtype=float)
+        if self._moments is None:
+            return np.interp(xq, self.wavelengths, self.powers)
+
+        x, y, m = self.wavelengths, self.powers, self._moments
+        i = np.clip(np.searchsorted(x, xq, side='right') - 1, 0, len(x) - 2)
+        h = x[i + 1] - x[i]
+        a = (x[i + 1] - xq) / h
+        b = (xq - x[i]) / h
+        return (a * y[i] + b * y[i + 1] +
+                ((a ** 3 - a) * m[i] + (b ** 3 - b) * m[i + 1]) * h * h / 6)
+
+    def power_at(self, wavelength: float) -> float:
+        """
+        参考功率
+
+        Args:
+            wavelength: 波长(nm)
+
+        Returns:
+            float: 参考功率(dBm)
+
+        Raises:
+            ValueError: 波长超出有效范围或模型已过期
+        """
+        if not self.covers(wavelength):
+            low, high = self.valid_range
+            raise ValueError(f"波长 {wavelength} nm 不在参考模型有效范围 {low}-{high} nm 内或模型已过期")
+        return float(self.interpolate(wavelength))
+
+    def to_dict(self) -> Dict:
+        """报告中的模型信息"""
+        return {
+            'method': self.method,
+            'valid_range': list(self.valid_range),
+            'points': len(self.wavelengths),
+            'acquired_at': self.acquired_at.isoformat(),
+            'max_age': self.max_age,
+            'wavelengths': self.wavelengths,
+            'powers': self.powers
+        }
+
+    @classmethod
+    def acquire(cls, laser, power_meter, start: float, stop: float, step: float,
+                input_power: float = 0, settling_time: float = 0.5, dwell_time: float = 0.05,
+                count: int = 1, method: str = 'cubic',
+                max_age: Optional[float] = None) -> 'ReferenceModel':
+        """
+        扫描激光波长测量参考功率并建立模型
+
+        Args:
+            laser: 激光器驱动
+            power_meter: 光功率计驱动
+            start: 起始波长(nm)
+            stop: 终止波长(nm)
+            step: 步进(nm)
+            input_power: 激光输出功率(dBm)
+            settling_time: 开始扫描前的稳定时间(秒)
+            dwell_time: 每个波长的停留时间(秒)
+            count: 每个波长的读数次数
+            method: 插值方法
+            max_age: 有效期(秒)
+
+        Returns:
+            ReferenceModel: 参考功率模型
+        """
+        laser.set_wavelength(start)
+        laser.set_power(input_power)
+        laser.output_on()
+        get_clock().sleep(settling_time)
+
+        wavelengths, powers = [], []
+        for wavelength in laser.wavelength_sweep(start, stop, step, dwell_time):
+            power_meter.set_wavelength(wavelength)
+            wavelengths.append(wavelength)
+            powers.append(float(np.mean(power_meter.measure_multiple(count=count))))
+        # 步进不能整除扫描范围时补测终点，保证有效范围覆盖到 stop
+        if wavelengths and wavelengths[-1] < stop - 1e-9:
+            laser.set_wavelength(stop)
+            power_meter.set_wavelength(stop)
+            get_clock().sleep(dwell_time)
+            wavelengths.append(stop)
+            powers.append(float(np.mean(power_meter.measure_multiple(count=count))))
+        return cls(wavelengths, powers, method=method, max_age=max_age)
+
+    @classmethod
+    def shared(cls, key: Tuple, factory: Callable[[], 'ReferenceModel']) -> 'ReferenceModel':
+        """
+        获取进程内共享的模型，不存在或已过期时调用 factory 重新扫描
+
+        Args:
+            key: 模型键（如光源、功率计和扫描参数）
+            factory: 建立模型的函数
+
+        Returns:
+            ReferenceModel: 参考功率模型
+        """
+        with cls._shared_lock:
+            model = cls._shared.get(key)
+            if model is not None and not model.expired:
+                return model
+            key_lock = cls._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # 等待期间其他线程可能已完成扫描
+            with cls._shared_lock:
+                model = cls._shared.get(key)
+            if model is None or model.expired:
+                model = factory()
+                with cls._shared_lock:
+                    cls._shared[key] = model
+            return model
+
+    @classmethod
+    def invalidate(cls, key: Optional[Tuple] = None):
+        """
+        丢弃共享的模型（如更换参考跳线后），下次使用时重新扫描
+
+        Args:
+            key: 模型键，None 表示全部
+        """
+        with cls._shared_lock:
+            if key is None:
+                cls._shared.clear()
+            else:
+                cls._shared.pop(key, None)
+
+    @classmethod
+    def invalidate_instrument(cls, resource_string: str):
+        """
+        丢弃使用某台仪器的共享模型（仪器重新连接后，下次使用时重新扫描）
+
+        Args:
+            resource_string: 光源或功率计的资源字符串
+        """
+        with cls._shared_lock:
+            for key in [key for key in cls._shared if resource_string in key[:2]]:
+                del cls._shared[key]
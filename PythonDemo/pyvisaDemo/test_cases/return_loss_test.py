@@ -1,33 +1,98 @@
 """
 回波损耗测试
 测量光器件的回波损耗
+测试站配置了专用回损仪（流程可选仪器 return_loss_meter）时自动使用回损仪，
+一次测量操作得到所有波长的回损；否则使用激光器和光功率计逐个波长测量
 """
-import time
+import math
+from contextlib import contextmanager
 from typing import Dict, List, Any
 import numpy as np
 
+from drivers.clock import get_clock
+
 from .base_test import BaseTest
 
 
 class ReturnLossTest(BaseTest):
     """回波损耗测试"""
     
-    def __init__(self, config: Dict, instruments: Dict, result):
-        super().__init__(config, instruments, result)
+    def __init__(self, config: Dict, instruments: Dict, result, **kwargs):
+        super().__init__(config, instruments, result, **kwargs)
         
         # 获取仪器
         self.laser = self.get_instrument('laser_source')
         self.power_meter = self.get_instrument('optical_power_meter')
+        self.rl_meter = self.get_instrument('return_loss_meter')
         
         # 测试参数
         self.wavelengths = self.parameters.get('wavelengths', [1550])
         self.input_power = self.parameters.get('input_power', 0)
         self.measurement_count = self.parameters.get('measurement_count', 5)
+        # 功率计接环行器反射端口的通道（输入功率在功率计当前通道测量），None 表示同一通道
+        self.reflection_channel = self.parameters.get('reflection_channel')
         
         # 测试数据
         self.input_powers: Dict[float, float] = {}
         self.reflected_powers: Dict[float, float] = {}
         self.return_losses: Dict[float, float] = {}
+        # 回损仪单次测量得到、尚未使用的各波长读数
+        self._meter_readings: Dict[float, List[float]] = {}
+        self._meter_configured = False
+        
+        if self.rl_meter is not None:
+            self.logger.info("使用回损仪测量回损")
+    
+    @contextmanager
+    def _reflection_port(self):
+        """测量反射功率期间将功率计切换到反射端口所在的通道"""
+        if self.reflection_channel is None:
+            yield
+            return
+        previous = self.power_meter.channel
+        self.power_meter.channel = self.reflection_channel
+        try:
+            yield
+        finally:
+            self.power_meter.channel = previous
+    
+    def _configure_meter(self):
+        """设置回损仪的波长列表并做参考校准（每个测试只做一次）"""
+        if self._meter_configured:
+            return
+        self.rl_meter.set_wavelengths(self.wavelengths)
+        for wavelength, power in self.rl_meter.reference_calibration().items():
+            self.input_powers[wavelength] = power
+            self.reference_values[f'input_power_{wavelength}nm'] = power
+        self._meter_configured = True
+    
+    def _read_meter(self, wavelength: float, count: int) -> List[float]:
+        """
+        取指定波长的回损读数，缓存不足时再做单次测量（同时得到所有波长的读数）
+        
+        Args:
+            wavelength: 波长(nm)
+            count: 读数次数
+            
+        Returns:
+            List[float]: 回损读数(dB)
+            
+        Raises:
+            ValueError: 波长不在回损仪的测量波长列表中
+            RuntimeError: 单次测量没有返回该波长的读数
+        """
+        key = next((w for w in self.rl_meter.wavelengths if math.isclose(w, wavelength)), None)
+        if key is None:
+            raise ValueError(f"波长 {wavelength} nm 不在回损仪的测量波长列表 {self.rl_meter.wavelengths} 中")
+        buffer = self._meter_readings.setdefault(key, [])
+        while len(buffer) < count:
+            shot = self.rl_meter.measure_return_loss()
+            if key not in shot:
+                raise RuntimeError(f"回损仪单次测量没有返回 {wavelength} nm 的读数")
+            for wl, value in shot.items():
+                self._meter_readings.setdefault(wl, []).append(value)
+        readings, self._meter_readings[key] = buffer[:count], buffer[count:]
+        return readings
     
     def calibrate_reference(self, wavelength: float = None, **kwargs) -> float:
         """
@@ -42,6 +107,10 @@ class ReturnLossTest(BaseTest):
         if wavelength is None:
             wavelength = 1550
         
+        if self.rl_meter is not None:
+            self._configure_meter()
+            return self.input_powers.get(wavelength, 0.0)
+        
         self.logger.info(f"校准输入功率 @ {wavelength} nm")
         
         # 设置激光器
@@ -52,7 +121,7 @@ class ReturnLossTest(BaseTest):
         # 设置功率计
         self.power_meter.set_wavelength(wavelength)
         
-        time.sleep(0.5)
+        get_clock().sleep(0.5)
         
         # 测量输入功率
         powers = self.power_meter.measure_multiple(count=self.measurement_count)
@@ -76,6 +145,9 @@ class ReturnLossTest(BaseTest):
         """
         self.logger.info(f"测量回损 @ {wavelength} nm")
         
+        if self.rl_meter is not None:
+            return self._measure_return_loss_with_meter(wavelength)
+        
         # 确保有输入功率校准值
         if wavelength not in self.input_powers:
             self.calibrate_reference(wavelength)
@@ -86,13 +158,17 @@ class ReturnLossTest(BaseTest):
         self.laser.set_wavelength(wavelength)
         self.laser.output_on()
         
-        # 设置功率计
-        self.power_meter.set_wavelength(wavelength)
-        
-        time.sleep(0.5)
-        
-        # 测量反射功率
-        powers = self.power_meter.measure_multiple(count=self.measurement_count)
+        # 测量反射功率（启用自适应平均时按回损限值决定读数次数）
+        min_rl, max_rl = self.limits_for(f'RL_{wavelength}nm')
+        with self._reflection_port():
+            self.power_meter.set_wavelength(wavelength)
+            get_clock().sleep(0.5)
+            averaged = self.average_readings(
+                lambda count: self.power_meter.measure_multiple(count=count),
+                self.measurement_count, lower=min_rl, upper=max_rl,
+                transform=lambda p: input_power - p
+            )
+        powers = averaged.readings
         reflected_power = np.mean(powers)
         
         # 计算回波损耗 (RL = Pin - Preflected)
@@ -107,8 +183,7 @@ class ReturnLossTest(BaseTest):
         self.add_measurement(f'reflected_power_{wavelength}nm', reflected_power, 'dBm')
         
         # 检查限值 (回损越大越好)
-        min_rl = self.pass_criteria.get('min_return_loss', 0)
-        passed = self.check_limit(f'RL_{wavelength}nm', return_loss, min_val=min_rl)
+        passed = self.check_limit(f'RL_{wavelength}nm', return_loss, min_rl, max_rl, averaged)
         
         result = {
             'wavelength': wavelength,
@@ -117,6 +192,8 @@ class ReturnLossTest(BaseTest):
             'return_loss': return_loss,
             'measurements': powers,
             'std_dev': float(np.std(powers)),
+            'samples': averaged.count,
+            'stop_reason': averaged.reason,
             'passed': passed
         }
         
@@ -127,6 +204,48 @@ class ReturnLossTest(BaseTest):
         
         return result
     
+    def _measure_return_loss_with_meter(self, wavelength: float) -> Dict:
+        """
+        用回损仪测量回波损耗
+        
+        Args:
+            wavelength: 波长(nm)
+            
+        Returns:
+            Dict: 测量结果
+        """
+        self._configure_meter()
+        
+        # 回损仪直接给出回损，启用自适应平均时按回损限值决定读数次数
+        min_rl, max_rl = self.limits_for(f'RL_{wavelength}nm')
+        averaged = self.average_readings(
+            lambda count: self._read_meter(wavelength, count),
+            self.measurement_count, lower=min_rl, upper=max_rl
+        )
+        readings = averaged.readings
+        return_loss = float(np.mean(readings))
+        
+        self.return_losses[wavelength] = return_loss
+        self.add_measurement(f'RL_{wavelength}nm', return_loss, 'dB')
+        
+        passed = self.check_limit(f'RL_{wavelength}nm', return_loss, min_rl, max_rl, averaged)
+        
+        self.logger.info(
+            f"回损 @ {wavelength} nm: {return_loss:.2f} dB (回损仪) "
+            f"({'PASS' if passed else 'FAIL'})"
+        )
+        
+        return {
+            'wavelength': wavelength,
+            'return_loss': return_loss,
+            'measurements': readings,
+            'std_dev': float(np.std(readings)),
+            'samples': averaged.count,
+            'stop_reason': averaged.reason,
+            'instrument': 'return_loss_meter',
+            'passed': passed
+        }
+    
     def run_wavelength_sweep(self) -> List[Dict]:
         """
         执行波长扫描测试
@@ -155,7 +274,8 @@ class ReturnLossTest(BaseTest):
             'parameters': {
                 'wavelengths': self.wavelengths,
                 'input_power': self.input_power,
-                'measurement_count': self.measurement_count
+                'measurement_count': self.measurement_count,
+                'instrument': 'return_loss_meter' if self.rl_meter is not None else 'optical_power_meter'
             },
             'input_powers': self.input_powers,
             'return_losses': self.return_losses,
@@ -166,13 +286,12 @@ class ReturnLossTest(BaseTest):
         
         if self.return_losses:
             rl_values = list(self.return_losses.values())
-            min_rl_limit = self.pass_criteria.get('min_return_loss', 0)
-            
             report['summary'] = {
                 'min_rl': min(rl_values),
                 'max_rl': max(rl_values),
                 'avg_rl': np.mean(rl_values),
-                'all_passed': all(rl >= min_rl_limit for rl in rl_values)
+                'all_passed': all(self.limits.evaluate(
+                    {f'RL_{w}nm': rl for w, rl in self.return_losses.items()}).values())
             }
         
         return report
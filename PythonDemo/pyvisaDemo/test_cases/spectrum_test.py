@@ -2,18 +2,21 @@
 光谱测试
 分析光源或器件的光谱特性
 """
-import time
-from typing import Dict, List, Any, Tuple
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 
+from drivers.clock import get_clock
+from core.trace_archive import TraceArchive, TraceEntry
+
 from .base_test import BaseTest
 
 
 class SpectrumTest(BaseTest):
     """光谱分析测试"""
     
-    def __init__(self, config: Dict, instruments: Dict, result):
-        super().__init__(config, instruments, result)
+    def __init__(self, config: Dict, instruments: Dict, result, **kwargs):
+        super().__init__(config, instruments, result, **kwargs)
         
         # 获取仪器
         self.laser = self.get_instrument('laser_source')
@@ -25,6 +28,20 @@ class SpectrumTest(BaseTest):
         self.resolution = self.parameters.get('resolution', 0.02)
         self.sensitivity = self.parameters.get('sensitivity', 'HIGH1')
         
+        # 光谱归档：配置 archive_path 时每次扫描都追加到归档，报告中只保留归档引用
+        self.archive: Optional[TraceArchive] = None
+        self.archive_entries: List[TraceEntry] = []
+        archive_path = self.parameters.get('archive_path')
+        if archive_path:
+            archive_path = Path(archive_path)
+            if not archive_path.is_absolute():
+                archive_path = Path(__file__).parent.parent / archive_path
+            self.archive = TraceArchive.shared(
+                archive_path,
+                codec=self.parameters.get('archive_codec', 'delta'),
+                quantum=self.parameters.get('archive_quantum', 0.001)
+            )
+        
         # 测试数据
         self.wavelength_data: np.ndarray = None
         self.power_data: np.ndarray = None
@@ -84,7 +101,7 @@ class SpectrumTest(BaseTest):
         if self.laser:
             self.laser.set_wavelength(self.center_wavelength)
             self.laser.output_on()
-            time.sleep(0.5)
+            get_clock().sleep(0.5)
         
         # 执行扫描
         self.osa.single_sweep()
@@ -94,6 +111,17 @@ class SpectrumTest(BaseTest):
         
         self.logger.info(f"光谱扫描完成，数据点数: {len(self.wavelength_data)}")
         
+        if self.archive is not None:
+            entry = self.archive.append(
+                self.wavelength_data, self.power_data,
+                serial_number=self.result.product_info.get('serial_number', ''),
+                timestamp=get_clock().now(),
+                flow_id=self.result.flow_id,
+                center_wavelength=self.center_wavelength,
+                resolution=self.resolution
+            )
+            self.archive_entries.append(entry)
+        
         return self.wavelength_data, self.power_data
     
     def analyze_peaks(self, **kwargs) -> Dict:
@@ -123,8 +151,7 @@ class SpectrumTest(BaseTest):
             self.add_measurement('SMSR', smsr, 'dB')
             
             # 检查限值
-            min_smsr = self.pass_criteria.get('min_smsr', 0)
-            self.check_limit('SMSR', smsr, min_val=min_smsr)
+            self.check_limit('SMSR', smsr, *self.limits_for('SMSR'))
         except:
             self.logger.warning("无法测量SMSR")
         
@@ -135,8 +162,7 @@ class SpectrumTest(BaseTest):
             self.add_measurement('3dB_bandwidth', bandwidth, 'nm')
             
             # 检查限值
-            max_linewidth = self.pass_criteria.get('max_linewidth', float('inf'))
-            self.check_limit('3dB_bandwidth', bandwidth, max_val=max_linewidth)
+            self.check_limit('3dB_bandwidth', bandwidth, *self.limits_for('3dB_bandwidth'))
         except:
             self.logger.warning("无法测量3dB带宽")
         
@@ -233,12 +259,21 @@ class SpectrumTest(BaseTest):
             'spectrum_analysis': self.spectrum_analysis,
             'measurements': self.measurements,
             'pass_criteria': self.pass_criteria,
+            # 保持 NumPy 数组，JSON 报告中由序列化器另存为 .npy 附属文件
             'spectrum_data': {
-                'wavelengths': self.wavelength_data.tolist() if self.wavelength_data is not None else [],
-                'powers': self.power_data.tolist() if self.power_data is not None else []
+                'wavelengths': self.wavelength_data if self.wavelength_data is not None else [],
+                'powers': self.power_data if self.power_data is not None else []
             }
         }
         
+        # 已归档时报告只记录归档位置和轨迹ID
+        if self.archive_entries:
+            report['spectrum_data'] = {
+                'archive': str(self.archive.path),
+                'trace_ids': [entry.trace_id for entry in self.archive_entries],
+                'points': len(self.wavelength_data)
+            }
+        
         # 添加汇总信息
         report['summary'] = {
             'peak_wavelength': self.peak_info.get('wavelength'),
@@ -252,15 +287,12 @@ class SpectrumTest(BaseTest):
     
     def _check_all_passed(self) -> bool:
         """检查所有标准是否通过"""
-        if 'smsr' in self.peak_info and 'min_smsr' in self.pass_criteria:
-            if self.peak_info['smsr'] < self.pass_criteria['min_smsr']:
-                return False
-        
-        if 'bandwidth_3db' in self.peak_info and 'max_linewidth' in self.pass_criteria:
-            if self.peak_info['bandwidth_3db'] > self.pass_criteria['max_linewidth']:
-                return False
-        
-        return True
+        values = {}
+        if 'smsr' in self.peak_info:
+            values['SMSR'] = self.peak_info['smsr']
+        if 'bandwidth_3db' in self.peak_info:
+            values['3dB_bandwidth'] = self.peak_info['bandwidth_3db']
+        return all(self.limits.evaluate(values).values())
     
     def cleanup(self):
         """测试清理"""
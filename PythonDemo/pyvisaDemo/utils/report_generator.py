@@ -6,22 +6,24 @@ import logging
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any, Optional
-import json
 
 import pandas as pd
 import numpy as np
 from jinja2 import Template
 
+from core.serialization import JsonSerializer
+
 
 class ReportGenerator:
     """测试报告生成器"""
     
-    def __init__(self, output_dir: str = None):
+    def __init__(self, output_dir: str = None, serializer: Optional[JsonSerializer] = None):
         """
         初始化报告生成器
         
         Args:
             output_dir: 报告输出目录
+            serializer: JSON序列化器，默认缩进2格、大数组另存为 .npy 附属文件
         """
         if output_dir is None:
             self.output_dir = Path(__file__).parent.parent / 'reports'
@@ -29,6 +31,7 @@ class ReportGenerator:
             self.output_dir = Path(output_dir)
         
         self.output_dir.mkdir(exist_ok=True)
+        self.serializer = serializer or JsonSerializer()
         self.logger = logging.getLogger(self.__class__.__name__)
     
     def generate_excel_report(self, test_result, filename: str = None) -> str:
@@ -320,35 +323,10 @@ class ReportGenerator:
         
         filepath = self.output_dir / filename
         
-        report_data = {
-            'flow_id': test_result.flow_id,
-            'flow_name': test_result.flow_name,
-            'status': test_result.status.value,
-            'start_time': test_result.start_time.isoformat(),
-            'end_time': test_result.end_time.isoformat() if test_result.end_time else None,
-            'duration': test_result.duration,
-            'product_info': test_result.product_info,
-            'measurements': test_result.measurements,
-            'pass_criteria': test_result.pass_criteria,
-            'passed_criteria': test_result.passed_criteria,
-            'error_message': test_result.error_message,
-            'steps': []
-        }
-        
-        for step in test_result.step_results:
-            report_data['steps'].append({
-                'step_id': step.step_id,
-                'name': step.name,
-                'status': step.status.value,
-                'start_time': step.start_time.isoformat(),
-                'end_time': step.end_time.isoformat(),
-                'duration': step.duration,
-                'data': step.data,
-                'error_message': step.error_message
-            })
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, indent=2, ensure_ascii=False)
+        # 光谱等大数组另存为 report_xxx.<序号>.npy，JSON 中只保留文件引用
+        sidecars = self.serializer.dump(test_result.to_dict(), filepath)
+        if sidecars:
+            self.logger.debug(f"数组附属文件: {[p.name for p in sidecars]}")
         
         self.logger.info(f"JSON报告已生成: {filepath}")
         return str(filepath)